@@ -0,0 +1,405 @@
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from data_manage import StoryTelling, DATA_FILE, CHART_VERSION, RANK_METRICS, TOP_K
+from batch_render import HeadlessController, chart_jobs, chart_name, init_worker, render_png
+from render_cache import RenderCache
+
+# memory budget of response bodies shared by every request
+RESPONSE_CACHE_BUDGET = 128 * 1024 ** 2
+
+# number of recent latencies kept per endpoint for percentiles
+LATENCY_WINDOW = 1024
+
+
+class EndpointMetrics:
+    """
+        Latency and throughput counters of one endpoint.
+
+        Attributes:
+            requests: Number of requests answered.
+            errors: Number of requests answered with an error status.
+            not_modified: Number of requests answered with 304 Not Modified.
+            cache_hits: Number of requests answered from the response cache.
+            total_seconds: Seconds spent answering requests.
+            max_seconds: Longest time spent answering a request.
+            latencies: Seconds spent on the most recent requests.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty EndpointMetrics object.
+        """
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.cache_hits = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds, status, cache_hit):
+        """
+        Record an answered request.
+        :param seconds: Seconds spent answering it.
+        :param status: HTTP status code of the response.
+        :param cache_hit: True if the body came from the response cache.
+        :return: None
+        """
+        self.requests += 1
+        self.errors += status >= 400
+        self.not_modified += status == 304
+        self.cache_hits += cache_hit
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.latencies.append(seconds)
+
+    def summary(self, uptime):
+        """
+        Get counters with mean, median and 95th percentile latency in milliseconds.
+        :param uptime: Seconds since the service started.
+        :return: Dictionary of counters.
+        """
+        recent = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000
+        return {'requests': self.requests, 'errors': self.errors,
+                'not_modified': self.not_modified, 'cache_hits': self.cache_hits,
+                'per_second': self.requests / uptime if uptime > 0 else 0.0,
+                'mean_ms': self.total_seconds / self.requests * 1000 if self.requests else 0.0,
+                'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95),
+                'max_ms': self.max_seconds * 1000}
+
+
+class AnalysisService:
+    """
+        Answers aggregate and chart queries over a dataset loaded once.
+
+        Responses are kept in a shared memory-bounded cache keyed on the query
+        and data version, and the same key gives the ETag, so clients that
+        already hold a response get 304 Not Modified without any work.
+        Concurrent requests for the same uncached response wait for a single
+        computation. Charts are rendered by a pool of worker processes.
+
+        Attributes:
+            story: The StoryTelling object holding the dataset. Request threads
+                query it concurrently, since its aggregate cache is thread safe and
+                the dataset is not changed while the service runs.
+            charts: (kind, params) of every chart, keyed by chart name.
+            cache: The shared response cache, see RenderCache.
+            executor: Pool of worker processes rendering charts.
+            metrics: EndpointMetrics of each endpoint.
+            started: time.perf_counter() when the service started.
+    """
+
+    def __init__(self, story, workers=None, cache_budget=RESPONSE_CACHE_BUDGET, dpi=100):
+        """
+        Initialize an AnalysisService object.
+        :param story: The StoryTelling object holding the dataset.
+        :param workers: Number of chart worker processes, None for one per core.
+        :param cache_budget: Memory budget of the response cache in bytes.
+        :param dpi: Resolution of chart images.
+        """
+        self.story = story
+        self.dpi = dpi
+        self.charts = {chart_name(kind, params): (kind, params)
+                       for kind, params in chart_jobs(story)}
+        self.cache = RenderCache(cache_budget)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.metrics = {}
+        self.started = time.perf_counter()
+        self.endpoints = {
+            '/categories': self.categories,
+            '/years': self.years,
+            '/year-trend': self.year_trend,
+            '/category-means': self.category_means,
+            '/top-channels': self.top_channels,
+            '/stats': self.stats,
+            '/charts': self.chart_names,
+            '/chart': self.chart,
+            '/metrics': self.metrics_summary,
+        }
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                            initargs=(story,))
+        # start the workers now, before request threads exist, so they fork cleanly
+        self.executor.submit(int).result()
+
+    def handle(self, path, query, etag=None):
+        """
+        Answer a request.
+        :param path: Path of the request.
+        :param query: Dictionary of query parameters, each a list of values.
+        :param etag: Value of the If-None-Match header, if any.
+        :return: Tuple of status, content type, body and ETag.
+        """
+        start = time.perf_counter()
+        endpoint = '/chart' if path.startswith('/chart/') else path
+        status, content_type, tag, cache_hit = 200, 'application/json', None, False
+        try:
+            if endpoint not in self.endpoints:
+                raise LookupError(f'unknown endpoint {path}')
+            if endpoint == '/metrics':
+                body = self.metrics_summary()
+            else:
+                params = tuple(sorted((name, tuple(values)) for name, values in query.items()))
+                key = (path, params, self.story.data_version, CHART_VERSION)
+                tag = f'"{RenderCache.digest(key)}"'
+                if endpoint == '/chart':
+                    content_type = 'image/png'
+                if etag == tag:
+                    status, body = 304, b''
+                else:
+                    body, cache_hit = self.cached(key, lambda: self.endpoints[endpoint](path, query))
+        except LookupError as error:
+            status, content_type, body, tag = 404, 'application/json', self.error(error), None
+        except ValueError as error:
+            status, content_type, body, tag = 400, 'application/json', self.error(error), None
+        except Exception as error:
+            status, content_type, body, tag = 500, 'application/json', self.error(error), None
+        if endpoint not in self.endpoints:
+            endpoint = 'other'
+        with self.lock:
+            metrics = self.metrics.setdefault(endpoint, EndpointMetrics())
+            metrics.record(time.perf_counter() - start, status, cache_hit)
+        return status, content_type, body, tag
+
+    def cached(self, key, compute):
+        """
+        Get a response body from the cache, computing it once for concurrent requests.
+        :param key: Tuple identifying the response.
+        :param compute: Function without arguments that returns the body.
+        :return: Tuple of the body and True if it came from the cache.
+        """
+        with self.lock:
+            body = self.cache.get(key)
+            if body is not None:
+                return body, True
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result(), True
+        try:
+            body = compute()
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        with self.lock:
+            self.cache.put(key, body)
+        future.set_result(body)
+        return body, False
+
+    @staticmethod
+    def error(error):
+        """
+        Get the body of an error response.
+        :param error: The exception.
+        :return: JSON bytes.
+        """
+        return json.dumps({'error': str(error)}).encode('utf-8')
+
+    @staticmethod
+    def parameter(query, name, default=None, choices=None):
+        """
+        Get a query parameter.
+        :param query: Dictionary of query parameters, each a list of values.
+        :param name: Name of the parameter.
+        :param default: Value when the parameter is missing, None if it is required.
+        :param choices: Allowed values, None to allow any.
+        :return: Value of the parameter.
+        """
+        values = query.get(name)
+        if not values:
+            if default is None:
+                raise ValueError(f'missing parameter {name}')
+            return default
+        if choices is not None and values[0] not in choices:
+            raise ValueError(f'{name} must be one of {", ".join(choices)}')
+        return values[0]
+
+    def categories(self, path, query):
+        """
+        Get categories of channels.
+        :return: JSON bytes of a list of category names.
+        """
+        return json.dumps(self.story.categories()).encode('utf-8')
+
+    def years(self, path, query):
+        """
+        Get created years of channels.
+        :return: JSON bytes of a list of years.
+        """
+        return json.dumps(self.story.years()).encode('utf-8')
+
+    def year_trend(self, path, query):
+        """
+        Get the most created category for each year.
+        :return: JSON bytes of records with 'Year', 'Category' and 'total_created'.
+        """
+        return self.story.year_trend().to_json(orient='records').encode('utf-8')
+
+    def category_means(self, path, query):
+        """
+        Get mean of an attribute for each category, ?attribute=<column>.
+        :return: JSON bytes of an object keyed by category.
+        """
+        attribute = self.parameter(query, 'attribute', choices=list(RANK_METRICS))
+        return self.story.category_means(attribute).to_json().encode('utf-8')
+
+    def top_channels(self, path, query):
+        """
+        Get top channels of a category, ?category=<name>&metric=<column>&n=<count>.
+        :return: JSON bytes of records with 'Youtuber' and the metric.
+        """
+        category = self.parameter(query, 'category')
+        metric = self.parameter(query, 'metric', 'subscribers', list(RANK_METRICS))
+        n = int(self.parameter(query, 'n', str(TOP_K)))
+        if n <= 0:
+            raise ValueError('n must be positive')
+        top = self.story.top_channels(category, metric, n)
+        return top[['Youtuber', metric]].to_json(orient='records').encode('utf-8')
+
+    def stats(self, path, query):
+        """
+        Get descriptive statistics, ?columns=<column>,<column>&category=<category>
+        &percentiles=<percent>,<percent>, of every category by default.
+        :return: JSON bytes of an object keyed by column, then by statistic.
+        """
+        columns = self.parameter(query, 'columns', ','.join(RANK_METRICS)).split(',')
+        unknown = [column for column in columns if column not in RANK_METRICS]
+        if unknown:
+            raise ValueError(f'unknown columns {", ".join(unknown)}')
+        percentiles = sorted({float(value) / 100 for value in
+                              self.parameter(query, 'percentiles', '25,50,75').split(',')})
+        if not all(0 <= value <= 1 for value in percentiles):
+            raise ValueError('percentiles must be between 0 and 100')
+        category = query.get('category', [None])[0]
+        table = self.story.summary_stats(columns, category, percentiles)
+        return table.to_json().encode('utf-8')
+
+    def chart_names(self, path, query):
+        """
+        Get names of every chart, served at /chart/<name>.png.
+        :return: JSON bytes of a list of chart names.
+        """
+        return json.dumps(sorted(self.charts)).encode('utf-8')
+
+    def chart(self, path, query):
+        """
+        Render a chart in a worker process, /chart/<name>.png.
+        :return: PNG bytes of the chart.
+        """
+        name = path[len('/chart/'):]
+        if name.endswith('.png'):
+            name = name[:-len('.png')]
+        if name not in self.charts:
+            raise LookupError(f'unknown chart {name}')
+        kind, params = self.charts[name]
+        return self.executor.submit(render_png, kind, params, self.dpi).result()
+
+    def metrics_summary(self, path=None, query=None):
+        """
+        Get latency and throughput of every endpoint and response cache counters.
+        :return: JSON bytes.
+        """
+        uptime = time.perf_counter() - self.started
+        with self.lock:
+            summary = {endpoint: metrics.summary(uptime)
+                       for endpoint, metrics in self.metrics.items()}
+            summary['cache'] = self.cache.stats()
+        summary['uptime'] = uptime
+        return json.dumps(summary).encode('utf-8')
+
+    def shutdown(self):
+        """
+        Stop the chart worker processes.
+        :return: None
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    Hands GET requests to the AnalysisService of the server.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """
+        Answer a GET request.
+        :return: None
+        """
+        url = urlsplit(self.path)
+        status, content_type, body, tag = self.server.service.handle(
+            url.path, parse_qs(url.query), self.headers.get('If-None-Match'))
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if tag is not None:
+            self.send_header('ETag', tag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Silence the per-request log, see /metrics instead.
+        :return: None
+        """
+
+
+def serve(host='127.0.0.1', port=8000, workers=None, data_file=DATA_FILE):
+    """
+    Load the dataset once and answer requests until interrupted.
+    :param host: Address to listen on.
+    :param port: Port to listen on.
+    :param workers: Number of chart worker processes, None for one per core.
+    :param data_file: Path of the CSV file to analyze.
+    :return: None
+    """
+    service = AnalysisService(StoryTelling(HeadlessController(), data_file), workers)
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f'Serving on http://{host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main():
+    """
+    Run the service from the command line.
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Serve YouTube Trend Analysis aggregates '
+                                                 'and charts over local HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of chart worker processes, one per core by default')
+    parser.add_argument('--data-file', default=DATA_FILE, help='CSV file to analyze')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.data_file)
+
+
+if __name__ == '__main__':
+    main()
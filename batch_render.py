@@ -0,0 +1,264 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data_manage import StoryTelling, DATA_FILE, CHART_VERSION, RANK_METRICS
+
+# attributes the create graph page offers for histograms, scatter graphs and bar graphs
+HISTOGRAM_ATTRIBUTES = ['subscribers', 'video views', 'average_monthly_earnings']
+CHART_ATTRIBUTES = ['subscribers', 'video views', 'uploads', 'average_monthly_earnings']
+
+MANIFEST_FILE = 'manifest.json'
+
+# StoryTelling of the worker process, set by init_worker
+worker_story = None
+
+
+class HeadlessController:
+    """
+        Stands in for YouTubeController when charts are rendered without Tk.
+        StoryTelling hands every finished figure to one of the show methods,
+        which keep it so the caller can save it.
+
+        Attributes:
+            figure: The last figure created by StoryTelling.
+    """
+
+    def __init__(self):
+        """
+        Initialize a HeadlessController object.
+        """
+        self.figure = None
+
+    def show_graph(self, fig):
+        """
+        Keep a graph of the 'story telling' menu.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        self.figure = fig
+
+    def show_create_graph(self, fig):
+        """
+        Keep a graph of the 'create graph' page.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        self.figure = fig
+
+    def show_suggest_graph(self, fig):
+        """
+        Keep a graph of the 'suggest channel' menu.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        self.figure = fig
+
+
+def chart_jobs(story):
+    """
+    List every chart the application can draw.
+    :param story: The StoryTelling object.
+    :return: List of (kind, params) tuples.
+    """
+    jobs = [('default_story_graph', ()), ('first_story', (None,)),
+            ('second_story', (None,)), ('third_story', (None,))]
+    jobs += [('create_histogram', (attribute,)) for attribute in HISTOGRAM_ATTRIBUTES]
+    jobs += [('create_scatter', (attribute_1, attribute_2))
+             for attribute_1 in CHART_ATTRIBUTES for attribute_2 in CHART_ATTRIBUTES
+             if attribute_1 != attribute_2]
+    jobs += [('create_pie', (year,)) for year in story.years()]
+    jobs += [('create_bar', (attribute,)) for attribute in CHART_ATTRIBUTES]
+    jobs += [('create_suggest_bar', (category, metric))
+             for category in story.categories() for metric in RANK_METRICS]
+    return jobs
+
+
+def chart_name(kind, params):
+    """
+    Get the file name of a chart without extension.
+    :param kind: Name of the StoryTelling method that creates the chart.
+    :param params: Parameters of the method.
+    :return: File name made of the kind and parameters.
+    """
+    parts = [kind] + [str(param) for param in params if param is not None]
+    return re.sub(r'[^A-Za-z0-9]+', '_', '_'.join(parts)).strip('_')
+
+
+def chart_signature(kind, params, data_version, formats, dpi):
+    """
+    Get a digest of everything a chart's files depend on.
+    :param kind: Name of the StoryTelling method that creates the chart.
+    :param params: Parameters of the method.
+    :param data_version: Version of the dataset.
+    :param formats: Tuple of file formats.
+    :param dpi: Resolution of the files.
+    :return: Hex digest.
+    """
+    key = (kind, params, data_version, CHART_VERSION, formats, dpi)
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def init_worker(story):
+    """
+    Keep the StoryTelling object of a worker process.
+    :param story: The StoryTelling object, inherited without copying when processes fork.
+    :return: None
+    """
+    global worker_story
+    worker_story = story
+
+
+def render_chart(kind, params, path, formats, dpi):
+    """
+    Create a chart and save it in every format, runs in a worker process.
+    :param kind: Name of the StoryTelling method that creates the chart.
+    :param params: Parameters of the method.
+    :param path: Path of the files without extension.
+    :param formats: Tuple of file formats.
+    :param dpi: Resolution of the files.
+    :return: Dictionary of the written files and seconds spent building and saving.
+    """
+    start = time.perf_counter()
+    getattr(worker_story, kind)(*params)
+    fig = worker_story.controller.figure
+    built = time.perf_counter()
+    files = []
+    for file_format in formats:
+        file_path = f'{path}.{file_format}'
+        fig.savefig(file_path, format=file_format, dpi=dpi)
+        files.append(os.path.basename(file_path))
+    return {'files': files, 'build_seconds': built - start,
+            'save_seconds': time.perf_counter() - built}
+
+
+def render_png(kind, params, dpi):
+    """
+    Create a chart and rasterize it to PNG, runs in a worker process.
+    :param kind: Name of the StoryTelling method that creates the chart.
+    :param params: Parameters of the method.
+    :param dpi: Resolution of the image.
+    :return: PNG bytes of the chart.
+    """
+    getattr(worker_story, kind)(*params)
+    buffer = io.BytesIO()
+    worker_story.controller.figure.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+def read_manifest(output_dir):
+    """
+    Read the manifest of the last run.
+    :param output_dir: Directory of the rendered charts.
+    :return: Dictionary of the manifest, empty if there is none.
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(output_dir, manifest):
+    """
+    Write the manifest of a run.
+    :param output_dir: Directory of the rendered charts.
+    :param manifest: Dictionary of the manifest.
+    :return: None
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def render_all(output_dir='reports', formats=('png',), dpi=100, workers=None,
+               data_file=DATA_FILE, force=False):
+    """
+    Render every chart to files with a pool of worker processes. Charts whose
+    signature matches the last run and whose files still exist are skipped.
+    :param output_dir: Directory the charts and the manifest are written to.
+    :param formats: Tuple of file formats, such as 'png' and 'svg'.
+    :param dpi: Resolution of the files.
+    :param workers: Number of worker processes, None for one per core.
+    :param data_file: Path of the CSV file to analyze.
+    :param force: True to render charts even when they are unchanged.
+    :return: Dictionary of the manifest.
+    """
+    start = time.perf_counter()
+    formats = tuple(formats)
+    os.makedirs(output_dir, exist_ok=True)
+    story = StoryTelling(HeadlessController(), data_file)
+    previous = read_manifest(output_dir).get('charts', {})
+    charts = {}
+    pending = []
+    failed = 0
+    for kind, params in chart_jobs(story):
+        name = chart_name(kind, params)
+        signature = chart_signature(kind, params, story.data_version, formats, dpi)
+        entry = previous.get(name)
+        if (not force and entry is not None and entry['signature'] == signature
+                and all(os.path.exists(os.path.join(output_dir, file))
+                        for file in entry['files'])):
+            charts[name] = dict(entry, skipped=True)
+        else:
+            charts[name] = {'kind': kind, 'params': list(params), 'signature': signature}
+            pending.append((name, kind, params))
+
+    workers = workers or os.cpu_count() or 1
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                 initializer=init_worker, initargs=(story,)) as executor:
+            futures = {executor.submit(render_chart, kind, params,
+                                       os.path.join(output_dir, name), formats, dpi): name
+                       for name, kind, params in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    charts[name].update(future.result(), skipped=False)
+                except Exception as error:
+                    # no signature, so the chart is rendered again by the next run
+                    charts[name].update(error=repr(error), files=[], signature=None,
+                                        skipped=False)
+                    failed += 1
+                    print(f'{name}: {error!r}', file=sys.stderr)
+
+    manifest = {'data_version': story.data_version, 'chart_version': CHART_VERSION,
+                'formats': list(formats), 'dpi': dpi, 'workers': workers,
+                'rendered': len(pending) - failed, 'failed': failed,
+                'skipped': len(charts) - len(pending),
+                'seconds': time.perf_counter() - start, 'charts': charts}
+    write_manifest(output_dir, manifest)
+    return manifest
+
+
+def main():
+    """
+    Render every chart from the command line.
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Render every chart of YouTube Trend '
+                                                 'Analysis to files without a window.')
+    parser.add_argument('--output', default='reports', help='directory to write charts to')
+    parser.add_argument('--format', dest='formats', nargs='+', default=['png'],
+                        choices=['png', 'svg'], help='file formats to write')
+    parser.add_argument('--dpi', type=int, default=100, help='resolution of the files')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes, one per core by default')
+    parser.add_argument('--data-file', default=DATA_FILE, help='CSV file to analyze')
+    parser.add_argument('--force', action='store_true', help='render unchanged charts too')
+    args = parser.parse_args()
+    manifest = render_all(args.output, args.formats, args.dpi, args.workers,
+                          args.data_file, args.force)
+    print(f"Rendered {manifest['rendered']} charts, skipped {manifest['skipped']} unchanged, "
+          f"failed {manifest['failed']}, in {manifest['seconds']:.1f} s "
+          f"with {manifest['workers']} workers")
+
+
+if __name__ == '__main__':
+    main()
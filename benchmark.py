@@ -0,0 +1,336 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from data_cache import DatasetCache
+from data_manage import (StoryTelling, CLEANING_VERSION, STREAM_THRESHOLD, prepare_frame,
+                         compact_frame)
+from render_pipeline import rasterize
+
+# share of each category in the real dataset, channels are drawn with these weights
+CATEGORY_WEIGHTS = {
+    'Entertainment': 0.254, 'Music': 0.213, 'People & Blogs': 0.139, 'Gaming': 0.099,
+    'Comedy': 0.073, 'Film & Animation': 0.048, 'Education': 0.047, 'Howto & Style': 0.042,
+    'News & Politics': 0.027, 'Science & Technology': 0.018, 'Shows': 0.014, 'Sports': 0.012,
+    'Pets & Animals': 0.004, 'Trailers': 0.002, 'Nonprofits & Activism': 0.002,
+    'Movies': 0.002, 'Autos & Vehicles': 0.002, 'Travel & Events': 0.001,
+}
+
+# number of channels created in each year in the real dataset
+YEAR_WEIGHTS = {
+    2005: 24, 2006: 91, 2007: 49, 2008: 46, 2009: 52, 2010: 48, 2011: 82, 2012: 68, 2013: 76,
+    2014: 98, 2015: 73, 2016: 77, 2017: 68, 2018: 46, 2019: 33, 2020: 30, 2021: 23, 2022: 5,
+}
+
+# share of rows with a missing category, a missing created year and created year 1970,
+# so every cleaning rule has rows to work on
+MISSING_CATEGORY = 0.03
+MISSING_YEAR = 0.005
+YEAR_1970 = 0.001
+
+# rows generated and written at a time, so large files never have to fit in memory
+GENERATE_CHUNK = 1_000_000
+
+# directory generated datasets are kept in between runs
+BENCH_DIR = os.path.join('.cache', 'bench')
+
+# size of the image charts are rasterized to
+CHART_SIZE = (1000, 600)
+
+# a stage regresses when it is slower or uses more memory than the baseline by more
+# than this fraction, and by more than the absolute slack
+TOLERANCE = 0.25
+TIME_SLACK = 0.005
+MEMORY_SLACK = 1024 ** 2
+
+
+def generate_chunk(rows, rng, start=0):
+    """
+    Generate rows with the schema of 'Global YouTube Statistics.csv'. Subscribers
+    follow a Pareto tail above the 12.3 million of the smallest real channel,
+    views, uploads and earnings are log-normal and views and earnings grow
+    with subscribers.
+    :param rows: Number of rows.
+    :param rng: numpy random Generator.
+    :param start: Number of the first channel, used in channel names.
+    :return: DataFrame of generated rows.
+    """
+    subscribers = np.round(12.3e6 * (1 + rng.pareto(2.2, rows)), -5).astype('int64')
+    views = subscribers * rng.lognormal(np.log(450), 0.9, rows)
+    views[rng.random(rows) < 0.01] = 0.0
+    uploads = rng.lognormal(np.log(730), 1.8, rows).astype('int64')
+    lowest = np.round(views * rng.lognormal(np.log(1.2e-6), 1.1, rows), 2)
+    lowest[rng.random(rows) < 0.05] = 0.0
+    highest = np.round(lowest * rng.uniform(12, 20, rows), 2)
+
+    categories = np.array(list(CATEGORY_WEIGHTS), dtype=object)
+    weights = np.array(list(CATEGORY_WEIGHTS.values()))
+    category = categories[rng.choice(len(categories), rows, p=weights / weights.sum())]
+    category[rng.random(rows) < MISSING_CATEGORY] = None
+
+    years = np.array(list(YEAR_WEIGHTS), dtype='float64')
+    weights = np.array(list(YEAR_WEIGHTS.values()), dtype='float64')
+    created_year = years[rng.choice(len(years), rows, p=weights / weights.sum())]
+    draw = rng.random(rows)
+    created_year[draw < MISSING_YEAR] = np.nan
+    created_year[(draw >= MISSING_YEAR) & (draw < MISSING_YEAR + YEAR_1970)] = 1970
+
+    # digits and punctuation in names give the strip rule something to remove
+    names = pd.Series(np.arange(start, start + rows)).map('Channel {:x}!'.format)
+    return pd.DataFrame({
+        'Youtuber': names,
+        'subscribers': subscribers,
+        'video views': views,
+        'category': category,
+        'uploads': uploads,
+        'lowest_monthly_earnings': lowest,
+        'highest_monthly_earnings': highest,
+        'created_year': created_year,
+    })
+
+
+def generate_dataset(path, rows, seed=0, chunk=GENERATE_CHUNK):
+    """
+    Write a synthetic dataset to a CSV file chunk by chunk.
+    :param path: Path of the CSV file.
+    :param rows: Number of rows.
+    :param seed: Seed of the random generator, the same seed gives the same file.
+    :param chunk: Number of rows generated at a time.
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='latin-1', newline='') as file:
+        for start in range(0, rows, chunk):
+            frame = generate_chunk(min(chunk, rows - start), rng, start)
+            frame.to_csv(file, header=start == 0, index=False)
+    os.replace(tmp_path, path)
+
+
+def dataset_path(rows, seed=0):
+    """
+    Get the path of a synthetic dataset, generating it on first use.
+    :param rows: Number of rows.
+    :param seed: Seed of the random generator.
+    :return: Path of the CSV file.
+    """
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f'youtube_{rows}_{seed}.csv')
+    if not os.path.exists(path):
+        generate_dataset(path, rows, seed)
+    return path
+
+
+class BenchController:
+    """
+        Stands in for YouTubeController and rasterizes every figure, so chart
+        stages include the cost of drawing them.
+    """
+
+    def show_graph(self, fig):
+        """
+        Rasterize a graph of the 'story telling' menu.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        rasterize(fig, *CHART_SIZE)
+
+    def show_create_graph(self, fig):
+        """
+        Rasterize a graph of the 'create graph' page.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        rasterize(fig, *CHART_SIZE)
+
+    def show_suggest_graph(self, fig):
+        """
+        Rasterize a graph of the 'suggest channel' menu.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        rasterize(fig, *CHART_SIZE)
+
+
+def measure(stage, repeat=1):
+    """
+    Measure a stage, timed without tracing and then run again under tracemalloc,
+    so tracing overhead does not count against its time.
+    :param stage: Function without arguments.
+    :param repeat: Number of timed runs, the fastest one is kept.
+    :return: Dictionary of 'seconds' and 'peak_bytes'.
+    """
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        stage()
+        seconds.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_bytes': peak}
+
+
+def chart_stage(story, method, *params):
+    """
+    Get a stage that draws a chart with cold aggregate and figure caches.
+    :param story: The StoryTelling object.
+    :param method: Name of the StoryTelling method that creates the chart.
+    :param params: Parameters of the method.
+    :return: Function without arguments.
+    """
+    def stage():
+        story.aggregate_cache.clear()
+        story.charts.clear()
+        getattr(story, method)(*params)
+    return stage
+
+
+def benchmark_dataset(path, repeat=1, log=print):
+    """
+    Measure every StoryTelling stage on a dataset in isolation.
+    :param path: Path of the CSV file.
+    :param repeat: Number of timed runs of each stage.
+    :param log: Function called with the name of each stage before it runs.
+    :return: Dictionary of measurements keyed by stage.
+    """
+    results = {}
+    streaming = os.path.getsize(path) > STREAM_THRESHOLD
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    try:
+        if streaming:
+            log('stream_csv')
+            results['stream_csv'] = measure(
+                lambda: StoryTelling(BenchController(), path, streaming=True), 1)
+            story = StoryTelling(BenchController(), path, streaming=True)
+        else:
+            raw = {}
+            cleaned = {}
+            cache = DatasetCache(path, CLEANING_VERSION, cache_dir)
+            log('read_csv')
+            results['read_csv'] = measure(
+                lambda: raw.update(frame=pd.read_csv(path, encoding='latin-1')), repeat)
+            log('clean_data')
+            results['clean_data'] = measure(
+                lambda: cleaned.update(frame=prepare_frame(raw['frame'])), repeat)
+            del raw['frame']
+            log('compact_frame')
+            results['compact_frame'] = measure(
+                lambda: cleaned.update(compact=compact_frame(cleaned['frame'])), repeat)
+            cleaned['frame'] = cleaned.pop('compact')
+            log('cache_save')
+            results['cache_save'] = measure(lambda: cache.save(cleaned['frame']), repeat)
+            log('cache_load')
+            results['cache_load'] = measure(cache.load, repeat)
+            del cleaned['frame']
+            story = StoryTelling(BenchController(), path, streaming=False)
+        log('build_indexes')
+        results['build_indexes'] = measure(story.data_changed, repeat)
+
+        category = story.categories()[0]
+        stages = [
+            ('default_story_graph', chart_stage(story, 'default_story_graph')),
+            ('first_story', chart_stage(story, 'first_story', None)),
+            ('second_story', chart_stage(story, 'second_story', None)),
+            ('third_story', chart_stage(story, 'third_story', None)),
+            ('create_histogram', chart_stage(story, 'create_histogram', 'subscribers')),
+            ('create_scatter', chart_stage(story, 'create_scatter', 'subscribers', 'video views')),
+            ('create_pie', chart_stage(story, 'create_pie', story.years()[0])),
+            ('create_bar', chart_stage(story, 'create_bar', 'subscribers')),
+            ('suggest_top_10', lambda: story.top_channels(category, 'subscribers')),
+            ('create_suggest_bar', chart_stage(story, 'create_suggest_bar_sub', category)),
+        ]
+        for name, stage in stages:
+            log(name)
+            results[name] = measure(stage, repeat)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Find stages that are slower or use more memory than the baseline.
+    :param results: Dictionary of measurements keyed by number of rows, then by stage.
+    :param baseline: Dictionary of the same shape.
+    :param tolerance: Fraction a measurement may exceed the baseline by.
+    :return: List of messages describing each regression.
+    """
+    regressions = []
+    for rows, stages in results.items():
+        for stage, measured in stages.items():
+            expected = baseline.get(rows, {}).get(stage)
+            if expected is None:
+                continue
+            seconds, limit = measured['seconds'], expected['seconds'] * (1 + tolerance)
+            if seconds > limit and seconds - expected['seconds'] > TIME_SLACK:
+                regressions.append(f'{rows} rows {stage}: {seconds:.4f} s, '
+                                   f'baseline {expected["seconds"]:.4f} s')
+            peak, limit = measured['peak_bytes'], expected['peak_bytes'] * (1 + tolerance)
+            if peak > limit and peak - expected['peak_bytes'] > MEMORY_SLACK:
+                regressions.append(f'{rows} rows {stage}: {peak / 1024 ** 2:.1f} MB peak, '
+                                   f'baseline {expected["peak_bytes"] / 1024 ** 2:.1f} MB')
+    return regressions
+
+
+def main():
+    """
+    Run the benchmark from the command line.
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Benchmark every StoryTelling stage on '
+                                                 'synthetic datasets.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000],
+                        help='dataset sizes to benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic datasets')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs of each stage, the fastest one is kept')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='file the results are written to')
+    parser.add_argument('--baseline', help='results to compare against, fails on regression')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='fraction a stage may exceed the baseline by')
+    args = parser.parse_args()
+
+    results = {}
+    for rows in args.rows:
+        path = dataset_path(rows, args.seed)
+        print(f'{rows} rows ({os.path.getsize(path) / 1024 ** 2:.1f} MB)')
+        results[str(rows)] = benchmark_dataset(
+            path, args.repeat, lambda name: print(f'  {name}', end='', flush=True))
+        print()
+        for stage, measured in results[str(rows)].items():
+            print(f'  {stage:<22} {measured["seconds"]:>10.4f} s '
+                  f'{measured["peak_bytes"] / 1024 ** 2:>10.1f} MB')
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({'python': platform.python_version(), 'pandas': pd.__version__,
+                   'machine': platform.machine(), 'seed': args.seed, 'results': results},
+                  file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f'REGRESSION {message}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
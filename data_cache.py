@@ -0,0 +1,156 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from tracing import tracer
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+
+class DatasetCache:
+    """
+        A persistent on-disk cache of the cleaned YouTube dataset.
+
+        The cleaned frame is stored as an uncompressed Feather (Arrow IPC) file,
+        which is memory-mapped on load, so reading it needs no parsing or
+        cleaning. The file keeps the compact column types of the frame, so it
+        is loaded without converting any column. Converting it to a DataFrame
+        still copies every column once, apart from Arrow strings.
+        The cache is keyed on the source file's size, modification time and
+        content hash plus the version of the cleaning rules, and is rebuilt
+        whenever any of them change.
+
+        Attributes:
+            source: Path of the source CSV file.
+            version: Version of the cleaning rules applied to the cached frame.
+            cache_dir: Directory holding the cached frame and its metadata.
+    """
+
+    def __init__(self, source, version, cache_dir='.cache'):
+        """
+        Initialize a DatasetCache object.
+        :param source: Path of the source CSV file.
+        :param version: Version of the cleaning rules.
+        :param cache_dir: Directory holding the cache files.
+        """
+        self.source = source
+        self.version = version
+        self.cache_dir = cache_dir
+        name = os.path.splitext(os.path.basename(source))[0].replace(' ', '_')
+        self.data_path = os.path.join(cache_dir, f'{name}.feather')
+        self.meta_path = os.path.join(cache_dir, f'{name}.json')
+        self._fingerprint = None
+
+    @staticmethod
+    def available():
+        """
+        Check whether the columnar format is available.
+        :return: True if pyarrow is installed.
+        """
+        return feather is not None
+
+    def file_hash(self):
+        """
+        Calculate content hash of the source file.
+        :return: Hex digest of the source file content.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.source, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def fingerprint(self):
+        """
+        Get content hash of the source file, computed at most once.
+        :return: Hex digest of the source file content.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = self.file_hash()
+        return self._fingerprint
+
+    def read_meta(self):
+        """
+        Read metadata of the cached frame.
+        :return: Dictionary of metadata, or None if there is no usable cache.
+        """
+        if not (os.path.exists(self.meta_path) and os.path.exists(self.data_path)):
+            return None
+        try:
+            with open(self.meta_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def is_valid(self):
+        """
+        Check whether the cached frame matches the source file and cleaning rules.
+        Content hash is only computed when size or mtime changed, so an untouched
+        source file is validated without reading it.
+        :return: True if the cached frame can be used.
+        """
+        meta = self.read_meta()
+        if meta is None or meta.get('version') != self.version:
+            return False
+        stat = os.stat(self.source)
+        if meta.get('size') != stat.st_size:
+            return False
+        if meta.get('mtime') == stat.st_mtime_ns:
+            self._fingerprint = meta.get('hash')
+            return True
+        if meta.get('hash') != self.fingerprint():
+            return False
+        # content is unchanged, only refresh mtime so the next check is cheap
+        meta['mtime'] = stat.st_mtime_ns
+        self.write_meta(meta)
+        return True
+
+    @tracer.traced('data')
+    def load(self):
+        """
+        Load cleaned frame from cache. The file is memory-mapped and to_pandas
+        copies its columns into the DataFrame, a single pass over the data.
+        Categoricals and narrow integers come back as they were saved, and
+        large_string columns, which pandas writes for 'string[pyarrow]' and
+        never for object columns, are wrapped as Arrow strings without a copy.
+        :return: Cached DataFrame, or None if the cache is missing or stale.
+        """
+        if not self.available() or not self.is_valid():
+            return None
+        try:
+            table = feather.read_table(self.data_path, memory_map=True)
+        except (OSError, ValueError):
+            return None
+        return table.to_pandas(types_mapper={pa.large_string(): pd.StringDtype('pyarrow')}.get)
+
+    @tracer.traced('data')
+    def save(self, df):
+        """
+        Save cleaned frame to cache.
+        :param df: Cleaned DataFrame.
+        :return: None
+        """
+        if not self.available():
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stat = os.stat(self.source)
+        tmp_path = self.data_path + '.tmp'
+        feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, self.data_path)
+        self.write_meta({'version': self.version, 'size': stat.st_size,
+                         'mtime': stat.st_mtime_ns, 'hash': self.fingerprint()})
+
+    def write_meta(self, meta):
+        """
+        Write metadata of the cached frame.
+        :param meta: Dictionary of metadata.
+        :return: None
+        """
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, self.meta_path)
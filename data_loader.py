@@ -0,0 +1,92 @@
+import sys
+import time
+import queue
+import threading
+import traceback
+
+
+class DataLoader:
+    """
+        Runs a slow load in a background thread and hands its progress and
+        result back to the Tk thread, so the window stays responsive while
+        the dataset is read and cleaned.
+
+        The Tk thread polls for messages with after() and never waits on the
+        worker.
+
+        Attributes:
+            widget: Tk widget used to schedule polling on the Tk thread.
+            load: Function that takes a progress function and returns the result.
+            on_progress: Function called on the Tk thread with each progress message.
+            on_done: Function called on the Tk thread with the result and the
+                exception raised by load, if any.
+            poll_interval: Milliseconds between polls while the load runs.
+            elapsed: Seconds spent in load.
+    """
+
+    def __init__(self, widget, load, on_progress, on_done, poll_interval=50):
+        """
+        Initialize a DataLoader object.
+        :param widget: Tk widget used to schedule polling on the Tk thread.
+        :param load: Function that takes a progress function and returns the result.
+        :param on_progress: Function called on the Tk thread with each progress message.
+        :param on_done: Function called on the Tk thread with the result and the error.
+        :param poll_interval: Milliseconds between polls while the load runs.
+        """
+        self.widget = widget
+        self.load = load
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.poll_interval = poll_interval
+        self.messages = queue.Queue()
+        self.thread = None
+        self.elapsed = 0.0
+
+    def start(self):
+        """
+        Start the load in a background thread.
+        :return: None
+        """
+        self.thread = threading.Thread(target=self.run, name='data-loader', daemon=True)
+        self.thread.start()
+        self.widget.after(self.poll_interval, self.poll)
+
+    def run(self):
+        """
+        Run the load, runs in the background thread.
+        :return: None
+        """
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self.load(self.report)
+        except Exception as exception:
+            error = exception
+            traceback.print_exc(file=sys.stderr)
+        self.elapsed = time.perf_counter() - start
+        self.messages.put(('done', (result, error)))
+
+    def report(self, message):
+        """
+        Report progress of the load, called from the background thread.
+        :param message: Text describing the current step.
+        :return: None
+        """
+        self.messages.put(('progress', message))
+
+    def poll(self):
+        """
+        Hand progress messages and the result to the callbacks, runs on the Tk thread.
+        :return: None
+        """
+        while True:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.on_progress(payload)
+            else:
+                self.on_done(*payload)
+                return
+        self.widget.after(self.poll_interval, self.poll)
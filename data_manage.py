@@ -1,7 +1,1039 @@
-import re
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import seaborn as sns
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from matplotlib.ticker import AutoLocator, ScalarFormatter
+from data_cache import DatasetCache
+from data_stream import StatsEngine, stream_csv
+from tracing import tracer
+
+DATA_FILE = 'Global YouTube Statistics.csv'
+
+# bump whenever CLEANING_RULES, find_average_earning or compact_frame changes the resulting frame
+CLEANING_VERSION = 4
+
+# bump whenever a chart method changes how it draws, so cached images are not reused
+CHART_VERSION = 6
+
+# files larger than this are read in chunks instead of being loaded at once
+STREAM_THRESHOLD = 2 * 1024 ** 3
+
+# scatter plots of at least this many points are drawn as a density image
+DENSITY_THRESHOLD = 200_000
+
+# number of bins along each axis of the density image
+DENSITY_BINS = 256
+
+# normal quantile of the two-sided 95% confidence band of regression lines
+CONFIDENCE_Z = 1.959963984540054
+
+# number of fine bins the kernel density estimate is evaluated on
+KDE_RESOLUTION = 1024
+
+# histograms of more values than this use Sturges' rule, which only needs their range
+AUTO_BINS_LIMIT = 1_000_000
+
+# values further than this many interquartile ranges past the quartiles are outliers
+OUTLIER_K = 1.5
+
+# metrics channels can be ranked by on the suggestion page, with their display names
+RANK_METRICS = {
+    'subscribers': 'Subscribers',
+    'video views': 'Video views',
+    'uploads': 'Uploaded videos',
+    'average_monthly_earnings': 'Average monthly earnings',
+}
+
+# number of top channels kept per category and metric by TopKIndex
+TOP_K = 10
+
+# columns filtered through a bitmap of the rows holding each of their values
+BITMAP_COLUMNS = ['category', 'created_year']
+
+# rows of a ranking scanned at a time for the top channels of a filtered story
+TOP_SCAN_BLOCK = 65_536
+
+# number of filtered stories kept, see StoryTelling.filtered
+FILTERED_STORIES = 8
+
+# memory budget of derived tables memoized by AggregateCache
+AGGREGATE_CACHE_BUDGET = 64 * 1024 ** 2
+
+# (name, action, column, argument) applied by clean_frame in a single pass
+#   fill         - fill missing values of column with argument
+#   drop_missing - drop rows where column is missing
+#   drop_value   - drop rows where column equals argument
+#   strip        - remove every match of the regex argument from column
+CLEANING_RULES = [
+    ('fill_missing_category', 'fill', 'category', 'Other'),
+    ('drop_missing_created_year', 'drop_missing', 'created_year', None),
+    # YouTube is created in 2005
+    ('drop_created_year_1970', 'drop_value', 'created_year', 1970),
+    ('strip_non_letters_youtuber', 'strip', 'Youtuber', r'[^a-zA-Z]'),
+]
+
+
+# columns with few distinct values, stored as categoricals of integer codes
+CATEGORY_COLUMNS = ['category', 'Country', 'channel_type']
+
+# name of a channel as exported, kept by prepare_frame before cleaning strips 'Youtuber',
+# deltas and snapshots are matched to channels by it
+KEY_COLUMN = 'channel_name'
+
+# columns of free text, stored as Arrow strings, or interned when pyarrow is missing
+TEXT_COLUMNS = ['Youtuber', 'Title', KEY_COLUMN]
+
+
+def frame_rows(df, *args, **kwargs):
+    """
+    Count rows of the frame passed to a traced function.
+    :param df: DataFrame.
+    :return: Number of rows.
+    """
+    return len(df)
+
+
+def dataset_rows(story, *args, **kwargs):
+    """
+    Count rows of the dataset of a traced StoryTelling method.
+    :param story: The StoryTelling object.
+    :return: Number of rows, None before the dataset is loaded.
+    """
+    selection = getattr(story, 'selection', None)
+    if selection is not None:
+        # rows of a filtered story are only copied out when a chart needs them
+        return len(selection)
+    data = getattr(story, 'youtube_data', None)
+    return None if data is None else len(data)
+
+
+@tracer.traced('data', rows=frame_rows)
+def clean_frame(df, rules=CLEANING_RULES, report=None):
+    """
+    Clean data with vectorized operations. Every drop rule is combined into one
+    boolean mask so the frame is filtered and copied only once, then fill and
+    strip rules run column-wise on the remaining rows.
+    :param df: DataFrame read from the dataset.
+    :param rules: List of cleaning rules, see CLEANING_RULES.
+    :param report: Dictionary that number of rows touched by each rule is added to.
+    :return: Cleaned DataFrame
+    """
+    touched = {}
+    keep = pd.Series(True, index=df.index)
+    for name, action, column, argument in rules:
+        if action == 'drop_missing':
+            drop = df[column].isna()
+        elif action == 'drop_value':
+            drop = df[column] == argument
+        else:
+            continue
+        touched[name] = int(drop.sum())
+        keep &= ~drop
+    df = df[keep].copy()
+
+    for name, action, column, argument in rules:
+        if action == 'fill':
+            missing = df[column].isna()
+            touched[name] = int(missing.sum())
+            if touched[name]:
+                df[column] = df[column].fillna(argument)
+        elif action == 'strip':
+            values = df[column]
+            if DatasetCache.available():
+                # arrow string kernels run the regex without a Python call per row
+                stripped = values.astype('string[pyarrow]').str.replace(argument, '', regex=True)
+                stripped = stripped.astype(object)
+            else:
+                stripped = values.str.replace(argument, '', regex=True)
+            touched[name] = int((stripped != values).sum())
+            df[column] = stripped
+        elif action not in ('drop_missing', 'drop_value'):
+            raise ValueError(f'Unknown cleaning action: {action}')
+
+    if report is not None:
+        for name, count in touched.items():
+            report[name] = report.get(name, 0) + count
+    return df
+
+
+def add_average_earning(df):
+    """
+    Calculate average monthly earning
+    :param df: Cleaned DataFrame.
+    :return: DataFrame with 'average_monthly_earnings' column
+    """
+    df['average_monthly_earnings'] = (df['highest_monthly_earnings'] +
+                                      df['lowest_monthly_earnings']) / 2
+    return df
+
+
+def prepare_frame(df, report=None):
+    """
+    Clean data and calculate average monthly earning. The name of each channel
+    is copied to KEY_COLUMN first, so it still identifies the channel after
+    cleaning has stripped 'Youtuber' down to letters.
+    :param df: DataFrame read from the dataset.
+    :param report: Dictionary that number of rows touched by each cleaning rule is added to.
+    :return: DataFrame ready for analysis
+    """
+    if KEY_COLUMN not in df:
+        df = df.assign(**{KEY_COLUMN: df['Youtuber']})
+    return add_average_earning(clean_frame(df, report=report))
+
+
+def narrow_numeric(values):
+    """
+    Store a numeric column in the smallest type that holds every value exactly.
+    Integers are downcast, floats only when every value is a whole number and
+    the integer type is smaller, so no value or missing value is lost.
+    :param values: Numeric Series.
+    :return: Series of the same values.
+    """
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return pd.to_numeric(values, downcast='integer')
+    if not pd.api.types.is_float_dtype(values.dtype) or values.isna().any():
+        return values
+    array = values.to_numpy()
+    if not (np.abs(array) < 2 ** 53).all() or (array % 1 != 0).any():
+        return values
+    narrowed = pd.to_numeric(values.astype('int64'), downcast='integer')
+    return narrowed if narrowed.dtype.itemsize < values.dtype.itemsize else values
+
+
+@tracer.traced('data', rows=frame_rows)
+def compact_frame(df):
+    """
+    Store a cleaned frame in compact column types: CATEGORY_COLUMNS as
+    categoricals, so groupbys run on integer codes, TEXT_COLUMNS as Arrow
+    strings and numeric columns in the narrowest exact type, such as int16
+    for created_year. Columns that are already compact are left as they are.
+    :param df: Cleaned DataFrame.
+    :return: DataFrame with the same values.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in CATEGORY_COLUMNS:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+        elif column in TEXT_COLUMNS:
+            if DatasetCache.available():
+                if values.dtype != 'string[pyarrow]':
+                    values = values.astype('string[pyarrow]')
+            elif values.dtype == object:
+                # equal names share one string object
+                values = values.map(sys.intern, na_action='ignore')
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            values = narrow_numeric(values)
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def memory_report(df):
+    """
+    Measure memory held by each column of a frame.
+    :param df: DataFrame.
+    :return: DataFrame indexed by column with 'dtype' and 'bytes' columns and a 'total' row.
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report.loc['total'] = ['', int(usage.sum())]
+    return report
+
+
+def year_category_counts(df):
+    """
+    Count channels created in each year for each category.
+    :param df: DataFrame with 'created_year' and 'category' columns.
+    :return: DataFrame indexed by year with a column for each category.
+    """
+    counts = df.groupby(['created_year', 'category'], observed=True).size()
+    counts = counts.unstack(fill_value=0)
+    counts.index = counts.index.astype(int)
+    counts.columns = counts.columns.astype(object)
+    counts.columns.name = 'category'
+    return counts
+
+
+def category_sums(df):
+    """
+    Sum and count non-missing values of every numeric column for each category.
+    :param df: DataFrame with 'category' column.
+    :return: Tuple of DataFrames of sums and counts, indexed by category.
+    """
+    columns = list(df.select_dtypes('number').columns)
+    grouped = df.groupby('category', observed=True)[columns]
+    sums, counts = grouped.sum(), grouped.count()
+    sums.index = sums.index.astype(object)
+    counts.index = counts.index.astype(object)
+    return sums, counts
+
+
+def blank_keys(keys):
+    """
+    Find channel names that cannot identify a channel.
+    :param keys: Series of KEY_COLUMN.
+    :return: Boolean array, True where the name is missing or only white space.
+    """
+    return keys.isna().to_numpy() | (keys.astype(object).fillna('').str.strip() == '').to_numpy()
+
+
+def key_positions(keys):
+    """
+    Map channel names to their row positions.
+    :param keys: Series of KEY_COLUMN.
+    :return: Tuple of a dictionary of the position of each name found in a single
+        row, and the set of names found in several rows, which cannot be matched.
+    """
+    repeated = keys.duplicated(keep=False).to_numpy()
+    unique = ~repeated
+    return (dict(zip(keys[unique], np.flatnonzero(unique).tolist())),
+            set(keys[repeated].dropna()))
+
+
+def align_columns(df, delta):
+    """
+    Give a delta the column types of the table it is applied to. Categories
+    new to the table are added to it, keeping them sorted, and numeric columns
+    of either frame are widened when the other needs a larger type.
+    :param df: Compact DataFrame, see compact_frame.
+    :param delta: Compact DataFrame with the same columns.
+    :return: Tuple of the table and the delta, the table is copied only if a type changed.
+    """
+    widened = {}
+    aligned = {}
+    for column in df.columns:
+        values, changes = df[column], delta[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            known = values.cat.categories
+            new = changes.dropna().unique()
+            if not pd.Index(new).isin(known).all():
+                values = values.cat.set_categories(known.union(new).sort_values())
+                widened[column] = values
+            changes = changes.astype(values.dtype)
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            dtype = np.result_type(values.dtype, changes.dtype)
+            if dtype != values.dtype:
+                widened[column] = values.astype(dtype)
+            changes = changes.astype(dtype)
+        else:
+            changes = changes.astype(values.dtype)
+        aligned[column] = changes
+    if widened:
+        df = df.assign(**widened)
+    return df, pd.DataFrame(aligned, index=delta.index)
+
+
+def make_filter(categories=(), years=(None, None), ranges=()):
+    """
+    Build a filter of the form the filter bar sets, see FilterIndex.select.
+    :param categories: Category names a channel may have, empty for any.
+    :param years: Tuple of the first and last created year, None for open ends.
+    :param ranges: List of (column, low, high) bounds of numeric columns, None for open ends.
+    :return: Tuple of clauses, empty when nothing is filtered.
+    """
+    clauses = []
+    if categories:
+        clauses.append((('in', 'category', tuple(sorted(categories))),))
+    if years[0] is not None or years[1] is not None:
+        clauses.append((('range', 'created_year', years[0], years[1]),))
+    for column, low, high in ranges:
+        if low is not None or high is not None:
+            clauses.append((('range', column, low, high),))
+    return tuple(clauses)
+
+
+def filter_digest(row_filter):
+    """
+    Get a short digest identifying a filter in data versions.
+    :param row_filter: Tuple of clauses, see FilterIndex.select.
+    :return: Hex digest.
+    """
+    return hashlib.sha1(repr(row_filter).encode('utf-8')).hexdigest()[:12]
+
+
+def scale_x_ticks(ax, name):
+    """
+    Label the x axis in millions or hundred thousands when values are large.
+    :param ax: The matplotlib axes object.
+    :param name: Name of the attribute on the x axis.
+    :return: None
+    """
+    if max(ax.get_xticks()) > 1e6:
+        if max(ax.get_xticks()) > 1e7:
+            ax.set_xlim(left=0)
+            ax.set_xticks(ax.get_xticks())
+            new_xtick_labels = [f'{int(label / 1e6)}' for label in ax.get_xticks()]
+            ax.set_xticklabels(new_xtick_labels)
+            ax.set_xlabel(f'{name} (million)')
+        else:
+            ax.set_xlim(left=0)
+            ax.set_xticks(ax.get_xticks())
+            new_xtick_labels = [f'{int(label / 1e5)}' for label in ax.get_xticks()]
+            ax.set_xticklabels(new_xtick_labels)
+            ax.set_xlabel(f'{name} (hundred thousand)')
+    else:
+        ax.set_xlabel(f'{name}')
+
+
+def reset_axis(axis):
+    """
+    Give an axis back automatic limits and ticks after its artists were updated.
+    :param axis: The matplotlib axis object, ax.xaxis or ax.yaxis.
+    :return: None
+    """
+    axis.set_major_locator(AutoLocator())
+    axis.set_major_formatter(ScalarFormatter())
+
+
+def fit_line(x, y, log=False, points=100):
+    """
+    Fit an ordinary least squares line and its 95% confidence band in closed form.
+    The band of the mean response is t * s * sqrt(1/n + (x - mean)^2 / Sxx), with
+    the normal quantile standing in for t, so no resampling is needed.
+    :param x: Array of values of the horizontal axis, missing values are ignored.
+    :param y: Array of values of the vertical axis, missing values are ignored.
+    :param log: True to fit log10(y) against log10(x), only positive pairs are used.
+    :param points: Number of points the line and band are evaluated at.
+    :return: Dictionary of 'grid', 'line', 'lower', 'upper', 'slope', 'intercept'
+        and 'count', or None if there are fewer than two points.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    keep = np.isfinite(x) & np.isfinite(y)
+    if log:
+        keep &= (x > 0) & (y > 0)
+    x, y = x[keep], y[keep]
+    if log:
+        x, y = np.log10(x), np.log10(y)
+    count = len(x)
+    if count < 2:
+        return None
+    x_mean, y_mean = x.mean(), y.mean()
+    dx = x - x_mean
+    sxx = dx @ dx
+    slope = (dx @ (y - y_mean)) / sxx if sxx > 0 else 0.0
+    intercept = y_mean - slope * x_mean
+    residual = y - (intercept + slope * x)
+    variance = residual @ residual / (count - 2) if count > 2 else 0.0
+    grid = np.linspace(x.min(), x.max(), points)
+    line = intercept + slope * grid
+    if sxx > 0:
+        half = CONFIDENCE_Z * np.sqrt(variance * (1 / count + (grid - x_mean) ** 2 / sxx))
+    else:
+        half = np.zeros(points)
+    lower, upper = line - half, line + half
+    if log:
+        grid, line, lower, upper = 10 ** grid, 10 ** line, 10 ** lower, 10 ** upper
+    return {'grid': grid, 'line': line, 'lower': lower, 'upper': upper,
+            'slope': float(slope), 'intercept': float(intercept), 'count': count}
+
+
+def draw_fit(ax, fit, color):
+    """
+    Draw a regression line and its confidence band.
+    :param ax: The matplotlib axes object.
+    :param fit: Dictionary returned by fit_line, nothing is drawn if None.
+    :param color: Color of the line and band.
+    :return: None
+    """
+    if fit is None:
+        return
+    ax.plot(fit['grid'], fit['line'], color=color,
+            linewidth=mpl.rcParams['lines.linewidth'] * 1.5)
+    ax.fill_between(fit['grid'], fit['lower'], fit['upper'], facecolor=color, alpha=.15)
+
+
+def inlier_mask(df, column, by='category', k=OUTLIER_K):
+    """
+    Flag values within k times the interquartile range of their group's
+    quartiles. Quartiles of every group come from one groupby-quantile pass
+    and are broadcast back to the rows, so no Python code runs per group.
+    :param df: DataFrame holding column and by.
+    :param column: Numeric column name.
+    :param by: Column name of the groups.
+    :param k: Multiple of the interquartile range past the quartiles that is kept.
+    :return: Boolean Series aligned with df, False for outliers and missing values.
+    """
+    grouped = df.groupby(by, sort=False, observed=True)[column]
+    q1 = grouped.transform('quantile', 0.25)
+    q3 = grouped.transform('quantile', 0.75)
+    iqr = q3 - q1
+    return df[column].between(q1 - k * iqr, q3 + k * iqr)
+
+
+def scott_bandwidth(count, std):
+    """
+    Get Scott's rule of thumb bandwidth of a gaussian kernel.
+    :param count: Number of values.
+    :param std: Standard deviation of values.
+    :return: Bandwidth in data units.
+    """
+    return std * count ** -0.2
+
+
+def smooth_counts(counts, width, bandwidth):
+    """
+    Convolve binned counts with a gaussian kernel via FFT, so the cost depends
+    on the number of bins instead of the number of values.
+    :param counts: Array of counts of equally wide bins.
+    :param width: Width of each bin.
+    :param bandwidth: Standard deviation of the kernel in data units.
+    :return: Array of density at each bin center, integrating to one.
+    """
+    counts = np.asarray(counts, dtype='float64')
+    total = counts.sum()
+    if total == 0 or not bandwidth > 0:
+        return np.zeros(len(counts))
+    # kernel is truncated at 4 bandwidths, or at the full range if that is shorter
+    reach = int(min(np.ceil(4 * bandwidth / width), len(counts)))
+    offsets = np.arange(-reach, reach + 1) * width
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    size = len(counts) + len(kernel) - 1
+    smoothed = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)
+    return np.clip(smoothed[reach:reach + len(counts)], 0, None) / total
+
+
+def histogram_kde(values, bins=None, bandwidth=None, resolution=KDE_RESOLUTION):
+    """
+    Bin values once into fine bins, sum them into the histogram bars and
+    smooth them into a kernel density curve scaled to the bars.
+    :param values: Array of values, missing values are ignored.
+    :param bins: Number of bars or a numpy binning rule, None to choose by size.
+    :param bandwidth: Kernel bandwidth in data units, None for Scott's rule.
+    :param resolution: Minimum number of fine bins the curve is evaluated on.
+    :return: Dictionary of 'edges' and 'counts' of the bars, 'grid' and 'curve'
+        of the density in count units, and 'bandwidth'.
+    """
+    values = np.asarray(values, dtype='float64')
+    values = values[np.isfinite(values)]
+    if bins is None:
+        bins = 'auto' if len(values) <= AUTO_BINS_LIMIT else 'sturges'
+    edges = np.histogram_bin_edges(values, bins)
+    bars = len(edges) - 1
+    split = max(1, -(-resolution // bars))
+    fine, fine_edges = np.histogram(values, bins=bars * split, range=(edges[0], edges[-1]))
+    fine_width = fine_edges[1] - fine_edges[0]
+    if bandwidth is None:
+        bandwidth = scott_bandwidth(len(values), values.std(ddof=1)) if len(values) > 1 else 0.0
+    density = smooth_counts(fine, fine_width, bandwidth)
+    return {'edges': edges, 'counts': fine.reshape(bars, split).sum(axis=1),
+            'grid': (fine_edges[:-1] + fine_edges[1:]) / 2,
+            'curve': density * len(values) * (edges[1] - edges[0]),
+            'bandwidth': float(bandwidth)}
+
+
+def draw_histogram(ax, histogram, color, name):
+    """
+    Draw histogram bars with their kernel density curve.
+    :param ax: The matplotlib axes object.
+    :param histogram: Dictionary returned by histogram_kde.
+    :param color: Color of the bars and curve.
+    :param name: Name of the column.
+    :return: None
+    """
+    edges = histogram['edges']
+    ax.bar(edges[:-1], histogram['counts'], width=np.diff(edges), align='edge',
+           color=color, alpha=.75)
+    ax.plot(histogram['grid'], histogram['curve'], color=color)
+    ax.set_xlabel(name)
+    ax.set_ylabel('Count')
+
+
+class AggregateCache:
+    """
+        A memory-bounded LRU cache of derived tables such as per-category means
+        and top channels. Entries are keyed on (operation, parameters, data version)
+        so tables computed from an older version of the dataset are never served.
+        Lookups are safe from several threads. Values are computed outside the
+        lock, so threads missing the same entry at once may both compute it.
+
+        Attributes:
+            budget: Maximum total size of cached values in bytes.
+            size: Current total size of cached values in bytes.
+            hits: Number of lookups answered from the cache.
+            misses: Number of lookups that had to compute the value.
+            evictions: Number of entries evicted to stay within budget.
+    """
+
+    def __init__(self, budget=AGGREGATE_CACHE_BUDGET):
+        """
+        Initialize an empty AggregateCache object.
+        :param budget: Maximum total size of cached values in bytes.
+        """
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def size_of(value):
+        """
+        Estimate memory used by a cached value.
+        :param value: The cached value.
+        :return: Size in bytes.
+        """
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True, deep=True))
+        if hasattr(value, 'nbytes'):
+            return int(value.nbytes)
+        if isinstance(value, dict):
+            value = tuple(value.values())
+        if isinstance(value, tuple):
+            return sum(AggregateCache.size_of(item) for item in value)
+        return sys.getsizeof(value)
+
+    def get(self, operation, params, version, compute):
+        """
+        Get a cached value, computing and caching it on a miss.
+        :param operation: Name of the operation.
+        :param params: Tuple of hashable parameters of the operation.
+        :param version: Version of the dataset the value is computed from.
+        :param compute: Function without arguments that computes the value.
+        :return: The cached or computed value.
+        """
+        key = (operation, params, version)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+        with tracer.span(operation, 'aggregate', params=repr(params)):
+            value = compute()
+        size = self.size_of(value)
+        if size <= self.budget:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = (value, size)
+                    self.size += size
+                while self.size > self.budget:
+                    _, (_, evicted_size) = self.entries.popitem(last=False)
+                    self.size -= evicted_size
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        """
+        Remove all cached values.
+        :return: None
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Get cache counters.
+        :return: Dictionary of hits, misses, evictions, entries and size.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'size': self.size, 'budget': self.budget}
+
+    def __getstate__(self):
+        """
+        Get the state to pickle, such as for worker processes, without the lock.
+        :return: Dictionary of attributes.
+        """
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled AggregateCache object with a new lock.
+        :param state: Dictionary of attributes.
+        :return: None
+        """
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+class TopKIndex:
+    """
+        Positions of the top channels of every category for every ranking metric.
+
+        The index is built with one sort per metric, after which the top K
+        channels of a category are a slice of at most K positions, no matter
+        how many channels the table holds.
+
+        Attributes:
+            max_k: Number of channels kept per category and metric, plus any
+                channels tied with the last one.
+            metrics: Set of indexed metrics.
+            positions: Row positions sorted by metric in descending order,
+                keyed by (metric, category).
+            values: Metric values of the rows in positions, keyed by (metric, category).
+    """
+
+    def __init__(self, df, metrics, max_k=TOP_K):
+        """
+        Build a TopKIndex object.
+        :param df: DataFrame with 'category' column and metric columns.
+        :param metrics: List of numeric column names to rank by.
+        :param max_k: Number of channels kept per category and metric.
+        """
+        self.max_k = max_k
+        self.metrics = set(metrics)
+        self.positions = {}
+        self.values = {}
+        codes, categories = pd.factorize(df['category'])
+        for metric in metrics:
+            values = df[metric].to_numpy(dtype='float64')
+            # sorted by category, then metric descending, missing values last
+            order = np.lexsort((-values, codes))
+            sorted_codes = codes[order]
+            bounds = np.searchsorted(sorted_codes, np.arange(len(categories) + 1))
+            for code, category in enumerate(categories):
+                top = order[bounds[code]:bounds[code + 1]]
+                self.keep(metric, category, top, values[top])
+
+    def keep(self, metric, category, top, top_values):
+        """
+        Store the first max_k positions of a ranking, plus channels tied with the last one.
+        :param metric: Numeric column name.
+        :param category: Category name.
+        :param top: Row positions of the category sorted by metric in descending order.
+        :param top_values: Metric values of the rows in top.
+        :return: None
+        """
+        stop = min(self.max_k, len(top))
+        # keep channels tied with the last one so ties can be returned
+        while stop < len(top) and stop > 0 and top_values[stop] == top_values[stop - 1]:
+            stop += 1
+        self.positions[(metric, category)] = top[:stop]
+        self.values[(metric, category)] = top_values[:stop]
+
+    def updated(self, df, changed):
+        """
+        Build the index of a table after some of its rows changed. Rankings are
+        merged with the changed rows, and a ranking is rebuilt from its category
+        only when one of its own rows changed, since that row may have fallen
+        out of it. Row positions of unchanged rows must stay the same.
+        :param df: DataFrame after the change.
+        :param changed: Array of positions of updated and added rows.
+        :return: New TopKIndex object, the index itself is left unchanged.
+        """
+        index = TopKIndex.__new__(TopKIndex)
+        index.max_k = self.max_k
+        index.metrics = self.metrics
+        index.positions = dict(self.positions)
+        index.values = dict(self.values)
+        changed = np.unique(np.asarray(changed, dtype='int64'))
+        category = df['category']
+        changed_categories = category.iloc[changed].to_numpy(dtype=object)
+        for metric in self.metrics:
+            column = df[metric].to_numpy()
+            rebuilt = set()
+            for (key_metric, key_category), top in self.positions.items():
+                if key_metric == metric and np.isin(top, changed).any():
+                    rows = np.flatnonzero((category == key_category).to_numpy())
+                    rebuilt.add(key_category)
+                    index.rank(metric, key_category, rows, column)
+            for name in set(changed_categories) - rebuilt:
+                rows = changed[changed_categories == name]
+                top = self.positions.get((metric, name))
+                if top is not None:
+                    rows = np.union1d(top, rows)
+                index.rank(metric, name, rows, column)
+        return index
+
+    def rank(self, metric, category, rows, column):
+        """
+        Sort rows of a category by a metric and store the top of the ranking, see keep.
+        :param metric: Numeric column name.
+        :param category: Category name.
+        :param rows: Row positions in ascending order, so ties keep the order of a full build.
+        :param column: Metric values of every row, indexed by row position.
+        :return: None
+        """
+        values = column[rows].astype('float64')
+        order = np.argsort(-values, kind='stable')
+        self.keep(metric, category, rows[order], values[order])
+
+    def covers(self, metric, k):
+        """
+        Check whether a query can be answered from the index.
+        :param metric: Numeric column name.
+        :param k: Number of channels.
+        :return: True if the metric is indexed and k is within max_k.
+        """
+        return k <= self.max_k and metric in self.metrics
+
+    def top(self, category, metric, k, ties=False):
+        """
+        Get row positions of the top channels of a category.
+        :param category: Category name.
+        :param metric: Numeric column name.
+        :param k: Number of channels, at most max_k.
+        :param ties: True to also return channels tied with the k-th one.
+        :return: Array of row positions sorted by metric in descending order.
+        """
+        positions = self.positions.get((metric, category))
+        if positions is None:
+            return np.array([], dtype='int64')
+        stop = min(k, len(positions))
+        if ties:
+            values = self.values[(metric, category)]
+            while stop < len(positions) and stop > 0 and values[stop] == values[stop - 1]:
+                stop += 1
+        return positions[:stop]
+
+
+class FilterIndex:
+    """
+        Bitmap and sorted-position indexes of a table, on which filters are
+        evaluated with bitwise AND and OR instead of comparing every row.
+
+        A filter is a tuple of clauses that must all match, each a tuple of
+        terms of which at least one must match. A term is ('in', column, values)
+        or ('range', column, low, high) with bounds included and None for an
+        open end, so "Music or Entertainment, created 2012 to 2016, over 10M
+        subscribers" is
+            ((('in', 'category', ('Entertainment', 'Music')),),
+             (('range', 'created_year', 2012, 2016),),
+             (('range', 'subscribers', 10_000_000, None),))
+
+        Columns of BITMAP_COLUMNS keep a bitmap of the rows of each value,
+        packed 8 rows to a byte, so a clause is an OR of a few bitmaps. Other
+        numeric columns keep row positions sorted by value, built on first use,
+        so a range is two binary searches and the positions between them.
+
+        Attributes:
+            table: The indexed DataFrame.
+            rows: Number of rows of the table.
+            codes: Code of the value of each row, -1 if missing, keyed by bitmap column.
+            values: Array of values of each bitmap column, in order of their codes.
+            bitmaps: Packed bitmaps of each bitmap column, one row per code.
+            rankings: Row positions sorted by value in descending order, missing
+                values last, keyed by numeric column.
+            ranked: Negated values of each ranking, in ascending order.
+    """
+
+    def __init__(self, df, columns=BITMAP_COLUMNS):
+        """
+        Build a FilterIndex object.
+        :param df: DataFrame to index.
+        :param columns: List of columns indexed with bitmaps.
+        """
+        self.table = df
+        self.rows = len(df)
+        self.codes = {}
+        self.values = {}
+        self.bitmaps = {}
+        self.rankings = {}
+        self.ranked = {}
+        for column in columns:
+            codes, values = pd.factorize(df[column], sort=True)
+            codes = codes.astype('int32')
+            self.codes[column] = codes
+            self.values[column] = np.asarray(values)
+            self.bitmaps[column] = np.array([np.packbits(codes == code)
+                                             for code in range(len(values))],
+                                            dtype='uint8').reshape(len(values), -1)
+
+    def ranking(self, column):
+        """
+        Get row positions sorted by a numeric column, sorting it on first use.
+        :param column: Numeric column name.
+        :return: Tuple of positions in descending order of value and their negated values.
+        """
+        if column not in self.rankings:
+            if column not in self.table or not pd.api.types.is_numeric_dtype(self.table[column]):
+                raise ValueError(f'Cannot filter on {column}')
+            negated = -self.table[column].to_numpy(dtype='float64')
+            # stable, so ties keep the order of the table as in TopKIndex
+            order = np.argsort(negated, kind='stable')
+            self.ranked[column] = negated[order]
+            self.rankings[column] = order
+        return self.rankings[column], self.ranked[column]
+
+    def everything(self):
+        """
+        Get the bitmap of every row.
+        :return: Packed bitmap.
+        """
+        return np.packbits(np.ones(self.rows, dtype=bool))
+
+    def term(self, term):
+        """
+        Get the bitmap of the rows matching one term of a filter.
+        :param term: ('in', column, values) or ('range', column, low, high).
+        :return: Packed bitmap.
+        """
+        kind, column = term[0], term[1]
+        if column in self.bitmaps:
+            values = self.values[column]
+            if kind == 'in':
+                chosen = np.isin(values, np.asarray(term[2], dtype=values.dtype))
+            elif kind == 'range':
+                low, high = term[2], term[3]
+                chosen = np.ones(len(values), dtype=bool)
+                if low is not None:
+                    chosen &= values >= low
+                if high is not None:
+                    chosen &= values <= high
+            else:
+                raise ValueError(f'Unknown filter term {kind}')
+            if not chosen.any():
+                return np.zeros(self.bitmaps[column].shape[1], dtype='uint8')
+            return np.bitwise_or.reduce(self.bitmaps[column][chosen], axis=0)
+        if kind != 'range':
+            raise ValueError(f'Cannot filter {column} by {kind}')
+        order, ranked = self.ranking(column)
+        low, high = term[2], term[3]
+        start = 0 if high is None else np.searchsorted(ranked, -high, 'left')
+        stop = (np.searchsorted(ranked, np.inf, 'right') if low is None
+                else np.searchsorted(ranked, -low, 'right'))
+        if stop - start > self.rows // 2:
+            # a wide range clears the rows outside it instead, missing values included
+            mask = np.ones(self.rows, dtype=bool)
+            mask[order[:start]] = False
+            mask[order[stop:]] = False
+        else:
+            mask = np.zeros(self.rows, dtype=bool)
+            mask[order[start:stop]] = True
+        return np.packbits(mask)
+
+    def select(self, row_filter):
+        """
+        Evaluate a filter, ANDing its clauses and ORing the terms of each clause.
+        :param row_filter: Tuple of clauses.
+        :return: Packed bitmap of the matching rows.
+        """
+        bits = self.everything()
+        for clause in row_filter:
+            matched = self.term(clause[0])
+            for term in clause[1:]:
+                matched = matched | self.term(term)
+            bits &= matched
+        return bits
+
+    def positions(self, bits):
+        """
+        Get row positions of the rows set in a bitmap.
+        :param bits: Packed bitmap.
+        :return: Array of row positions in ascending order.
+        """
+        return np.flatnonzero(np.unpackbits(bits, count=self.rows))
+
+    def year_category_counts(self, rows):
+        """
+        Count selected channels created in each year for each category, see year_category_counts.
+        :param rows: Array of row positions.
+        :return: DataFrame indexed by year with a column for each category.
+        """
+        years, categories = self.codes['created_year'][rows], self.codes['category'][rows]
+        known = (years >= 0) & (categories >= 0)
+        width = len(self.values['category'])
+        counts = np.bincount(years[known] * width + categories[known],
+                             minlength=len(self.values['created_year']) * width)
+        counts = pd.DataFrame(counts.reshape(-1, width),
+                              index=pd.Index(self.values['created_year'].astype(int),
+                                             name='created_year'),
+                              columns=pd.Index(self.values['category'], dtype=object,
+                                               name='category'))
+        return counts.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
+
+    def category_sums(self, rows):
+        """
+        Sum and count non-missing values of selected rows for each category, see category_sums.
+        :param rows: Array of row positions.
+        :return: Tuple of DataFrames of sums and counts, indexed by category.
+        """
+        categories = self.codes['category'][rows]
+        width = len(self.values['category'])
+        sums, counts = {}, {}
+        for column in self.table.select_dtypes('number').columns:
+            values = self.table[column].to_numpy()[rows].astype('float64')
+            known = (categories >= 0) & ~np.isnan(values)
+            sums[column] = np.bincount(categories[known], weights=values[known],
+                                       minlength=width)
+            counts[column] = np.bincount(categories[known], minlength=width)
+        present = np.bincount(categories[categories >= 0], minlength=width) > 0
+        index = pd.Index(self.values['category'], dtype=object, name='category')[present]
+        return (pd.DataFrame(sums).iloc[present].set_axis(index),
+                pd.DataFrame(counts).iloc[present].set_axis(index))
+
+
+class FilteredTopK:
+    """
+        Top channels of each category among the rows of a filter, read from
+        the rankings of a FilterIndex. A ranking is scanned from the top only
+        until enough selected channels of the category are found.
+
+        Attributes:
+            index: The FilterIndex of the whole table.
+            rows: Positions of the selected rows in the whole table, ascending.
+            selected: Flag of each row of the whole table, True if selected.
+    """
+
+    def __init__(self, index, rows):
+        """
+        Initialize a FilteredTopK object.
+        :param index: The FilterIndex of the whole table.
+        :param rows: Array of positions of the selected rows, ascending.
+        """
+        self.index = index
+        self.rows = rows
+        self.selected = np.zeros(index.rows, dtype=bool)
+        self.selected[rows] = True
+
+    def covers(self, metric, k):
+        """
+        Check whether a query can be answered from the index.
+        :param metric: Numeric column name.
+        :param k: Number of channels.
+        :return: True, any numeric column can be ranked.
+        """
+        return True
+
+    def top(self, category, metric, k, ties=False):
+        """
+        Get positions among the selected rows of the top channels of a category.
+        :param category: Category name.
+        :param metric: Numeric column name.
+        :param k: Number of channels.
+        :param ties: True to also return channels tied with the k-th one.
+        :return: Array of positions in the selected rows, sorted by metric in descending order.
+        """
+        codes = np.flatnonzero(self.index.values['category'] == category)
+        if len(codes) == 0 or k <= 0:
+            return np.array([], dtype='int64')
+        order, _ = self.index.ranking(metric)
+        category_codes = self.index.codes['category']
+        column = self.index.table[metric].to_numpy(dtype='float64')
+        top = np.array([], dtype='int64')
+        for start in range(0, len(order), TOP_SCAN_BLOCK):
+            block = order[start:start + TOP_SCAN_BLOCK]
+            top = np.concatenate([top, block[self.selected[block]
+                                             & (category_codes[block] == codes[0])]])
+            # rankings are in descending order, so once a channel falls below
+            # the k-th one every channel after it does too
+            if len(top) > k and (not ties or column[top[-1]] != column[top[k - 1]]):
+                break
+        values = column[top]
+        top, values = top[~np.isnan(values)], values[~np.isnan(values)]
+        stop = min(k, len(top))
+        if ties:
+            while stop < len(top) and stop > 0 and values[stop] == values[stop - 1]:
+                stop += 1
+        return np.searchsorted(self.rows, top[:stop])
 
 
 class StoryTelling:
@@ -11,48 +1043,611 @@ class StoryTelling:
         Attributes:
             youtube_data: DataFrame containing YouTube data.
             controller: The controller object for managing the GUI.
+            cache: The on-disk cache of the cleaned dataset.
+            cleaning_report: Number of rows touched by each cleaning rule,
+                empty when the cleaned dataset is loaded from cache.
+            year_category: Count of channels for each created year (rows) and category (columns).
+            category_sums: Sum of each numeric column for each category.
+            category_counts: Count of non-missing values of each numeric column for each category.
+            aggregate_cache: The memoized derived tables, see AggregateCache.
+            data_version: Identifies the current content of youtube_data: the file and
+                the cleaning rules, followed by a digest of every change made since
+                it was loaded, such as ingested deltas.
+            charts: Persistent figure of each chart under 'fig'. The bar, suggestion
+                bar and scatter charts also keep the axes and artists they update
+                in place, the other charts are redrawn on their figure.
+            top_k: Index of the top channels of each category, see TopKIndex.
+            stats: Statistics of the numeric columns over every row and each
+                category, see StatsEngine, None until needed.
+            row_of: Row position of each channel name found in a single row, see
+                KEY_COLUMN, None until the first ingest.
+            repeated_keys: Channel names found in several rows, None until the first ingest.
+            filters: Index filters are evaluated on, see FilterIndex, None until
+                the first filter.
+            views: Filtered stories of recent filters, see filtered.
+            selection: Positions of the rows the charts are drawn from, None for every row.
+            lock: Held while ingest replaces youtube_data and the tables derived
+                from it, and by readers on other threads that need them to agree.
+            progress: Function called with a message at each step of loading, or None.
     """
 
-    def __init__(self, controller):
+    def __init__(self, controller, data_file=DATA_FILE, streaming=None,
+                 cache_budget=AGGREGATE_CACHE_BUDGET, progress=None):
         """
         Initialize a StoryTelling object.
         :param controller: The controller object for managing the GUI.
+        :param data_file: Path of the CSV file to analyze.
+        :param streaming: True to read the file in chunks, None to decide by file size.
+        :param cache_budget: Memory budget of the aggregate cache in bytes.
+        :param progress: Function called with a message at each step of loading.
         """
-        self.youtube_data = pd.read_csv('Global YouTube Statistics.csv', encoding="latin-1")
         self.controller = controller
-        self.clean_data()
-        self.find_average_earning()
+        self.progress = progress
+        self.data_file = data_file
+        if streaming is None:
+            streaming = os.path.getsize(data_file) > STREAM_THRESHOLD
+        self.streaming = streaming
+        self.aggregate_cache = AggregateCache(cache_budget)
+        self.lock = threading.RLock()
+        self.charts = {}
+        self.source_id = None
+        self.data_version = None
+        self.selection = None
+        self.load_data()
+
+    def __getstate__(self):
+        """
+        Get the state to pickle, such as for worker processes, without the lock.
+        :return: Dictionary of attributes.
+        """
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled StoryTelling object with a new lock.
+        :param state: Dictionary of attributes.
+        :return: None
+        """
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def report(self, message):
+        """
+        Report a step of loading.
+        :param message: Text describing the step.
+        :return: None
+        """
+        if self.progress is not None:
+            self.progress(message)
+
+    @tracer.traced('data', rows=dataset_rows)
+    def load_data(self):
+        """
+        Load the dataset, from the on-disk cache when it is up to date.
+        :return: None
+        """
+        self.aggregates = None
+        self.cleaning_report = {}
+        if self.streaming:
+            # only aggregates and a random sample of rows are kept in memory
+            self.cache = None
+            stat = os.stat(self.data_file)
+            self.source_id = f'{stat.st_size}-{stat.st_mtime_ns}'
+            self.report('Reading data in chunks')
+            self.aggregates = stream_csv(self.data_file,
+                                         lambda chunk: prepare_frame(chunk, self.cleaning_report),
+                                         progress=lambda rows: self.report(f'Read {rows:,} rows'))
+            self.youtube_data = compact_frame(self.aggregates.sample_frame())
+        else:
+            self.cache = DatasetCache(self.data_file, CLEANING_VERSION)
+            self.report('Reading cached data')
+            self.youtube_data = self.cache.load()
+            if self.youtube_data is None:
+                self.report('Reading data')
+                self.youtube_data = pd.read_csv(self.data_file, encoding="latin-1")
+                self.report('Cleaning data')
+                self.youtube_data = compact_frame(prepare_frame(self.youtube_data,
+                                                                self.cleaning_report))
+                self.report('Saving cleaned data')
+                self.cache.save(self.youtube_data)
+            self.source_id = self.cache.fingerprint()
+        self.report('Indexing data')
+        self.data_changed()
+
+    @tracer.traced('data', rows=dataset_rows)
+    def data_changed(self, change=None):
+        """
+        Invalidate everything derived from youtube_data after it has changed.
+        :param change: Bytes describing the change, see next_revision, None after a load.
+        :return: None
+        """
+        self.next_revision(change)
+        self.category_order = None
+        self.stats = None
+        self.row_of = None
+        self.repeated_keys = None
+        self.build_year_category()
+        self.build_category_sums()
+        self.build_top_k()
+
+    def next_revision(self, change=None):
+        """
+        Give youtube_data a new data version and drop tables memoized for the old one.
+        A change chains its digest onto the previous version instead of counting
+        revisions, so rendered charts persisted by one session are only reused by
+        another that made the same changes to the same file.
+        :param change: Bytes describing the change, such as a hash of an ingested
+            delta, None when the file has just been loaded.
+        :return: None
+        """
+        version = f'{self.source_id}:{CLEANING_VERSION}'
+        if change is not None:
+            digest = hashlib.sha1(self.data_version.encode('utf-8') + change).hexdigest()
+            version = f'{version}:{digest[:12]}'
+        self.data_version = version
+        self.filters = None
+        self.views = OrderedDict()
+        self.aggregate_cache.clear()
 
     def clean_data(self):
         """
-        Clean data
-            - Fill missing value in 'category' column
-            - Drop missing value in 'created_year' column
-            - Removing character that are not letters
+        Clean data with CLEANING_RULES, see clean_frame.
         :return: None
         """
-        # fill missing category with 'Other'
-        if self.youtube_data['category'].isnull().any():
-            self.youtube_data['category'] = self.youtube_data['category'].fillna('Other')
+        self.cleaning_report = {}
+        self.youtube_data = compact_frame(clean_frame(self.youtube_data,
+                                                      report=self.cleaning_report))
+        self.data_changed(b'clean_data')
 
-        # drop row that created_year is missing
-        self.youtube_data.dropna(subset=['created_year'], inplace=True)
+    @tracer.traced('data', rows=dataset_rows)
+    def ingest(self, delta):
+        """
+        Apply a delta of new and updated channels, matched by KEY_COLUMN. Rows of
+        known channels are replaced and rows of new channels are appended, then
+        the year x category counts, category sums, top channels and column
+        statistics are updated from the changed rows only. The new table and
+        indexes replace the old ones at the end while holding the lock, so
+        readers holding it see one version or the other. The GUI runs ingest in
+        the render worker, between charts.
+        :param delta: Path of a CSV file with the columns of the dataset, or a DataFrame.
+        :return: Dictionary of the number of 'added' and 'updated' rows, rows
+            'dropped' by cleaning, rows 'rejected' because their channel name is
+            empty, repeated in the delta or shared by several rows of the table,
+            and 'seconds' spent.
+        """
+        if self.aggregates is not None:
+            raise ValueError('Ingest needs the whole dataset in memory, '
+                             'streamed files have to be reloaded')
+        start = time.perf_counter()
+        if isinstance(delta, str):
+            delta = pd.read_csv(delta, encoding="latin-1")
+        read = len(delta)
+        delta = prepare_frame(delta)
+        cleaned = len(delta)
+        missing = [column for column in self.youtube_data.columns if column not in delta]
+        if missing:
+            raise ValueError(f"Delta is missing columns: {', '.join(missing)}")
+        delta = compact_frame(delta[list(self.youtube_data.columns)])
+        if self.row_of is None:
+            self.row_of, self.repeated_keys = key_positions(self.youtube_data[KEY_COLUMN])
+        keys = delta[KEY_COLUMN]
+        # a name that is empty or matches several channels cannot say which row to replace
+        rejected = (blank_keys(keys) | keys.duplicated(keep=False).to_numpy()
+                    | keys.isin(self.repeated_keys).to_numpy())
+        delta = delta[~rejected]
+        df, delta = align_columns(self.youtube_data, delta)
+
+        positions = np.fromiter((self.row_of.get(name, -1) for name in delta[KEY_COLUMN]),
+                                dtype='int64', count=len(delta))
+        known = positions >= 0
+        updated = positions[known]
+        old = df.iloc[updated]
+        label = df.index.max() + 1 if len(df) else 0
+        added = delta[~known].set_axis(pd.RangeIndex(label, label + (~known).sum()))
+        appended = np.arange(len(df), len(df) + len(added))
+        # positions of existing rows stay the same, so the top channel index can be merged
+        df = pd.concat([df, added]) if len(added) else df.copy()
+        for number, column in enumerate(df.columns):
+            # the key and the name cleaned from it are equal already, and setting
+            # Arrow strings copies them
+            if column not in (KEY_COLUMN, 'Youtuber'):
+                df.iloc[updated, number] = delta[column].to_numpy()[known]
+        changed = np.concatenate([updated, appended])
+        new = df.iloc[changed]
+
+        counts = self.year_category.sub(year_category_counts(old), fill_value=0)
+        counts = counts.add(year_category_counts(new), fill_value=0).fillna(0).astype('int64')
+        counts = counts.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
+        counts.columns.name = 'category'
+        old_sums, old_counts = category_sums(old)
+        new_sums, new_counts = category_sums(new)
+        sums = self.category_sums.sub(old_sums, fill_value=0).add(new_sums, fill_value=0)
+        value_counts = self.category_counts.sub(old_counts, fill_value=0).add(new_counts,
+                                                                             fill_value=0)
+        top_k = self.top_k.updated(df, changed) if self.top_k is not None else None
+        stats = None
+        if self.stats is not None:
+            stats = self.stats.copy()
+            stats.remove(old)
+            stats.update(new)
+        category_order = self.category_order
+        if category_order is not None:
+            category_order = category_order + [category for category in new['category'].unique()
+                                               if category not in category_order]
+        row_of = dict(self.row_of)
+        row_of.update(zip(added[KEY_COLUMN], appended.tolist()))
+        change = pd.util.hash_pandas_object(delta, index=False).to_numpy().tobytes()
 
-        # drop row that created_year is 1970 because YouTube is created in 2005
-        self.youtube_data = self.youtube_data[self.youtube_data['created_year'] != 1970]
+        with self.lock:
+            self.youtube_data = df
+            self.year_category = counts.sort_index().sort_index(axis=1)
+            self.category_sums, self.category_counts = sums, value_counts
+            self.top_k = top_k
+            self.stats = stats
+            self.category_order = category_order
+            self.row_of = row_of
+            self.next_revision(change)
+        return {'added': len(added), 'updated': len(updated), 'dropped': read - cleaned,
+                'rejected': int(rejected.sum()), 'seconds': time.perf_counter() - start}
+
+    def filter_index(self):
+        """
+        Get the index filters are evaluated on, built on first use.
+        :return: The FilterIndex object.
+        """
+        if self.aggregates is not None:
+            raise ValueError('Filters need the whole dataset in memory, '
+                             'streamed files only keep a sample of rows')
+        with self.lock:
+            filters = self.filters
+            if filters is None:
+                filters = self.filters = FilterIndex(self.youtube_data)
+            return filters
 
-        # Remove any characters that are not letters
-        to_re = r'[^a-zA-Z]'
-        self.youtube_data['Youtuber'] = self.youtube_data['Youtuber'].apply(lambda x: re.sub(to_re, '', x))
+    def filtered(self, row_filter):
+        """
+        Get the story of the channels matching a filter. Its charts are drawn
+        from the matching rows only, and its data version tells them apart.
+        :param row_filter: Tuple of clauses, see FilterIndex.select.
+        :return: A FilteredStory object, or the story itself if nothing is filtered.
+        """
+        if not row_filter:
+            return self
+        with self.lock:
+            views = self.views
+            view = views.get(row_filter)
+            if view is None:
+                view = FilteredStory(self, row_filter)
+                views[row_filter] = view
+                while len(views) > FILTERED_STORIES:
+                    views.popitem(last=False)
+            else:
+                views.move_to_end(row_filter)
+            return view
 
     def find_average_earning(self):
         """
         Calculate average monthly earning
         :return: None
         """
-        self.youtube_data['average_monthly_earnings'] = (self.youtube_data['highest_monthly_earnings'] +
-                                                         self.youtube_data['lowest_monthly_earnings']) / 2
+        self.youtube_data = compact_frame(add_average_earning(self.youtube_data))
+        self.data_changed(b'find_average_earning')
+
+    def chart_figure(self, kind, figsize, nrows=1, ncols=1, style=None):
+        """
+        Get the persistent figure of a chart, cleared and with new subplots.
+        Each chart keeps one figure for the whole session instead of creating a
+        new one on every draw. Artists kept for updating in place are dropped,
+        so a chart that keeps them stores them again after drawing.
+        :param kind: Name of the chart.
+        :param figsize: Tuple of width and height in inches.
+        :param nrows: Number of rows of subplots.
+        :param ncols: Number of columns of subplots.
+        :param style: Name of a seaborn style the subplots are created in, such as
+            'darkgrid', None for the defaults. It is set for the subplots only, so
+            a chart looks the same whichever chart the process drew before it.
+        :return: Tuple of the figure and its axes.
+        """
+        chart = self.charts.get(kind)
+        if chart is None:
+            fig = Figure(figsize=figsize)
+        else:
+            fig = chart['fig']
+            fig.clear()
+            fig.set_size_inches(figsize)
+        self.charts[kind] = {'fig': fig}
+        if style is None:
+            return fig, fig.subplots(nrows, ncols)
+        with sns.axes_style(style):
+            return fig, fig.subplots(nrows, ncols)
+
+    @tracer.traced('aggregate', rows=dataset_rows)
+    def build_year_category(self):
+        """
+        Count channels created in each year for each category in a single pass.
+        The year x category cube serves the year trend, the pie of any year and
+        category totals without scanning the dataset again.
+        :return: None
+        """
+        if self.aggregates is not None:
+            counts = self.aggregates.year_category_counts()
+            counts.index = counts.index.astype(int)
+            counts.columns.name = 'category'
+        else:
+            counts = year_category_counts(self.youtube_data)
+        self.year_category = counts
+
+    @tracer.traced('aggregate', rows=dataset_rows)
+    def build_category_sums(self):
+        """
+        Sum and count every numeric column for each category, see category_sums.
+        Category means are read from these and kept up to date by ingest.
+        :return: None
+        """
+        if self.aggregates is not None:
+            # streamed sums are kept by the aggregator
+            self.category_sums = self.category_counts = None
+            return
+        self.category_sums, self.category_counts = category_sums(self.youtube_data)
+
+    @tracer.traced('aggregate', rows=dataset_rows)
+    def build_top_k(self):
+        """
+        Index the top channels of every category for every ranking metric.
+        :return: None
+        """
+        if self.aggregates is not None:
+            # streamed top lists are kept by the aggregator
+            self.top_k = None
+            return
+        metrics = [metric for metric in RANK_METRICS if metric in self.youtube_data]
+        self.top_k = TopKIndex(self.youtube_data, metrics)
+
+    def year_trend(self):
+        """
+        Find the most created category for each year.
+        :return: DataFrame with 'Year', 'Category' and 'total_created' columns.
+        """
+        counts = self.year_category
+        return pd.DataFrame({'Year': counts.index,
+                             'Category': counts.idxmax(axis=1).values,
+                             'total_created': counts.max(axis=1).values})
+
+    def category_counts_in_year(self, year):
+        """
+        Count channels of each category created in a year.
+        :param year: Created year.
+        :return: Series indexed by category.
+        """
+        if year not in self.year_category.index:
+            return pd.Series(dtype='int64')
+        counts = self.year_category.loc[year]
+        return counts[counts > 0]
 
+    def category_totals(self):
+        """
+        Count channels of each category.
+        :return: Series indexed by category.
+        """
+        return self.year_category.sum(axis=0)
+
+    def memory_report(self):
+        """
+        Measure memory held by each column of the dataset, see memory_report.
+        :return: DataFrame indexed by column with 'dtype' and 'bytes' columns and a 'total' row.
+        """
+        return memory_report(self.youtube_data)
+
+    def categories(self):
+        """
+        Get categories in order of first appearance in the dataset.
+        :return: List of category names.
+        """
+        if self.category_order is None:
+            self.category_order = list(self.youtube_data['category'].unique())
+        totals = self.category_totals()
+        return [category for category in self.category_order if totals.get(category, 0) > 0]
+
+    def years(self):
+        """
+        Get created years of channels.
+        :return: List of years as strings, in ascending order.
+        """
+        return [str(year) for year in self.year_category.index]
+
+    def category_means(self, attribute):
+        """
+        Calculate mean of an attribute for each category.
+        :param attribute: Numeric column name.
+        :return: Series indexed by category.
+        """
+        def compute():
+            if self.aggregates is not None:
+                return self.aggregates.category_means(attribute).rename_axis('category')
+            totals = self.category_totals()
+            present = totals.index[totals > 0].sort_values()
+            return (self.category_sums[attribute].reindex(present) /
+                    self.category_counts[attribute].reindex(present))
+        return self.aggregate_cache.get('category_means', (attribute,), self.data_version, compute)
+
+    @tracer.traced('aggregate', rows=dataset_rows)
+    def top_channels(self, category, metric, n=TOP_K, ties=False):
+        """
+        Find the top channels of a category by a metric.
+        :param category: Category name.
+        :param metric: Numeric column name.
+        :param n: Number of channels.
+        :param ties: True to also return channels tied with the n-th one.
+        :return: DataFrame sorted by metric in descending order.
+        """
+        if self.aggregates is not None:
+            return self.aggregates.top_channels(category, metric).head(n)
+        if self.top_k is not None and self.top_k.covers(metric, n):
+            return self.youtube_data.iloc[self.top_k.top(category, metric, n, ties)]
+        df = self.youtube_data[self.youtube_data['category'] == category]
+        return df.sort_values(by=metric, ascending=False).head(n)
+
+    def stats_engine(self):
+        """
+        Get the statistics of the numeric columns with the table they describe,
+        read together so ingest cannot swap one without the other. The engine
+        is built on first use outside the lock and then kept up to date by ingest.
+        :return: Tuple of the data version, the table and the StatsEngine object.
+        """
+        with self.lock:
+            version, df, stats = self.data_version, self.youtube_data, self.stats
+        if self.aggregates is not None:
+            return version, df, self.aggregates.stats
+        if stats is None:
+            stats = StatsEngine(list(RANK_METRICS))
+            stats.update(df)
+            with self.lock:
+                # kept only if no ingest replaced the table meanwhile
+                if self.data_version == version:
+                    self.stats = stats
+        return version, df, stats
+
+    def summary_stats(self, columns, category=None, percentiles=(.25, .50, .75)):
+        """
+        Calculate count, mean, std, min, percentiles and max of columns, read
+        from the streaming statistics, see StatsEngine.describe.
+        :param columns: List of numeric column names.
+        :param category: Category name, None for every channel.
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: DataFrame with a row for each statistic and a column for each column.
+        """
+        def compute():
+            if stats.covers(columns):
+                return stats.describe(columns, category, list(percentiles))
+            rows = df if category is None else df[df['category'] == category]
+            return rows[columns].describe(percentiles=list(percentiles))
+        version, df, stats = self.stats_engine()
+        return self.aggregate_cache.get('summary_stats', (tuple(columns), category,
+                                                          tuple(percentiles)),
+                                        version, compute)
+
+    def category_stats(self, column, percentiles=(.25, .50, .75)):
+        """
+        Calculate count, mean, std, min, percentiles and max of a column for each category.
+        :param column: Name of a column in RANK_METRICS.
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: DataFrame with a row for each category and a column for each statistic.
+        """
+        version, _, stats = self.stats_engine()
+        return self.aggregate_cache.get('category_stats', (column, tuple(percentiles)), version,
+                                        lambda: stats.by_group(column, list(percentiles)))
+
+    def use_density(self):
+        """
+        Check whether scatter plots are drawn as a density image.
+        :return: True if the dataset has at least DENSITY_THRESHOLD rows.
+        """
+        return len(self.youtube_data) >= DENSITY_THRESHOLD
+
+    def density_grid(self, x, y, bins=DENSITY_BINS):
+        """
+        Count points of two attributes in a 2D grid in a single vectorized pass.
+        :param x: Numeric column name of the horizontal axis.
+        :param y: Numeric column name of the vertical axis.
+        :param bins: Number of bins along each axis.
+        :return: Tuple of counts indexed by (x bin, y bin), x edges and y edges.
+        """
+        def compute():
+            xy = self.youtube_data[[x, y]].to_numpy(dtype='float64')
+            xy = xy[np.isfinite(xy).all(axis=1)]
+            counts, x_edges, y_edges = np.histogram2d(xy[:, 0], xy[:, 1], bins=bins)
+            return counts, x_edges, y_edges
+        return self.aggregate_cache.get('density_grid', (x, y, bins), self.data_version, compute)
+
+    def regression(self, x, y, log=False):
+        """
+        Fit a regression line of two attributes, see fit_line.
+        :param x: Numeric column name of the horizontal axis.
+        :param y: Numeric column name of the vertical axis.
+        :param log: True to fit on log-scaled axes.
+        :return: Dictionary returned by fit_line.
+        """
+        def compute():
+            return fit_line(self.youtube_data[x].to_numpy(), self.youtube_data[y].to_numpy(), log)
+        return self.aggregate_cache.get('regression', (x, y, log), self.data_version, compute)
+
+    def inliers(self, column, k=OUTLIER_K):
+        """
+        Flag rows whose value is not an outlier within its category, see inlier_mask.
+        :param column: Numeric column name.
+        :param k: Multiple of the interquartile range past the quartiles that is kept.
+        :return: Boolean Series aligned with the dataset.
+        """
+        def compute():
+            return inlier_mask(self.youtube_data, column, 'category', k)
+        return self.aggregate_cache.get('inliers', (column, k), self.data_version, compute)
+
+    def without_outliers(self, column, k=OUTLIER_K):
+        """
+        Get category and values of a column with outliers of each category removed.
+        :param column: Numeric column name.
+        :param k: Multiple of the interquartile range past the quartiles that is kept.
+        :return: DataFrame with 'category' and column columns.
+        """
+        return self.youtube_data.loc[self.inliers(column, k), ['category', column]]
+
+    def histogram(self, column, bandwidth=None, outliers=True):
+        """
+        Bin a column into histogram bars and a kernel density curve, see histogram_kde.
+        :param column: Numeric column name.
+        :param bandwidth: Kernel bandwidth in data units, None for Scott's rule.
+        :param outliers: False to drop outliers of each category first.
+        :return: Dictionary returned by histogram_kde.
+        """
+        def compute():
+            if self.aggregates is not None and outliers:
+                # bins folded over the whole file, the sample only approximates them
+                streamed = self.aggregates.histograms[column]
+                stats = self.aggregates.stats.column_stats(column)
+                width = streamed.width or 1.0
+                chosen = bandwidth or scott_bandwidth(stats.count, stats.std)
+                edges = streamed.edges()
+                return {'edges': edges, 'counts': streamed.counts,
+                        'grid': (edges[:-1] + edges[1:]) / 2,
+                        'curve': smooth_counts(streamed.counts, width, chosen) * stats.count * width,
+                        'bandwidth': float(chosen)}
+            values = self.youtube_data[column]
+            if not outliers:
+                values = values[self.inliers(column)]
+            return histogram_kde(values.to_numpy(), bandwidth=bandwidth)
+        return self.aggregate_cache.get('histogram', (column, bandwidth, outliers),
+                                        self.data_version, compute)
+
+    def draw_relation(self, ax, x, y, scatter_color, line_color):
+        """
+        Draw points of two attributes with a regression line. Large datasets
+        are drawn as a density image, so drawing time depends on the grid size
+        instead of the number of points.
+        :param ax: The matplotlib axes object.
+        :param x: Numeric column name of the horizontal axis.
+        :param y: Numeric column name of the vertical axis.
+        :param scatter_color: Color of the points.
+        :param line_color: Color of the regression line.
+        :return: Collection of the points, or None if drawn as a density image.
+        """
+        points = None
+        if self.use_density():
+            counts, x_edges, y_edges = self.density_grid(x, y)
+            cmap = sns.light_palette(scatter_color, as_cmap=True)
+            ax.imshow(np.ma.masked_equal(counts.T, 0), origin='lower', aspect='auto',
+                      interpolation='nearest', cmap=cmap, norm=LogNorm(),
+                      extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+        else:
+            points = ax.scatter(self.youtube_data[x], self.youtube_data[y], color=scatter_color,
+                                linewidths=mpl.rcParams['lines.markeredgewidth'], alpha=.8)
+        draw_fit(ax, self.regression(x, y), line_color)
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+        return points
+
+    @tracer.traced('chart', rows=dataset_rows)
     def default_story_graph(self):
         """
         Create default graph of 'story telling' menu
@@ -62,35 +1657,15 @@ class StoryTelling:
             - Histogram
         :return: None
         """
-        year = self.youtube_data['created_year'].unique()
-        year = sorted(year)
-
-        result = []
-        for i, y in enumerate(year):
-            group_year = self.youtube_data[self.youtube_data['created_year'] == y]
-            category_counts = group_year['category'].value_counts()
-            max_category = category_counts.idxmax()
-            max_category_value = category_counts.values.max()
-            m = {'Year': y, 'Category': max_category, 'total_created': max_category_value}
-            result.append(m)
-        year_trend = pd.DataFrame(result)
-        year_trend['Year'] = year_trend['Year'].astype(int)
-
-        def remove_outliers(df):
-            q1 = df.quantile(0.25)
-            q3 = df.quantile(0.75)
-            iqr = q3 - q1
-            lower_bound = q1 - 1.5 * iqr
-            upper_bound = q3 + 1.5 * iqr
-            return df[(df >= lower_bound) & (df <= upper_bound)]
-
-        df_no_outliers = self.youtube_data.groupby('category')['average_monthly_earnings'].apply(remove_outliers).reset_index()
-        fig, axs = plt.subplots(2, 2, figsize=(10, 6))
-        plt.subplots_adjust(hspace=0.4)
+        year_trend = self.year_trend()
+
+        df_no_outliers = self.without_outliers('average_monthly_earnings')
+        categories = sorted(df_no_outliers['category'].unique())
+        fig, axs = self.chart_figure('default_story_graph', (10, 6), 2, 2)
+        fig.subplots_adjust(hspace=0.4)
         palette = sns.color_palette("Reds")
-        sns.regplot(data=self.youtube_data, x='average_monthly_earnings', y='subscribers',
-                    ax=axs[0, 0], scatter_kws={'color': palette[5]},
-                    line_kws={'color': palette[1]})
+        self.draw_relation(axs[0, 0], 'average_monthly_earnings', 'subscribers',
+                           palette[5], palette[1])
         axs[0, 0].set_ylim(0)
         axs[0, 0].set_yticks(axs[0, 0].get_yticks())
         axs[0, 0].set_yticklabels([f'{label / 1e6}' for label in axs[0, 0].get_yticks()])
@@ -109,16 +1684,18 @@ class StoryTelling:
                             fontweight='bold', color=palette[5])
 
         sns.boxplot(x='average_monthly_earnings', y='category', data=df_no_outliers,
-                    hue='category', palette='Reds', ax=axs[1, 0])
+                    hue='category', order=categories, hue_order=categories,
+                    palette='Reds', ax=axs[1, 0])
         axs[1, 0].set_title('Average earning for each category',
                             fontweight='bold', color=palette[5])
 
-        sns.histplot(df_no_outliers['average_monthly_earnings'], ax=axs[1, 1],
-                     color='red', kde=True)
+        draw_histogram(axs[1, 1], self.histogram('average_monthly_earnings', outliers=False),
+                       'red', 'average_monthly_earnings')
         axs[1, 1].set_title('Histogram of Average of earning',
                             fontweight='bold', color=palette[5])
         self.controller.show_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def first_story(self, event):
         """
         Create scatter plot to tell correlation between attributes
@@ -127,18 +1704,15 @@ class StoryTelling:
             - 'average_monthly_earning' and 'uploads'
         :return: None
         """
-        fig, axs = plt.subplots(1, 3, figsize=(10, 5))
+        fig, axs = self.chart_figure('first_story', (10, 5), 1, 3, style='darkgrid')
         palette = sns.color_palette("Reds")
-        plt.suptitle('Correlation between average earning & '
+        fig.suptitle('Correlation between average earning & '
                      '(subscribers, video views, uploaded videos)',
                      fontsize=16, fontweight='bold', color=palette[5])
-        sns.set_style('darkgrid')
 
         # First pair
-        ax = sns.regplot(data=self.youtube_data, x='average_monthly_earnings',
-                         y='subscribers', ax=axs[0],
-                         scatter_kws={'color': palette[5]},
-                         line_kws={'color': palette[1]})
+        ax = axs[0]
+        self.draw_relation(ax, 'average_monthly_earnings', 'subscribers', palette[5], palette[1])
         ax.set_ylim(0)
         ax.set_yticks(ax.get_yticks())
         ax.set_yticklabels([f'{label / 1e6}' for label in ax.get_yticks()])
@@ -150,8 +1724,8 @@ class StoryTelling:
         ax.set_xlabel('average_monthly_earning (million)')
 
         # Second pair
-        sns.regplot(data=self.youtube_data, x='average_monthly_earnings', y='video views', ax=axs[1],
-                    scatter_kws={'color': palette[2]}, line_kws={'color': palette[4]})
+        self.draw_relation(axs[1], 'average_monthly_earnings', 'video views',
+                           palette[2], palette[4])
         axs[1].set_ylim(0)
         axs[1].set_yticks(axs[1].get_yticks())
         axs[1].set_yticklabels([f'{label / 1e6}' for label in axs[1].get_yticks()])
@@ -163,8 +1737,7 @@ class StoryTelling:
         axs[1].set_xlabel('average_monthly_earning (million)')
 
         # Third pair
-        sns.regplot(data=self.youtube_data, x='average_monthly_earnings', y='uploads', ax=axs[2],
-                    scatter_kws={'color': palette[3]}, line_kws={'color': palette[5]})
+        self.draw_relation(axs[2], 'average_monthly_earnings', 'uploads', palette[3], palette[5])
         axs[2].set_ylim(0)
         axs[2].set_yticks(axs[2].get_yticks())
         axs[2].set_yticklabels([f'{label / 1e6}' for label in axs[2].get_yticks()])
@@ -177,59 +1750,41 @@ class StoryTelling:
 
         self.controller.show_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def second_story(self, event):
         """
         Create bar graph to represent The most created
         category for each year
         :return: None
         """
-        year = self.youtube_data['created_year'].unique()
-        year = sorted(year)
-
-        result = []
-        for i, y in enumerate(year):
-            group_year = self.youtube_data[self.youtube_data['created_year'] == y]
-            category_counts = group_year['category'].value_counts()
-            max_category = category_counts.idxmax()
-            max_category_value = category_counts.values.max()
-            m = {'Year': y, 'Category': max_category, 'total_created': max_category_value}
-            result.append(m)
-        year_trend = pd.DataFrame(result)
-        year_trend['Year'] = year_trend['Year'].astype(int)
+        year_trend = self.year_trend()
 
         # bar graph
         palette = sns.color_palette("Reds")
-        fig, ax = plt.subplots(figsize=(10, 5))
+        fig, ax = self.chart_figure('second_story', (10, 5), style='darkgrid')
         ax.set_title('The most created category for each year', fontsize=16,
                      fontweight='bold', color=palette[5])
-        sns.set_style('darkgrid')
         sns.barplot(x='Year', y='total_created', hue='Category',
-                    data=year_trend, palette='Reds')
+                    data=year_trend, palette='Reds', ax=ax)
         self.controller.show_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def third_story(self, event):
         """
         Create a boxplot to represent the average earnings for each category
         and a histogram of earnings.
         :return: None
         """
-        def remove_outliers(df):
-            q1 = df.quantile(0.25)
-            q3 = df.quantile(0.75)
-            iqr = q3 - q1
-            lower_bound = q1 - 1.5 * iqr
-            upper_bound = q3 + 1.5 * iqr
-            return df[(df >= lower_bound) & (df <= upper_bound)]
-
         # remove outliers for each channel type
         palette = sns.color_palette("Reds")
-        df_no_outliers = self.youtube_data.groupby('category')['average_monthly_earnings'].apply(remove_outliers).reset_index()
-        fig, axs = plt.subplots(1, 2, figsize=(10, 5))
-        sns.set_style('darkgrid')
+        df_no_outliers = self.without_outliers('average_monthly_earnings')
+        categories = sorted(df_no_outliers['category'].unique())
+        fig, axs = self.chart_figure('third_story', (10, 5), 1, 2, style='darkgrid')
 
         # First subplot (boxplot)
         ax = sns.boxplot(x='average_monthly_earnings', y='category', data=df_no_outliers,
-                         hue='category', palette='Reds', ax=axs[0])
+                         hue='category', order=categories, hue_order=categories,
+                         palette='Reds', ax=axs[0])
         ax.set_xlim(left=0)
         ax.set_xticks(ax.get_xticks())
         ax.set_xticklabels([f'{int(label / 1e6)}' for label in ax.get_xticks()])
@@ -238,60 +1793,61 @@ class StoryTelling:
                      fontweight='bold', color=palette[5])
 
         # Second subplot (histogram)
-        sns.histplot(df_no_outliers['average_monthly_earnings'], ax=axs[1],
-                     color='red', kde=True)
+        draw_histogram(axs[1], self.histogram('average_monthly_earnings', outliers=False),
+                       'red', 'average_monthly_earnings')
         axs[1].set_xlabel('average_monthly_earnings')
         axs[1].set_ylabel('Frequency')
         axs[1].set_title('Histogram of Average of earning', fontsize=16,
                          fontweight='bold', color=palette[5])
 
-        plt.tight_layout()
+        fig.tight_layout()
         self.controller.show_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def create_histogram(self, attribute):
         """
         Create a histogram of the specified attribute.
         :param attribute: Selected attribute from user
         :return: None
         """
-        fig, ax = plt.subplots(figsize=(5, 4))
-        to_create = self.youtube_data[attribute]
+        fig, ax = self.chart_figure('create_histogram', (5, 4))
         palette = sns.color_palette("Reds")
         ax.set_title(f'Histogram of {attribute}', fontsize=16, fontweight='bold', color=palette[5])
-        sns.histplot(to_create, color='red', kde=True)
-        if max(ax.get_xticks()) > 1e6:
-            if max(ax.get_xticks()) > 1e7:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e6)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel(f'{attribute} (million)')
-            else:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e5)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel(f'{attribute} (hundred thousand)')
-        else:
-            ax.set_xlabel(f'{attribute}')
+        draw_histogram(ax, self.histogram(attribute), 'red', attribute)
+        scale_x_ticks(ax, attribute)
         self.controller.show_create_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def create_scatter(self, attribute_1, attribute_2):
         """
-        Create a scatter plot to tell correlation between attributes
+        Create a scatter plot to tell correlation between attributes.
+        When the scatter graph is already drawn, only the points and the
+        regression line are replaced. Large datasets are drawn as a density image.
         :param attribute_1: Selected first attribute from user
         :param attribute_2: Selected second attribute from user
         :return: None
         """
         if attribute_1 is not None and attribute_2 is not None:
             palette = sns.color_palette("Reds")
-            fig, ax = plt.subplots(figsize=(6, 4))
-            ax.set_title(f'Correlation between {attribute_1} and {attribute_2}',
-                         fontsize=16, fontweight='bold',
-                         color=palette[5])
-            sns.set_style('darkgrid')
-            sns.regplot(data=self.youtube_data, x=attribute_1, y=attribute_2,
-                        scatter_kws={'color': palette[5]}, line_kws={'color': palette[1]})
+            chart = self.charts.get('create_scatter')
+            if chart is not None and 'points' in chart and not self.use_density():
+                fig, ax, points = chart['fig'], chart['ax'], chart['points']
+                for artist in list(ax.lines) + [c for c in ax.collections if c is not points]:
+                    artist.remove()
+                xy = self.youtube_data[[attribute_1, attribute_2]].to_numpy(dtype='float64')
+                points.set_offsets(xy)
+                draw_fit(ax, self.regression(attribute_1, attribute_2), palette[1])
+                reset_axis(ax.xaxis)
+                reset_axis(ax.yaxis)
+                ax.set_autoscale_on(True)
+                ax.relim()
+                ax.update_datalim(xy)
+                ax.autoscale_view()
+            else:
+                fig, ax = self.chart_figure('create_scatter', (6, 4), style='darkgrid')
+                points = self.draw_relation(ax, attribute_1, attribute_2, palette[5], palette[1])
+                if points is not None:
+                    self.charts['create_scatter'].update(ax=ax, points=points)
 
             if max(ax.get_yticks()) > 1e6:
                 ax.set_ylim(0)
@@ -314,16 +1870,16 @@ class StoryTelling:
             ax.set_title(f'Correlation between {attribute_1} and {attribute_2}')
             return self.controller.show_create_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def create_pie(self, year):
         """
         Create a pie chart to represent category created in each year
         :param year: Selected year from user
         :return: None
         """
-        df_year = self.youtube_data[self.youtube_data['created_year'] == int(year)]
-        category_year = df_year['category'].value_counts().sort_values(ascending=True)
+        category_year = self.category_counts_in_year(int(year)).sort_values(ascending=True)
 
-        fig, ax = plt.subplots(figsize=(5, 4))
+        fig, ax = self.chart_figure('create_pie', (5, 4))
         palette = sns.color_palette("Reds")
         ax.set_title(f'Category created in the year {year}',
                      fontsize=16, fontweight='bold',
@@ -331,109 +1887,177 @@ class StoryTelling:
         color = ['#c61a09', '#df2c14', '#ed3419', '#f01e2c',
                  '#ff6242', '#ff8164', '#ffa590', '#ffc9bb',
                  '#c30010', '#f94449', '#ee6b6e']
-        plt.pie(category_year.values, labels=category_year.index,
-                autopct='%1.1f%%', startangle=140, colors=color)
-        plt.axis('equal')
+        ax.pie(category_year.values, labels=category_year.index,
+               autopct='%1.1f%%', startangle=140, colors=color)
+        ax.axis('equal')
         return self.controller.show_create_graph(fig)
 
+    @tracer.traced('chart', rows=dataset_rows)
     def create_bar(self, attribute):
         """
-        Create a bar graph to represent average of selected attribute for each category
+        Create a bar graph to represent average of selected attribute for each category.
+        When the bar graph is already drawn for the same categories, only the
+        bar lengths are updated.
         :param attribute: Selected attribute from user
         :return: None
         """
-        average_per_category = self.youtube_data.groupby('category')[attribute].mean()
-        average_per_category_df = pd.DataFrame(average_per_category)
+        average_per_category = self.category_means(attribute)
+        categories = tuple(average_per_category.index)
 
         palette = sns.color_palette("Reds")
-        fig, ax = plt.subplots(figsize=(6, 4))
+        chart = self.charts.get('create_bar')
+        if chart is not None and chart.get('categories') == categories:
+            fig, ax = chart['fig'], chart['ax']
+            for bar, value in zip(ax.patches, average_per_category.values):
+                bar.set_width(value)
+            reset_axis(ax.xaxis)
+            ax.set_autoscalex_on(True)
+            ax.relim()
+            ax.autoscale_view(scaley=False)
+        else:
+            fig, ax = self.chart_figure('create_bar', (6, 4), style='darkgrid')
+            sns.barplot(x=attribute, y='category', data=pd.DataFrame(average_per_category),
+                        hue='category', palette='Reds', ax=ax)
+            self.charts['create_bar'].update(ax=ax, categories=categories)
         ax.set_title(f'Average of {attribute} for each category',
                      fontsize=16, fontweight='bold',
                      color=palette[5])
-        sns.set_style('darkgrid')
-        sns.barplot(x=attribute, y='category', data=average_per_category_df,
-                    hue='category', palette='Reds')
-        if max(ax.get_xticks()) > 1e6:
-            if max(ax.get_xticks()) > 1e7:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e6)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel(f'{attribute} (million)')
-            else:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e5)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel(f'{attribute} (hundred thousand)')
-        else:
-            ax.set_xlabel(f'{attribute}')
+        scale_x_ticks(ax, attribute)
         return self.controller.show_create_graph(fig)
 
-    def create_suggest_bar_sub(self, category):
+    @tracer.traced('chart', rows=dataset_rows)
+    def create_suggest_bar(self, category, metric):
         """
-        Create a bar graph showing the top 10 YouTubers by subscribers for the selected category.
+        Create a bar graph showing the top 10 YouTubers by a metric for the selected category.
+        When the graph of the metric is already drawn with as many channels,
+        only the bar lengths and channel names are updated.
         :param category: Selected category from user
+        :param metric: Numeric column to rank channels by
         :return: None
         """
-        df = self.youtube_data[self.youtube_data['category'] == category]
-        top_10_sub = df.sort_values(by='subscribers', ascending=False).head(10)
-        fig, ax = plt.subplots(figsize=(6, 5))
-        sns.set_style('darkgrid')
-        ax.tick_params(axis='y', rotation=30)
+        top_10 = self.top_channels(category, metric)[-1::-1]
+        names = list(top_10['Youtuber'])
+        kind = f'create_suggest_bar {metric}'
+
         palette = sns.color_palette("Reds")
-        ax.set_title(f'Top 10 by subscribers for {category}', fontsize=16,
+        chart = self.charts.get(kind)
+        if (chart is not None and chart.get('bars') == len(names)
+                and len(set(names)) == len(names)):
+            fig, ax = chart['fig'], chart['ax']
+            for bar, value in zip(ax.patches, top_10[metric].values):
+                bar.set_width(value)
+            ax.set_yticks(range(len(names)))
+            ax.set_yticklabels(names)
+            reset_axis(ax.xaxis)
+            ax.set_autoscalex_on(True)
+            ax.relim()
+            ax.autoscale_view(scaley=False)
+        else:
+            fig, ax = self.chart_figure(kind, (6, 5), style='darkgrid')
+            ax.tick_params(axis='y', rotation=30)
+            sns.barplot(x=metric, y='Youtuber', data=top_10,
+                        hue='Youtuber', palette='Reds', ax=ax)
+            self.charts[kind].update(ax=ax, bars=len(ax.patches))
+        ax.set_title(f'Top 10 by {metric} for {category}', fontsize=16,
                      fontweight='bold',
                      color=palette[5])
-        sns.barplot(x='subscribers', y='Youtuber', data=top_10_sub[-1::-1],
-                    hue='Youtuber', palette='Reds', ax=ax)
-        if max(ax.get_xticks()) > 1e6:
-            if max(ax.get_xticks()) > 1e7:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e6)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel('Subscribers (million)')
-            else:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e5)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel('Subscribers (hundred thousand)')
-        else:
-            ax.set_xlabel('Subscribers')
+        scale_x_ticks(ax, RANK_METRICS[metric])
         return self.controller.show_suggest_graph(fig)
 
+    def create_suggest_bar_sub(self, category):
+        """
+        Create a bar graph showing the top 10 YouTubers by subscribers for the selected category.
+        :param category: Selected category from user
+        :return: None
+        """
+        return self.create_suggest_bar(category, 'subscribers')
+
     def create_suggest_bar_view(self, category):
         """
         Create a bar graph showing the top 10 YouTubers by video views for the selected category.
         :param category: Selected category from user
         :return: None
         """
-        df = self.youtube_data[self.youtube_data['category'] == category]
-        top_10_view = df.sort_values(by='video views', ascending=False).head(10)
-        fig, ax = plt.subplots(figsize=(6, 5))
-        sns.set_style('darkgrid')
-        ax.tick_params(axis='y', rotation=30)
-        palette = sns.color_palette("Reds")
-        ax.set_title(f'Top 10 by video views for {category}',
-                     fontsize=16, fontweight='bold',
-                     color=palette[5])
-        sns.barplot(x='video views', y='Youtuber', data=top_10_view[-1::-1],
-                    hue='Youtuber', palette='Reds', ax=ax)
-        if max(ax.get_xticks()) > 1e6:
-            if max(ax.get_xticks()) > 1e7:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e6)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel('Video views (million)')
-            else:
-                ax.set_xlim(left=0)
-                ax.set_xticks(ax.get_xticks())
-                new_xtick_labels = [f'{int(label / 1e5)}' for label in ax.get_xticks()]
-                ax.set_xticklabels(new_xtick_labels)
-                ax.set_xlabel('Video views (hundred thousand)')
-        else:
-            ax.set_xlabel('Video views')
-        return self.controller.show_suggest_graph(fig)
+        return self.create_suggest_bar(category, 'video views')
+
+
+class FilteredStory(StoryTelling):
+    """
+        The channels of a StoryTelling object that match a filter. It shares
+        the figures, caches and indexes of the story, and every chart drawn
+        from it covers the matching rows only. Counts, sums and top channels
+        are read from the FilterIndex of the story, and the matching rows are
+        copied out of the table only when a chart needs their values.
+
+        Attributes:
+            story: The StoryTelling object of every row.
+            row_filter: The filter, see FilterIndex.select.
+            selection: Positions of the matching rows in the table of the story.
+            index: The FilterIndex of the story.
+            rows: The matching rows, None until copied out.
+            sums: Tuple of category sums and counts of the matching rows, None until needed.
+    """
+
+    def __init__(self, story, row_filter):
+        """
+        Initialize a FilteredStory object.
+        :param story: The StoryTelling object of every row.
+        :param row_filter: Tuple of clauses, see FilterIndex.select.
+        """
+        index = story.filter_index()
+        state = dict(story.__dict__)
+        for name in ('youtube_data', 'category_sums', 'category_counts'):
+            del state[name]
+        self.__dict__.update(state)
+        self.story = story
+        self.row_filter = row_filter
+        self.selection = index.positions(index.select(row_filter))
+        self.data_version = f'{story.data_version}:{filter_digest(row_filter)}'
+        self.index = index
+        self.rows = None
+        self.sums = None
+        self.category_order = None
+        self.stats = None
+        self.row_of = None
+        self.repeated_keys = None
+        self.year_category = index.year_category_counts(self.selection)
+        self.top_k = FilteredTopK(index, self.selection)
+
+    @property
+    def youtube_data(self):
+        """
+        Matching rows of the table, copied out on first use.
+        :return: DataFrame of the matching rows.
+        """
+        rows = self.rows
+        if rows is None:
+            rows = self.rows = self.index.table.iloc[self.selection]
+        return rows
+
+    @property
+    def category_sums(self):
+        """
+        Sum of each numeric column for each category over the matching rows.
+        :return: DataFrame indexed by category.
+        """
+        if self.sums is None:
+            self.sums = self.index.category_sums(self.selection)
+        return self.sums[0]
+
+    @property
+    def category_counts(self):
+        """
+        Count of non-missing values of each numeric column for each category over the matching rows.
+        :return: DataFrame indexed by category.
+        """
+        if self.sums is None:
+            self.sums = self.index.category_sums(self.selection)
+        return self.sums[1]
+
+    def filtered(self, row_filter):
+        """
+        Get the story of the channels matching this filter and another.
+        :param row_filter: Tuple of clauses, see FilterIndex.select.
+        :return: A FilteredStory object of both filters.
+        """
+        return self.story.filtered(self.row_filter + tuple(row_filter))
@@ -0,0 +1,684 @@
+import copy
+import numpy as np
+import pandas as pd
+
+# explicit dtypes so every chunk is parsed the same way, numeric columns are
+# float64 because large exports may contain missing values in any of them
+DTYPES = {
+    'Youtuber': 'object',
+    'subscribers': 'float64',
+    'video views': 'float64',
+    'category': 'object',
+    'uploads': 'float64',
+    'lowest_monthly_earnings': 'float64',
+    'highest_monthly_earnings': 'float64',
+    'created_year': 'float64',
+}
+
+NUMERIC_COLUMNS = ['subscribers', 'video views', 'uploads', 'average_monthly_earnings']
+
+# capacity of the top level of quantile sketches, about 1.3% rank error
+SKETCH_K = 200
+
+# ratio of the capacities of consecutive levels of quantile sketches
+SKETCH_DECAY = 2 / 3
+
+
+class RunningStats:
+    """
+        Mergeable count, mean, variance, min and max of a numeric column.
+
+        Attributes:
+            count: Number of values seen.
+            mean: Mean of values seen.
+            m2: Sum of squared differences from the mean.
+            min: Smallest value seen.
+            max: Largest value seen.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty RunningStats object.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """
+        Add a batch of values.
+        :param values: Array of values, missing values are ignored.
+        :return: None
+        """
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        other = RunningStats()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        """
+        Merge another RunningStats object into this one.
+        :param other: The RunningStats object to merge.
+        :return: None
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        """
+        Sample standard deviation of values seen.
+        :return: Standard deviation, or NaN if fewer than two values were seen.
+        """
+        if self.count < 2:
+            return np.nan
+        return (self.m2 / (self.count - 1)) ** 0.5
+
+
+class StreamingHistogram:
+    """
+        Fixed-size histogram of non-negative values whose range grows as needed.
+        When a value falls past the last bin, adjacent bins are merged in pairs
+        so the bin width doubles and the number of bins stays constant.
+
+        Attributes:
+            bins: Number of bins.
+            width: Width of each bin.
+            counts: Count of values in each bin.
+    """
+
+    def __init__(self, bins=64):
+        """
+        Initialize an empty StreamingHistogram object.
+        :param bins: Number of bins, must be even.
+        """
+        self.bins = bins
+        self.width = None
+        self.counts = np.zeros(bins, dtype='int64')
+
+    def update(self, values):
+        """
+        Add a batch of values, negative values are counted in the first bin.
+        :param values: Array of values, missing values are ignored.
+        :return: None
+        """
+        values = np.asarray(values, dtype='float64')
+        values = np.clip(values[~np.isnan(values)], 0, None)
+        if len(values) == 0:
+            return
+        top = values.max()
+        if self.width is None:
+            self.width = top / self.bins if top > 0 else 1.0
+        while top >= self.width * self.bins:
+            self.counts = np.concatenate([self.counts.reshape(-1, 2).sum(axis=1),
+                                          np.zeros(self.bins // 2, dtype='int64')])
+            self.width *= 2
+        index = np.minimum((values // self.width).astype('int64'), self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+
+    def edges(self):
+        """
+        Get bin edges.
+        :return: Array of bin edges.
+        """
+        return np.arange(self.bins + 1) * (self.width or 1.0)
+
+
+class QuantileSketch:
+    """
+        Mergeable KLL sketch of the distribution of a numeric column, from which
+        any quantile is estimated in memory independent of the number of values.
+
+        Values are kept in levels, each value of level h standing for 2 ** h
+        values seen. A level over its capacity is sorted and every other value,
+        starting at a random offset, is promoted to the next level. Capacities
+        shrink by 2/3 per level below the top, so about 3 * k values are kept
+        and the rank of a quantile is off by about rank_error() of the count.
+        Until the first compaction every value is kept and quantiles are exact.
+
+        Attributes:
+            k: Capacity of the top level, larger is more accurate.
+            levels: Array of kept values of each level.
+            count: Number of values seen.
+    """
+
+    def __init__(self, k=SKETCH_K, seed=0):
+        """
+        Initialize an empty QuantileSketch object.
+        :param k: Capacity of the top level.
+        :param seed: Seed of the random offsets of compactions.
+        """
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        """
+        Get number of values a level keeps before it is compacted.
+        :param level: Number of the level.
+        :return: Capacity of the level.
+        """
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * SKETCH_DECAY ** depth)))
+
+    def update(self, values):
+        """
+        Add a batch of values.
+        :param values: Array of values, missing values are ignored.
+        :return: None
+        """
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+
+    def merge(self, other):
+        """
+        Merge another QuantileSketch object into this one.
+        :param other: The QuantileSketch object to merge.
+        :return: None
+        """
+        if other.count == 0:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self.compress()
+
+    def compress(self):
+        """
+        Compact every level over its capacity, lowest level first.
+        :return: None
+        """
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                # levels above the first hold sorted runs, which a stable sort merges in linear time
+                values = np.sort(values, kind='stable')
+                offset = int(self.rng.integers(2))
+                # with an odd number of values, the first or last one stays in the level
+                if len(values) % 2:
+                    kept, values = (values[:1], values[1:]) if offset else (values[-1:],
+                                                                            values[:-1])
+                else:
+                    kept = values[:0]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1],
+                                                         values[offset::2]])
+            level += 1
+
+    def points(self):
+        """
+        Get kept values with the number of values each stands for.
+        :return: Tuple of arrays of values and weights, in the order of the levels.
+        """
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(kept), 2 ** level, dtype='int64')
+                                  for level, kept in enumerate(self.levels)])
+        return values, weights
+
+    def rank_error(self):
+        """
+        Get the bound on the error of estimated ranks, as a fraction of the count.
+        :return: 0 while every value is kept, otherwise the error of about 99%
+            of estimates, 2.296 / k ** 0.9723 as measured for KLL sketches.
+        """
+        if len(self.levels) == 1:
+            return 0.0
+        return 2.296 / self.k ** 0.9723
+
+
+def weighted_quantiles(values, weights, quantiles):
+    """
+    Interpolate quantiles of weighted values, as numpy.percentile does when every weight is 1.
+    Negative weights remove values, from the same value or from the nearest values below.
+    :param values: Array of values.
+    :param weights: Array of the number of values each stands for.
+    :param quantiles: Array of quantiles between 0 and 1.
+    :return: Array of values at the quantiles, NaN if no value is left.
+    """
+    quantiles = np.asarray(quantiles, dtype='float64')
+    order = np.argsort(values, kind='stable')
+    distinct, starts = np.unique(values[order], return_index=True)
+    net = np.add.reduceat(weights[order], starts) if len(starts) else weights[:0]
+    # removals at a value the sketch no longer holds lower the rank of the values above it
+    cumulative = np.maximum(np.maximum.accumulate(np.cumsum(net)), 0)
+    left = np.diff(cumulative, prepend=0)
+    kept = left > 0
+    if not kept.any():
+        return np.full(len(quantiles), np.nan)
+    # a value standing for w values covers w consecutive ranks, so ties are returned
+    # exactly and quantiles between two values are interpolated from their nearest ranks
+    last = cumulative[kept] - 1
+    first = last - left[kept] + 1
+    values = distinct[kept]
+    spread = first < last
+    ranks = np.concatenate([first, last[spread]])
+    order = np.argsort(ranks, kind='stable')
+    return np.interp(quantiles * (cumulative[-1] - 1), ranks[order],
+                     np.concatenate([values, values[spread]])[order])
+
+
+class ColumnStats(RunningStats):
+    """
+        Mergeable count, mean, variance, min, max and quantiles of a numeric column.
+        Values can also be removed: mean and variance stay exact, removed values
+        are counted in a second sketch whose ranks are subtracted, and a removed
+        min or max is replaced by the smallest or largest value the sketches keep.
+
+        Attributes:
+            sketch: QuantileSketch of values added.
+            removed: QuantileSketch of values removed.
+    """
+
+    def __init__(self, k=SKETCH_K):
+        """
+        Initialize an empty ColumnStats object.
+        :param k: Capacity of the top level of the sketches.
+        """
+        super().__init__()
+        self.sketch = QuantileSketch(k)
+        self.removed = QuantileSketch(k, seed=1)
+
+    def update(self, values):
+        """
+        Add a batch of values.
+        :param values: Array of values, missing values are ignored.
+        :return: None
+        """
+        batch = RunningStats()
+        batch.update(values)
+        super().merge(batch)
+        self.sketch.update(values)
+
+    def merge(self, other):
+        """
+        Merge another ColumnStats object into this one.
+        :param other: The ColumnStats object to merge.
+        :return: None
+        """
+        super().merge(other)
+        self.sketch.merge(other.sketch)
+        self.removed.merge(other.removed)
+
+    def remove(self, values):
+        """
+        Remove a batch of values added before.
+        :param values: Array of values, missing values are ignored.
+        :return: None
+        """
+        batch = RunningStats()
+        batch.update(values)
+        if batch.count == 0:
+            return
+        count = self.count - batch.count
+        if count <= 0:
+            self.__init__(self.sketch.k)
+            return
+        # inverse of merge
+        mean = (self.count * self.mean - batch.count * batch.mean) / count
+        delta = batch.mean - mean
+        self.m2 = max(self.m2 - batch.m2 - delta ** 2 * count * batch.count / self.count, 0.0)
+        self.mean = mean
+        self.count = count
+        self.removed.update(values)
+        if batch.min <= self.min or batch.max >= self.max:
+            low, high = self.quantiles([0.0, 1.0], bounded=False)
+            if batch.min <= self.min:
+                self.min = float(low)
+            if batch.max >= self.max:
+                self.max = float(high)
+
+    def quantiles(self, quantiles, bounded=True):
+        """
+        Estimate quantiles, exactly while the sketches keep every value.
+        :param quantiles: List of quantiles between 0 and 1.
+        :param bounded: True to clip estimates to min and max.
+        :return: Array of values at the quantiles, NaN if no value was seen.
+        """
+        if self.count == 0:
+            return np.full(len(quantiles), np.nan)
+        values, weights = self.sketch.points()
+        if self.removed.count:
+            removed, removed_weights = self.removed.points()
+            values = np.concatenate([values, removed])
+            weights = np.concatenate([weights, -removed_weights])
+        estimates = weighted_quantiles(values, weights, quantiles)
+        if bounded:
+            estimates = np.clip(estimates, self.min, self.max)
+        return estimates
+
+    def rank_error(self):
+        """
+        Get the bound on the error of estimated ranks, as a fraction of the count.
+        :return: Error of the sketches relative to the values left.
+        """
+        if self.count == 0:
+            return 0.0
+        return ((self.sketch.rank_error() * self.sketch.count
+                 + self.removed.rank_error() * self.removed.count) / self.count)
+
+    def describe(self, percentiles):
+        """
+        Get the statistics of DataFrame.describe().
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: List of count, mean, std, min, each percentile and max.
+        """
+        if self.count == 0:
+            return [0.0] + [np.nan] * (len(percentiles) + 3)
+        return [float(self.count), self.mean, self.std, self.min,
+                *self.quantiles(percentiles), self.max]
+
+
+def percentile_label(quantile):
+    """
+    Get the label DataFrame.describe() gives a percentile.
+    :param quantile: Quantile between 0 and 1.
+    :return: Label such as '25%' or '99.9%'.
+    """
+    return f'{quantile * 100:g}%'
+
+
+class StatsEngine:
+    """
+        Mergeable statistics of numeric columns over the whole table and over
+        each category, see ColumnStats. Rows are folded in and out in batches,
+        engines built on separate chunks or processes are merged, and reading
+        statistics costs the same however many rows were seen.
+
+        Attributes:
+            columns: List of numeric column names.
+            group: Column the rows are grouped by.
+            k: Capacity of the top level of the sketches.
+            overall: ColumnStats of each column over every row.
+            groups: Dictionary of ColumnStats of each column, keyed by group.
+    """
+
+    def __init__(self, columns, group='category', k=SKETCH_K):
+        """
+        Initialize an empty StatsEngine object.
+        :param columns: List of numeric column names.
+        :param group: Column the rows are grouped by.
+        :param k: Capacity of the top level of the sketches.
+        """
+        self.columns = list(columns)
+        self.group = group
+        self.k = k
+        self.overall = {column: ColumnStats(k) for column in self.columns}
+        self.groups = {}
+
+    def fold(self, df, action):
+        """
+        Add or remove rows in every statistic they belong to.
+        :param df: DataFrame with the columns and the group column.
+        :param action: 'update' or 'remove'.
+        :return: None
+        """
+        if len(df) == 0:
+            return
+        codes, names = pd.factorize(df[self.group])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        for column in self.columns:
+            values = df[column].to_numpy(dtype='float64')
+            getattr(self.overall[column], action)(values)
+            grouped = values[order]
+            for code, name in enumerate(names):
+                if name not in self.groups:
+                    self.groups[name] = {each: ColumnStats(self.k) for each in self.columns}
+                getattr(self.groups[name][column], action)(grouped[bounds[code]:bounds[code + 1]])
+
+    def update(self, df):
+        """
+        Add rows.
+        :param df: DataFrame with the columns and the group column.
+        :return: None
+        """
+        self.fold(df, 'update')
+
+    def remove(self, df):
+        """
+        Remove rows added before, such as the old values of updated rows.
+        :param df: DataFrame with the columns and the group column.
+        :return: None
+        """
+        self.fold(df, 'remove')
+
+    def merge(self, other):
+        """
+        Merge another StatsEngine object of the same columns into this one.
+        :param other: The StatsEngine object to merge.
+        :return: None
+        """
+        for column in self.columns:
+            self.overall[column].merge(other.overall[column])
+        for name, stats in other.groups.items():
+            if name not in self.groups:
+                self.groups[name] = {column: ColumnStats(self.k) for column in self.columns}
+            for column in self.columns:
+                self.groups[name][column].merge(stats[column])
+
+    def copy(self):
+        """
+        Copy the engine, so it can be changed while the original is still read.
+        :return: New StatsEngine object.
+        """
+        return copy.deepcopy(self)
+
+    def covers(self, columns):
+        """
+        Check whether statistics of columns are kept.
+        :param columns: List of column names.
+        :return: True if every column is kept.
+        """
+        return all(column in self.overall for column in columns)
+
+    def column_stats(self, column, group=None):
+        """
+        Get statistics of a column.
+        :param column: Numeric column name.
+        :param group: Name of a group, None for every row.
+        :return: The ColumnStats object, empty if the group has no rows.
+        """
+        if group is None:
+            return self.overall[column]
+        stats = self.groups.get(group)
+        return stats[column] if stats is not None else ColumnStats(self.k)
+
+    def group_names(self):
+        """
+        Get names of groups that have rows.
+        :return: Sorted list of group names.
+        """
+        return sorted(name for name, stats in self.groups.items()
+                      if any(stats[column].count > 0 for column in self.columns))
+
+    def describe(self, columns, group=None, percentiles=(.25, .50, .75)):
+        """
+        Get the statistics of DataFrame.describe() from the summaries.
+        :param columns: List of kept column names.
+        :param group: Name of a group, None for every row.
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: DataFrame with a row for each statistic and a column for each
+            column, attrs['rank_error'] is the largest error of the percentiles.
+        """
+        table = pd.DataFrame({column: self.column_stats(column, group).describe(percentiles)
+                              for column in columns},
+                             index=['count', 'mean', 'std', 'min',
+                                    *[percentile_label(each) for each in percentiles], 'max'])
+        table.attrs['rank_error'] = max((self.column_stats(column, group).rank_error()
+                                         for column in columns), default=0.0)
+        return table
+
+    def by_group(self, column, percentiles=(.25, .50, .75)):
+        """
+        Get the statistics of a column for each group.
+        :param column: Kept numeric column name.
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: DataFrame with a row for each group and a column for each statistic.
+        """
+        names = self.group_names()
+        return pd.DataFrame([self.column_stats(column, name).describe(percentiles)
+                             for name in names], index=pd.Index(names, name=self.group),
+                            columns=['count', 'mean', 'std', 'min',
+                                     *[percentile_label(each) for each in percentiles], 'max'])
+
+
+class StreamAggregator:
+    """
+        Aggregates needed by the charts, folded chunk by chunk so the full
+        dataset never has to be resident.
+
+        Attributes:
+            top_n: Number of channels kept per category for each metric.
+            sample_size: Number of rows kept in the uniform random sample.
+            rows: Number of rows seen after cleaning.
+            year_category: Count of channels for each (created_year, category).
+            category_sums: Sum of each numeric column for each category.
+            category_counts: Count of non-missing values of each numeric column for each category.
+            top: DataFrame of top channels for each metric, keyed by metric.
+            histograms: StreamingHistogram for each numeric column.
+            stats: StatsEngine of the numeric columns over every row and each category.
+            sample: Uniform random sample of cleaned rows.
+    """
+
+    def __init__(self, top_n=10, sample_size=200_000, seed=0):
+        """
+        Initialize an empty StreamAggregator object.
+        :param top_n: Number of channels kept per category for each metric.
+        :param sample_size: Number of rows kept in the random sample.
+        :param seed: Seed of the random sample.
+        """
+        self.top_n = top_n
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.year_category = pd.Series(dtype='int64')
+        self.category_sums = pd.DataFrame(dtype='float64')
+        self.category_counts = pd.DataFrame(dtype='int64')
+        self.top = {metric: pd.DataFrame() for metric in NUMERIC_COLUMNS}
+        self.histograms = {column: StreamingHistogram() for column in NUMERIC_COLUMNS}
+        self.stats = StatsEngine(NUMERIC_COLUMNS)
+        self.sample = pd.DataFrame()
+
+    def update(self, chunk):
+        """
+        Fold a cleaned chunk into the aggregates.
+        :param chunk: Cleaned DataFrame with 'average_monthly_earnings' column.
+        :return: None
+        """
+        self.rows += len(chunk)
+        counts = chunk.groupby(['created_year', 'category']).size()
+        if not self.year_category.empty:
+            counts = self.year_category.add(counts, fill_value=0).astype('int64')
+        self.year_category = counts
+
+        grouped = chunk.groupby('category')[NUMERIC_COLUMNS]
+        self.category_sums = self.category_sums.add(grouped.sum(), fill_value=0)
+        self.category_counts = self.category_counts.add(grouped.count(), fill_value=0)
+
+        for metric in NUMERIC_COLUMNS:
+            candidates = chunk[['Youtuber', 'category', metric]]
+            if not self.top[metric].empty:
+                candidates = pd.concat([self.top[metric], candidates], ignore_index=True)
+            candidates = candidates.sort_values(by=metric, ascending=False, kind='stable')
+            self.top[metric] = candidates.groupby('category').head(self.top_n)
+            self.histograms[metric].update(chunk[metric].to_numpy())
+        self.stats.update(chunk)
+
+        # bottom-k sampling on random keys gives a uniform sample of all chunks
+        keyed = chunk.assign(_key=self.rng.random(len(chunk)))
+        if not self.sample.empty:
+            keyed = pd.concat([self.sample, keyed], ignore_index=True)
+        self.sample = keyed
+        if len(self.sample) > self.sample_size:
+            self.sample = self.sample.nsmallest(self.sample_size, '_key')
+
+    def year_category_counts(self):
+        """
+        Get count of channels created in each year for each category.
+        :return: DataFrame indexed by year with a column for each category.
+        """
+        return self.year_category.unstack(fill_value=0)
+
+    def category_means(self, attribute):
+        """
+        Get mean of an attribute for each category.
+        :param attribute: Numeric column name.
+        :return: Series indexed by category.
+        """
+        return self.category_sums[attribute] / self.category_counts[attribute]
+
+    def top_channels(self, category, metric):
+        """
+        Get top channels of a category by a metric.
+        :param category: Category name.
+        :param metric: Numeric column name.
+        :return: DataFrame sorted by metric in descending order.
+        """
+        top = self.top[metric]
+        return top[top['category'] == category]
+
+    def summary_stats(self, columns, category=None, percentiles=(.25, .50, .75)):
+        """
+        Get count, mean, std, min, percentiles and max of columns, see StatsEngine.describe.
+        :param columns: List of numeric column names.
+        :param category: Category name, None for every row.
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: DataFrame with a row for each statistic and a column for each column.
+        """
+        return self.stats.describe(columns, category, percentiles)
+
+    def sample_frame(self):
+        """
+        Get uniform random sample of cleaned rows.
+        :return: DataFrame of sampled rows.
+        """
+        return self.sample.drop(columns='_key').reset_index(drop=True)
+
+
+def stream_csv(path, clean, chunksize=500_000, top_n=10, sample_size=200_000, progress=None):
+    """
+    Read a CSV file in chunks and fold each cleaned chunk into a StreamAggregator.
+    :param path: Path of the CSV file.
+    :param clean: Function that takes a raw chunk and returns the cleaned chunk.
+    :param chunksize: Number of rows parsed at a time.
+    :param top_n: Number of channels kept per category for each metric.
+    :param sample_size: Number of rows kept in the random sample.
+    :param progress: Function called with the number of cleaned rows after each chunk.
+    :return: The StreamAggregator holding aggregates of the whole file.
+    """
+    aggregator = StreamAggregator(top_n=top_n, sample_size=sample_size)
+    reader = pd.read_csv(path, encoding='latin-1', dtype=DTYPES, usecols=list(DTYPES),
+                         chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            aggregator.update(clean(chunk))
+            if progress is not None:
+                progress(aggregator.rows)
+    return aggregator
@@ -1,5 +1,9 @@
+import time
+
+started = time.perf_counter()
+
 from youtube_controller import YouTubeController
 
 
-app = YouTubeController()
+app = YouTubeController(started)
 app.run()
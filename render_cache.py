@@ -0,0 +1,142 @@
+import os
+import hashlib
+from collections import OrderedDict
+
+
+class RenderCache:
+    """
+        A memory-bounded LRU cache of rendered charts stored as PNG bytes,
+        optionally persisted on disk so charts survive across sessions.
+
+        Keys should identify everything the image depends on: chart kind,
+        parameters, data version, chart version and canvas size.
+
+        Attributes:
+            budget: Maximum total size of images kept in memory in bytes.
+            directory: Directory of persisted images, or None to keep them in memory only.
+            disk_budget: Maximum total size of persisted images in bytes.
+            size: Current total size of images kept in memory in bytes.
+            hits: Number of lookups answered from memory.
+            disk_hits: Number of lookups answered from disk.
+            misses: Number of lookups that had to render the chart.
+            evictions: Number of images evicted from memory to stay within budget.
+    """
+
+    def __init__(self, budget=32 * 1024 ** 2, directory=None, disk_budget=256 * 1024 ** 2):
+        """
+        Initialize an empty RenderCache object.
+        :param budget: Maximum total size of images kept in memory in bytes.
+        :param directory: Directory of persisted images, or None to disable persistence.
+        :param disk_budget: Maximum total size of persisted images in bytes.
+        """
+        self.budget = budget
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(key):
+        """
+        Get a stable file name for a key.
+        :param key: Tuple identifying the chart.
+        :return: Hex digest of the key.
+        """
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Get a rendered chart.
+        :param key: Tuple identifying the chart.
+        :return: PNG bytes, or None if the chart is not cached.
+        """
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.directory:
+            path = os.path.join(self.directory, self.digest(key) + '.png')
+            try:
+                with open(path, 'rb') as file:
+                    png = file.read()
+            except OSError:
+                png = None
+            if png is not None:
+                self.disk_hits += 1
+                self.remember(key, png)
+                return png
+        self.misses += 1
+        return None
+
+    def put(self, key, png):
+        """
+        Cache a rendered chart.
+        :param key: Tuple identifying the chart.
+        :param png: PNG bytes of the chart.
+        :return: None
+        """
+        self.remember(key, png)
+        if self.directory:
+            path = os.path.join(self.directory, self.digest(key) + '.png')
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as file:
+                file.write(png)
+            os.replace(tmp_path, path)
+            self.prune_disk()
+
+    def remember(self, key, png):
+        """
+        Keep a rendered chart in memory, evicting least recently used charts over budget.
+        :param key: Tuple identifying the chart.
+        :param png: PNG bytes of the chart.
+        :return: None
+        """
+        if len(png) > self.budget:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = png
+        self.size += len(png)
+        while self.size > self.budget:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def prune_disk(self):
+        """
+        Delete the oldest persisted charts while over the disk budget.
+        :return: None
+        """
+        files = [entry for entry in os.scandir(self.directory)
+                 if entry.is_file() and entry.name.endswith('.png')]
+        total = sum(entry.stat().st_size for entry in files)
+        if total <= self.disk_budget:
+            return
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            if total <= self.disk_budget:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def clear(self):
+        """
+        Remove all charts kept in memory.
+        :return: None
+        """
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """
+        Get cache counters.
+        :return: Dictionary of hits, disk hits, misses, evictions, entries and size.
+        """
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self.entries),
+                'size': self.size, 'budget': self.budget}
@@ -0,0 +1,328 @@
+import io
+import sys
+import time
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from tracing import tracer
+
+
+@tracer.traced('draw')
+def rasterize(fig, width, height):
+    """
+    Rasterize a figure with Agg at the given size.
+    :param fig: The matplotlib figure object.
+    :param width: Width of the image in pixels.
+    :param height: Height of the image in pixels.
+    :return: PNG bytes of the figure.
+    """
+    # imported on first use, so the window can appear before matplotlib is loaded
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from PIL import Image
+    fig.set_size_inches(width / fig.dpi, height / fig.dpi)
+    agg = FigureCanvasAgg(fig)
+    agg.draw()
+    image = Image.frombuffer('RGBA', agg.get_width_height(), agg.buffer_rgba(),
+                             'raw', 'RGBA', 0, 1)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class RenderJob:
+    """
+        A chart to render off the Tk thread.
+
+        Attributes:
+            target: Page that displays the chart.
+            key: Tuple identifying the chart in the render cache.
+            size: Tuple of width and height of the image in pixels.
+            build: Function without arguments that creates the figure.
+            png: PNG bytes of the rendered chart, None until it is rendered.
+            error: Exception raised while rendering, if any.
+            elapsed: Seconds spent in the worker.
+            generation: Request number assigned by RenderScheduler.
+    """
+
+    def __init__(self, target, key, size, build):
+        """
+        Initialize a RenderJob object.
+        :param target: Page that displays the chart.
+        :param key: Tuple identifying the chart in the render cache.
+        :param size: Tuple of width and height of the image in pixels.
+        :param build: Function without arguments that creates the figure.
+        """
+        self.target = target
+        self.key = key
+        self.size = size
+        self.build = build
+        self.png = None
+        self.error = None
+        self.elapsed = 0.0
+        self.generation = 0
+
+
+class RenderPipeline:
+    """
+        Renders charts in a worker thread and hands finished images back to the
+        Tk thread, so the mainloop keeps handling events during heavy renders.
+
+        Figures are built and rasterized entirely in the worker. The Tk thread
+        polls for finished jobs with after() and never waits on the worker.
+        matplotlib and seaborn are not safe to use from several threads at once,
+        so jobs run one at a time in a single worker. Tasks that change the data
+        charts are drawn from run in the same worker, between jobs.
+
+        Attributes:
+            widget: Tk widget used to schedule polling on the Tk thread.
+            on_done: Function called on the Tk thread with each finished RenderJob.
+            poll_interval: Milliseconds between polls while jobs are in flight.
+            pending: Number of jobs and tasks submitted but not yet handed back.
+    """
+
+    def __init__(self, widget, on_done, poll_interval=30):
+        """
+        Initialize a RenderPipeline object.
+        :param widget: Tk widget used to schedule polling on the Tk thread.
+        :param on_done: Function called on the Tk thread with each finished RenderJob.
+        :param poll_interval: Milliseconds between polls while jobs are in flight.
+        """
+        self.widget = widget
+        self.on_done = on_done
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render')
+        self.results = queue.Queue()
+        self.local = threading.local()
+        self.pending = 0
+        self.polling = False
+
+    def submit(self, job):
+        """
+        Render a job in the worker.
+        :param job: The RenderJob to render.
+        :return: Future of the job.
+        """
+        return self.dispatch(self.run, job)
+
+    def submit_task(self, task, on_done):
+        """
+        Run a function in the worker between jobs, so no chart is built while it runs.
+        :param task: Function without arguments.
+        :param on_done: Function called on the Tk thread with the result and the
+            exception raised by task, if any.
+        :return: Future of the task.
+        """
+        return self.dispatch(self.run_task, task, on_done)
+
+    def dispatch(self, func, *args):
+        """
+        Queue a call in the worker and poll for its result.
+        :param func: Method run in the worker, it puts its result in results.
+        :param args: Arguments of the method.
+        :return: Future of the call.
+        """
+        self.pending += 1
+        future = self.executor.submit(func, *args)
+        if not self.polling:
+            self.polling = True
+            self.widget.after(self.poll_interval, self.poll)
+        return future
+
+    def run(self, job):
+        """
+        Build and rasterize a job, runs in the worker.
+        :param job: The RenderJob to render.
+        :return: None
+        """
+        start = time.perf_counter()
+        self.local.job = job
+        try:
+            with tracer.span(f'render {job.key[0]}', 'render', target=job.target):
+                job.build()
+        except Exception as error:
+            job.error = error
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            self.local.job = None
+        job.elapsed = time.perf_counter() - start
+        self.results.put((self.on_done, (job,)))
+
+    def run_task(self, task, on_done):
+        """
+        Run a task, runs in the worker.
+        :param task: Function without arguments.
+        :param on_done: Function called on the Tk thread with the result and the error.
+        :return: None
+        """
+        result, error = None, None
+        try:
+            result = task()
+        except Exception as exception:
+            error = exception
+            traceback.print_exc(file=sys.stderr)
+        self.results.put((on_done, (result, error)))
+
+    def in_worker(self):
+        """
+        Check whether the caller runs a job in the worker.
+        :return: True if called while a job is being built.
+        """
+        return getattr(self.local, 'job', None) is not None
+
+    def complete(self, fig):
+        """
+        Rasterize the figure of the job being built, called from the worker.
+        :param fig: The matplotlib figure object.
+        :return: None
+        """
+        job = self.local.job
+        job.png = rasterize(fig, *job.size)
+
+    def poll(self):
+        """
+        Hand finished jobs to on_done and finished tasks to their callbacks,
+        runs on the Tk thread.
+        :return: None
+        """
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            callback(*args)
+        if self.pending > 0:
+            self.widget.after(self.poll_interval, self.poll)
+        else:
+            self.polling = False
+
+    def cancel(self, future):
+        """
+        Cancel a job that has not started yet.
+        :param future: Future returned by submit.
+        :return: True if the job was cancelled.
+        """
+        if future.cancel():
+            self.pending -= 1
+            return True
+        return False
+
+    def shutdown(self):
+        """
+        Stop the worker without waiting for queued jobs.
+        :return: None
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderScheduler:
+    """
+        Latest-wins scheduling of render jobs for one canvas.
+
+        Requests arriving within a short delay of each other are coalesced into
+        the last one, at most one job per canvas is handed to the pipeline at a
+        time, and a job that has not started when a newer request arrives is
+        cancelled. Results of jobs superseded while running are discarded, so
+        only the most recent request is drawn.
+
+        Attributes:
+            pipeline: The RenderPipeline that renders the jobs.
+            delay: Milliseconds to wait for more requests before dispatching.
+            generation: Number of the most recent request.
+            requested: Number of requests received.
+            completed: Number of jobs whose result was drawn.
+            dropped: Number of requests coalesced, cancelled or discarded.
+            max_depth: Largest number of jobs queued and in flight at once.
+    """
+
+    def __init__(self, pipeline, delay=40):
+        """
+        Initialize a RenderScheduler object.
+        :param pipeline: The RenderPipeline that renders the jobs.
+        :param delay: Milliseconds to wait for more requests before dispatching.
+        """
+        self.pipeline = pipeline
+        self.delay = delay
+        self.queued = None
+        self.in_flight = None
+        self.timer = None
+        self.generation = 0
+        self.requested = 0
+        self.completed = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def depth(self):
+        """
+        Count jobs queued and in flight.
+        :return: Number of jobs.
+        """
+        return (self.queued is not None) + (self.in_flight is not None)
+
+    def supersede(self):
+        """
+        Mark every queued and in-flight job as stale.
+        :return: None
+        """
+        self.generation += 1
+        if self.queued is not None:
+            self.queued = None
+            self.dropped += 1
+        if self.timer is not None:
+            self.pipeline.widget.after_cancel(self.timer)
+            self.timer = None
+        if self.in_flight is not None:
+            job, future = self.in_flight
+            if self.pipeline.cancel(future):
+                self.in_flight = None
+                self.dropped += 1
+
+    def request(self, job):
+        """
+        Request a job, superseding every earlier request.
+        :param job: The RenderJob to render.
+        :return: None
+        """
+        self.requested += 1
+        self.supersede()
+        job.generation = self.generation
+        self.queued = job
+        self.max_depth = max(self.max_depth, self.depth())
+        self.timer = self.pipeline.widget.after(self.delay, self.dispatch)
+
+    def dispatch(self):
+        """
+        Hand the queued job to the pipeline once no job is in flight.
+        :return: None
+        """
+        self.timer = None
+        if self.in_flight is not None or self.queued is None:
+            return
+        job, self.queued = self.queued, None
+        self.in_flight = (job, self.pipeline.submit(job))
+
+    def finished(self, job):
+        """
+        Record a finished job and dispatch the queued one.
+        :param job: The finished RenderJob.
+        :return: True if the job is the most recent request and should be drawn.
+        """
+        if self.in_flight is not None and self.in_flight[0] is job:
+            self.in_flight = None
+        current = job.generation == self.generation
+        if current:
+            self.completed += 1
+        else:
+            self.dropped += 1
+        if self.timer is None:
+            self.dispatch()
+        return current
+
+    def stats(self):
+        """
+        Get scheduler counters.
+        :return: Dictionary of requested, completed, dropped, depth and max depth.
+        """
+        return {'requested': self.requested, 'completed': self.completed,
+                'dropped': self.dropped, 'depth': self.depth(), 'max_depth': self.max_depth}
@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from data_manage import KEY_COLUMN, prepare_frame, blank_keys
+from tracing import tracer
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+SNAPSHOT_DIR = 'snapshots'
+
+MANIFEST_FILE = 'manifest.json'
+
+# periods growth rates can be computed over, as pandas period aliases
+GROWTH_PERIODS = {'D': 'day', 'W': 'week', 'M': 'month'}
+
+
+def growth_rates(frame, period='D'):
+    """
+    Calculate growth rates of values over periods, from the last snapshot of
+    each period to the last snapshot of the next one.
+    :param frame: DataFrame or Series indexed by snapshot date.
+    :param period: 'D' for day-over-day, 'W' for week-over-week or 'M' for month-over-month.
+    :return: Growth rates of the same shape indexed by period, 0.1 meaning 10% growth.
+    """
+    if period not in GROWTH_PERIODS:
+        raise ValueError(f"Unknown period: {period}, expected one of {', '.join(GROWTH_PERIODS)}")
+    last = frame.groupby(frame.index.to_period(period)).last()
+    return last.pct_change(fill_method=None)
+
+
+class SnapshotStore:
+    """
+        An append-only columnar store of dated snapshots of the dataset, for
+        following channels and categories over time.
+
+        Each snapshot is cleaned with the rules of the application and only the
+        rows of channels that are new or changed since their previous stored
+        row are written, as a segment file sorted by channel number. A channel
+        missing from a snapshot keeps its last values. Segments are uncompressed
+        Feather files, so a channel's history is found by a binary search of
+        each memory-mapped segment without reading the rest of it. Totals of
+        every category are kept for every snapshot when it is appended, so
+        category growth is read without touching the segments.
+
+        The latest row of every channel, the channel names and the category
+        totals are written as a new generation of state files on every append,
+        and the manifest is replaced last, so a failed append leaves the store
+        as it was.
+
+        Attributes:
+            directory: Directory holding the store.
+            manifest: Dictionary of snapshots, columns, categories and the current state.
+            columns: Numeric columns stored for each channel.
+            categories: Category names, numbered in order of first appearance.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        """
+        Open a SnapshotStore object, creating the store if it does not exist.
+        :param directory: Directory holding the store.
+        """
+        if feather is None:
+            raise ImportError('SnapshotStore needs pyarrow')
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'segments'), exist_ok=True)
+        self.manifest = self.read_manifest()
+        self.columns = self.manifest['columns']
+        self.categories = self.manifest['categories']
+        self.names = None
+        self.totals = None
+
+    def path(self, name):
+        """
+        Get the path of a file of the store.
+        :param name: File name relative to the store directory.
+        :return: Path of the file.
+        """
+        return os.path.join(self.directory, name)
+
+    def read_manifest(self):
+        """
+        Read the manifest of the store.
+        :return: Dictionary of the manifest, empty for a new store.
+        """
+        try:
+            with open(self.path(MANIFEST_FILE), encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'snapshots': [], 'columns': None, 'categories': [], 'state': None}
+
+    def write_manifest(self, manifest):
+        """
+        Replace the manifest of the store.
+        :param manifest: Dictionary of the manifest.
+        :return: None
+        """
+        tmp_path = self.path(MANIFEST_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(tmp_path, self.path(MANIFEST_FILE))
+
+    def read(self, name, columns=None):
+        """
+        Read a Feather file of the store, memory-mapped.
+        :param name: File name relative to the store directory.
+        :param columns: List of columns to read, None for every column.
+        :return: pyarrow Table.
+        """
+        return feather.read_table(self.path(name), columns=columns, memory_map=True)
+
+    def write(self, name, df):
+        """
+        Write a Feather file of the store, uncompressed and in one chunk so it
+        can be searched without copying.
+        :param name: File name relative to the store directory.
+        :param df: DataFrame to write.
+        :return: None
+        """
+        tmp_path = self.path(name + '.tmp')
+        feather.write_feather(df, tmp_path, compression='uncompressed',
+                              chunksize=max(len(df), 1))
+        os.replace(tmp_path, self.path(name))
+
+    def dates(self):
+        """
+        Get dates of the stored snapshots.
+        :return: DatetimeIndex in ascending order.
+        """
+        return pd.DatetimeIndex([snapshot['date'] for snapshot in self.manifest['snapshots']])
+
+    def channel_names(self):
+        """
+        Get names of the stored channels, indexed by channel number.
+        :return: pandas Index of names.
+        """
+        if self.names is None:
+            state = self.manifest['state']
+            names = pd.Series([], dtype='string')
+            if state is not None:
+                names = self.read(f'{state}.channels.feather')[KEY_COLUMN].to_pandas()
+            self.names = pd.Index(names.astype('string'), name=KEY_COLUMN)
+        return self.names
+
+    def latest(self):
+        """
+        Get the latest stored row of every channel.
+        :return: DataFrame indexed by channel number with the numeric columns and
+            'category' as category number, empty before the first snapshot.
+        """
+        state = self.manifest['state']
+        if state is None:
+            return pd.DataFrame()
+        return self.read(f'{state}.latest.feather').to_pandas()
+
+    def category_totals(self):
+        """
+        Get totals of every category at every snapshot.
+        :return: DataFrame with 'date', 'category' and 'channels' columns and
+            the sum of every numeric column.
+        """
+        if self.totals is None:
+            state = self.manifest['state']
+            if state is None:
+                return pd.DataFrame(columns=['date', 'category', 'channels'])
+            self.totals = self.read(f'{state}.categories.feather').to_pandas()
+        return self.totals
+
+    @tracer.traced('data')
+    def append(self, source, date):
+        """
+        Append a snapshot. Only rows of channels that are new or whose values
+        differ from their latest stored row are written. Channels are matched by
+        KEY_COLUMN, and rows whose name is empty or repeated in the snapshot are
+        rejected, since they cannot say whose history they belong to.
+        :param source: Path of a CSV file with the columns of the dataset, or a DataFrame.
+        :param date: Date of the snapshot, later than every stored snapshot.
+        :return: Dictionary of the snapshot's 'date', number of 'rows' stored,
+            'rejected' rows, 'changed' and 'added' channels and 'seconds' spent.
+        """
+        start = time.perf_counter()
+        date = pd.Timestamp(date).normalize()
+        snapshots = self.manifest['snapshots']
+        if snapshots and date <= pd.Timestamp(snapshots[-1]['date']):
+            raise ValueError(f"Snapshots are append-only, {date.date()} is not after "
+                             f"{snapshots[-1]['date']}")
+        if isinstance(source, str):
+            source = pd.read_csv(source, encoding="latin-1")
+        df = prepare_frame(source)
+        keys = df[KEY_COLUMN]
+        rejected = blank_keys(keys) | keys.duplicated(keep=False).to_numpy()
+        df = df[~rejected]
+        columns = self.columns
+        if columns is None:
+            columns = list(df.select_dtypes('number').columns)
+        missing = [column for column in columns + ['category'] if column not in df]
+        if missing:
+            raise ValueError(f"Snapshot is missing columns: {', '.join(missing)}")
+
+        names = self.channel_names()
+        channels = names.get_indexer(df[KEY_COLUMN].astype('string'))
+        new = channels < 0
+        channels[new] = np.arange(len(names), len(names) + new.sum())
+        names = names.append(pd.Index(df.loc[new, KEY_COLUMN].astype('string')))
+        categories = self.categories + [category for category in df['category'].unique()
+                                        if category not in self.categories]
+        codes = pd.Categorical(df['category'], categories=categories).codes.astype('int16')
+        values = df[columns].to_numpy(dtype='float64')
+
+        # latest rows grow to every known channel, unseen channels have no values yet
+        latest = self.latest()
+        current = np.full((len(names), len(columns)), np.nan)
+        current_codes = np.full(len(names), -1, dtype='int16')
+        if len(latest):
+            current[:len(latest)] = latest[columns].to_numpy(dtype='float64')
+            current_codes[:len(latest)] = latest['category'].to_numpy()
+        before = current[channels]
+        same = (before == values) | (np.isnan(before) & np.isnan(values))
+        changed = new | ~same.all(axis=1) | (current_codes[channels] != codes)
+        current[channels[changed]] = values[changed]
+        current_codes[channels[changed]] = codes[changed]
+
+        order = np.argsort(channels[changed], kind='stable')
+        segment = pd.DataFrame(values[changed][order], columns=columns)
+        segment.insert(0, 'channel', channels[changed][order].astype('int32'))
+        segment['category'] = codes[changed][order]
+        segment_name = f"segments/{date.strftime('%Y-%m-%d')}.feather"
+        self.write(segment_name, segment)
+
+        # totals over every channel seen so far, each keeping its latest values
+        seen = current_codes >= 0
+        totals = {'date': date, 'category': categories,
+                  'channels': np.bincount(current_codes[seen], minlength=len(categories))}
+        for number, column in enumerate(columns):
+            column_values = current[seen, number]
+            present = ~np.isnan(column_values)
+            totals[column] = np.bincount(current_codes[seen][present], column_values[present],
+                                         minlength=len(categories))
+        totals = pd.DataFrame(totals)
+        if snapshots:
+            totals = pd.concat([self.category_totals(), totals], ignore_index=True)
+
+        generation = len(snapshots) + 1
+        state = f'state-{generation:05d}'
+        state_latest = pd.DataFrame(current, columns=columns)
+        state_latest['category'] = current_codes
+        self.write(f'{state}.latest.feather', state_latest)
+        self.write(f'{state}.channels.feather',
+                   pd.DataFrame({KEY_COLUMN: names.to_numpy(dtype=object)}))
+        self.write(f'{state}.categories.feather', totals)
+        snapshot = {'date': date.strftime('%Y-%m-%d'), 'segment': segment_name,
+                    'rows': int(len(df)), 'rejected': int(rejected.sum()),
+                    'changed': int(changed.sum()), 'added': int(new.sum())}
+        old_state = self.manifest['state']
+        manifest = {'snapshots': snapshots + [snapshot], 'columns': columns,
+                    'categories': categories, 'state': state}
+        self.write_manifest(manifest)
+        if old_state is not None:
+            for kind in ('latest', 'channels', 'categories'):
+                os.remove(self.path(f'{old_state}.{kind}.feather'))
+        self.manifest = manifest
+        self.columns = columns
+        self.categories = categories
+        self.names = names
+        self.totals = totals
+        return dict(snapshot, seconds=time.perf_counter() - start)
+
+    def history(self, channel, columns=None):
+        """
+        Get the values of a channel at every snapshot since it first appeared.
+        :param channel: Name of the channel as exported, see KEY_COLUMN.
+        :param columns: List of numeric columns, None for every column.
+        :return: DataFrame indexed by snapshot date with the columns and 'category'.
+        """
+        columns = list(self.columns or []) if columns is None else list(columns)
+        unknown = [column for column in columns if column not in (self.columns or [])]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        names = self.channel_names()
+        if channel not in names:
+            raise KeyError(channel)
+        number = names.get_loc(channel)
+        dates, rows = [], []
+        for snapshot in self.manifest['snapshots']:
+            segment = self.read(snapshot['segment'], ['channel', 'category'] + columns)
+            channels = segment.column('channel').to_numpy()
+            position = np.searchsorted(channels, number)
+            if position < len(channels) and channels[position] == number:
+                dates.append(snapshot['date'])
+                rows.append(segment.slice(position, 1).to_pandas())
+        if not rows:
+            return pd.DataFrame(columns=columns + ['category'])
+        history = pd.concat(rows, ignore_index=True).drop(columns='channel')
+        history.index = pd.DatetimeIndex(dates, name='date')
+        # a snapshot without a row for the channel means it did not change
+        history = history.reindex(self.dates()[self.dates() >= history.index[0]]).ffill()
+        history['category'] = pd.Categorical.from_codes(history['category'].astype('int16'),
+                                                        self.categories)
+        history.index.name = 'date'
+        return history
+
+    def channel_growth(self, channel, column, period='D'):
+        """
+        Calculate growth rates of a column of a channel, see growth_rates.
+        :param channel: Name of the channel as exported, see KEY_COLUMN.
+        :param column: Numeric column name.
+        :param period: 'D', 'W' or 'M'.
+        :return: Series of growth rates indexed by period.
+        """
+        return growth_rates(self.history(channel, [column])[column], period)
+
+    def category_growth(self, column, period='D'):
+        """
+        Calculate growth rates of the total of a column of every category,
+        computed for all categories and periods at once, see growth_rates.
+        :param column: Numeric column name, or 'channels' for the number of channels.
+        :param period: 'D', 'W' or 'M'.
+        :return: DataFrame of growth rates indexed by period with a column for each category.
+        """
+        totals = self.category_totals()
+        if column not in totals or column in ('date', 'category'):
+            raise ValueError(f'Unknown column: {column}')
+        table = totals.pivot(index='date', columns='category', values=column)
+        return growth_rates(table, period)
+
+
+def main():
+    """
+    Append snapshots and query the store from the command line.
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description='Keep dated snapshots of the YouTube '
+                                                 'statistics and follow their growth.')
+    parser.add_argument('--store', default=SNAPSHOT_DIR, help='directory of the store')
+    commands = parser.add_subparsers(dest='command', required=True)
+    append = commands.add_parser('append', help='append a snapshot')
+    append.add_argument('file', help='CSV file of the snapshot')
+    append.add_argument('--date', required=True, help='date of the snapshot, YYYY-MM-DD')
+    history = commands.add_parser('history', help='show the history of a channel')
+    history.add_argument('channel', help='name of the channel')
+    growth = commands.add_parser('growth', help='show growth rates of every category')
+    growth.add_argument('column', help="numeric column, or 'channels'")
+    growth.add_argument('--period', default='D', choices=list(GROWTH_PERIODS))
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    if args.command == 'append':
+        report = store.append(args.file, args.date)
+        print(f"{report['date']}: {report['rows']:,} rows, {report['changed']:,} changed, "
+              f"{report['added']:,} new channels, in {report['seconds']:.1f} s")
+        if report['rejected']:
+            print(f"Rejected {report['rejected']:,} rows with an empty or repeated channel name")
+    elif args.command == 'history':
+        print(store.history(args.channel).to_string())
+    else:
+        print(store.category_growth(args.column, args.period).to_string(float_format='{:.2%}'.format))
+
+
+if __name__ == '__main__':
+    main()
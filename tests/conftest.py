@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+import pytest
+import matplotlib
+
+matplotlib.use('Agg')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import generate_chunk
+from batch_render import HeadlessController
+from data_manage import StoryTelling
+
+# channels in the synthetic dataset
+ROWS = 3000
+
+# exported names that clean to the same 'Youtuber', or to an empty one
+COLLIDING_NAMES = ['Ab-1', 'Ab 2', 'Ab!!', '123', '42!']
+
+
+@pytest.fixture
+def raw():
+    """
+    Synthetic export with the schema of the dataset. Subscribers are rounded,
+    so rankings have ties, and a few names only differ in non-letters.
+    """
+    df = generate_chunk(ROWS, np.random.default_rng(7))
+    df.loc[:len(COLLIDING_NAMES) - 1, 'Youtuber'] = COLLIDING_NAMES
+    df.loc[:len(COLLIDING_NAMES) - 1, ['category', 'created_year']] = ['Music', 2010]
+    return df
+
+
+@pytest.fixture
+def data_file(raw, tmp_path, monkeypatch):
+    """
+    Path of the synthetic export, with the working directory moved to a
+    temporary one so the dataset cache is written there.
+    """
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'channels.csv')
+    raw.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def story(data_file):
+    return StoryTelling(HeadlessController(), data_file)
@@ -0,0 +1,16 @@
+import pandas as pd
+import pytest
+from batch_render import HeadlessController
+from data_manage import StoryTelling
+
+pytest.importorskip('pyarrow')
+
+
+def test_cache_load_keeps_compact_types(story, data_file):
+    cached = StoryTelling(HeadlessController(), data_file)
+    fresh = story.youtube_data.reset_index(drop=True)
+    # assert_frame_equal also compares the dtype of every column
+    pd.testing.assert_frame_equal(cached.youtube_data, fresh)
+    assert isinstance(cached.youtube_data['category'].dtype, pd.CategoricalDtype)
+    assert cached.youtube_data['Youtuber'].dtype == 'string[pyarrow]'
+    assert cached.youtube_data['created_year'].dtype == 'int16'
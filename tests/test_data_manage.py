@@ -0,0 +1,372 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import matplotlib as mpl
+from batch_render import HeadlessController
+from benchmark import generate_chunk
+from conftest import COLLIDING_NAMES
+from data_manage import (StoryTelling, AggregateCache, TopKIndex, RANK_METRICS, KEY_COLUMN,
+                         CONFIDENCE_Z, fit_line, histogram_kde, inlier_mask, align_columns,
+                         compact_frame, make_filter, year_category_counts, category_sums)
+
+METRICS = list(RANK_METRICS)
+
+
+def load(raw, path):
+    """
+    Load a story from scratch, the reference ingest is compared with.
+    """
+    raw.to_csv(path, index=False)
+    return StoryTelling(HeadlessController(), str(path))
+
+
+def names(df):
+    return df[KEY_COLUMN].astype(object).tolist()
+
+
+def assert_within_rank_error(table, df, percentiles):
+    """
+    Check that each percentile of a statistics table falls within its rank
+    error of the quantile of the values in a frame.
+    """
+    for column in table.columns:
+        values = np.sort(df[column].dropna().to_numpy(dtype='float64'))
+        for quantile in percentiles:
+            estimate = table.loc[f'{quantile * 100:g}%', column]
+            low = np.searchsorted(values, estimate, 'left') / len(values)
+            high = np.searchsorted(values, estimate, 'right') / len(values)
+            assert low - table.attrs['rank_error'] <= quantile <= high + table.attrs['rank_error']
+
+
+def test_summary_stats_match_describe(story):
+    df = story.youtube_data
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    for category, percentiles in [(None, (.25, .5, .75)), ('Music', (.1, .5, .99)),
+                                  ('Shows', (.25, .5, .75))]:
+        rows = df if category is None else df[df['category'] == category]
+        expected = rows[METRICS].astype('float64').describe(list(percentiles))
+        table = story.summary_stats(METRICS, category, percentiles)
+        if table.attrs['rank_error'] == 0:
+            # no sketch has compacted yet
+            pd.testing.assert_frame_equal(table, expected)
+        else:
+            pd.testing.assert_frame_equal(table.loc[exact], expected.loc[exact])
+            assert_within_rank_error(table, rows, percentiles)
+
+
+def test_streamed_statistics_within_rank_error(story, data_file):
+    streamed = StoryTelling(HeadlessController(), data_file, streaming=True)
+    percentiles = [.01, .25, .5, .75, .99]
+    table = streamed.summary_stats(METRICS, percentiles=percentiles)
+    expected = story.youtube_data[METRICS].astype('float64').describe(percentiles)
+    assert 0 < table.attrs['rank_error'] < 0.05
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    pd.testing.assert_frame_equal(table.loc[exact], expected.loc[exact])
+    assert_within_rank_error(table, story.youtube_data, percentiles)
+
+
+def test_top_channels_match_nlargest(story):
+    df = story.youtube_data
+    for category in df['category'].unique():
+        rows = df[df['category'] == category]
+        for metric in METRICS:
+            assert (story.top_channels(category, metric, 10).index.tolist()
+                    == rows.nlargest(10, metric, keep='first').index.tolist())
+            assert (story.top_channels(category, metric, 3, ties=True).index.tolist()
+                    == rows.nlargest(3, metric, keep='all').index.tolist())
+            # past the index, the category is sorted instead
+            assert (story.top_channels(category, metric, 40)[metric].tolist()
+                    == rows.nlargest(40, metric)[metric].tolist())
+
+
+def test_top_k_updated_matches_rebuild(story):
+    rng = np.random.default_rng(3)
+    df = story.youtube_data
+    index = TopKIndex(df, METRICS)
+    changed = rng.choice(len(df), 200, replace=False)
+    # the current top of every ranking, so rankings have to be rebuilt
+    changed = np.union1d(changed, index.top('Music', 'subscribers', 10))
+    new = df.copy()
+    new.iloc[changed, new.columns.get_loc('subscribers')] = rng.integers(0, 60, len(changed)) * 1e6
+    new.iloc[changed[::3], new.columns.get_loc('category')] = 'Gaming'
+    added = new.iloc[:50].copy()
+    added['subscribers'] = 2e8
+    new = pd.concat([new, added], ignore_index=True)
+    changed = np.concatenate([changed, np.arange(len(df), len(new))])
+
+    updated = index.updated(new, changed)
+    rebuilt = TopKIndex(new, METRICS)
+    for key in set(updated.positions) | set(rebuilt.positions):
+        np.testing.assert_array_equal(updated.top(key[1], key[0], 10, ties=True),
+                                      rebuilt.top(key[1], key[0], 10, ties=True))
+
+
+FILTERS = [
+    make_filter(categories=['Music', 'Gaming']),
+    make_filter(years=(2010, 2015)),
+    make_filter(ranges=[('subscribers', 20e6, None)]),
+    # wide enough to clear the rows outside the range instead
+    make_filter(ranges=[('video views', 1, None)]),
+    make_filter(['Music', 'Entertainment', 'Other'], (2008, None),
+                [('subscribers', None, 30e6), ('uploads', 100, 5000)]),
+    ((('in', 'category', ('Music',)), ('range', 'subscribers', 40e6, None)),),
+    make_filter(categories=['Nothing']),
+]
+
+
+def expected_mask(df, row_filter):
+    mask = pd.Series(True, index=df.index)
+    for clause in row_filter:
+        matched = pd.Series(False, index=df.index)
+        for term in clause:
+            values = df[term[1]]
+            if term[0] == 'in':
+                matched |= values.isin(term[2])
+            else:
+                low = -np.inf if term[2] is None else term[2]
+                high = np.inf if term[3] is None else term[3]
+                matched |= values.astype('float64').between(low, high)
+        mask &= matched
+    return mask.to_numpy()
+
+
+@pytest.mark.parametrize('row_filter', FILTERS)
+def test_filtered_story_matches_pandas(story, row_filter):
+    df = story.youtube_data
+    mask = expected_mask(df, row_filter)
+    view = story.filtered(row_filter)
+    np.testing.assert_array_equal(view.selection, np.flatnonzero(mask))
+    rows = df[mask]
+    if not len(rows):
+        assert view.year_category.empty
+        return
+    pd.testing.assert_frame_equal(view.year_category, year_category_counts(rows),
+                                  check_dtype=False, check_index_type=False)
+    sums, counts = category_sums(rows)
+    pd.testing.assert_frame_equal(view.category_sums, sums, check_dtype=False)
+    pd.testing.assert_frame_equal(view.category_counts, counts, check_dtype=False)
+    for category in view.categories():
+        in_category = rows[rows['category'] == category]
+        for metric in METRICS:
+            assert (names(view.top_channels(category, metric, 5))
+                    == names(in_category.nlargest(5, metric, keep='first')))
+    table = view.summary_stats(['subscribers'])
+    expected = rows[['subscribers']].astype('float64').describe()
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    pd.testing.assert_frame_equal(table.loc[exact], expected.loc[exact])
+    assert_within_rank_error(table, rows, [.25, .5, .75])
+
+
+def test_fit_line_matches_polyfit():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 100, 500)
+    y = 3 * x + 7 + rng.normal(0, 10, 500)
+    x[::50] = np.nan
+    fit = fit_line(x, y)
+    keep = np.isfinite(x)
+    slope, intercept = np.polyfit(x[keep], y[keep], 1)
+    assert fit['count'] == keep.sum()
+    assert fit['slope'] == pytest.approx(slope)
+    assert fit['intercept'] == pytest.approx(intercept)
+
+    residual = y[keep] - (intercept + slope * x[keep])
+    s = np.sqrt(residual @ residual / (keep.sum() - 2))
+    dx = x[keep] - x[keep].mean()
+    half = CONFIDENCE_Z * s * np.sqrt(1 / keep.sum() + (fit['grid'] - x[keep].mean()) ** 2
+                                      / (dx @ dx))
+    np.testing.assert_allclose(fit['upper'] - fit['line'], half)
+    np.testing.assert_allclose(fit['line'] - fit['lower'], half)
+
+
+def test_fit_line_log_uses_positive_pairs():
+    rng = np.random.default_rng(1)
+    x = rng.lognormal(10, 1, 300)
+    y = x ** 0.8 * rng.lognormal(0, 0.2, 300)
+    x[:10] = 0
+    fit = fit_line(x, y, log=True)
+    slope, intercept = np.polyfit(np.log10(x[10:]), np.log10(y[10:]), 1)
+    assert fit['count'] == 290
+    assert fit['slope'] == pytest.approx(slope)
+    assert fit['intercept'] == pytest.approx(intercept)
+    assert fit_line([1.0], [2.0]) is None
+
+
+def test_histogram_kde_matches_numpy():
+    rng = np.random.default_rng(2)
+    values = rng.normal(10, 2, 5000)
+    histogram = histogram_kde(np.append(values, np.nan), bins=30)
+    counts, _ = np.histogram(values, histogram['edges'])
+    np.testing.assert_array_equal(histogram['counts'], counts)
+    assert histogram['counts'].sum() == len(values)
+    assert histogram['bandwidth'] == pytest.approx(values.std(ddof=1) * len(values) ** -0.2)
+
+    # gaussian KDE evaluated directly on every value, scaled to the bars
+    grid, bandwidth = histogram['grid'], histogram['bandwidth']
+    width = histogram['edges'][1] - histogram['edges'][0]
+    kernels = np.exp(-0.5 * ((grid[:, None] - values[None, :]) / bandwidth) ** 2)
+    direct = kernels.sum(axis=1) / (bandwidth * np.sqrt(2 * np.pi)) * width
+    assert np.abs(histogram['curve'] - direct).max() < 0.01 * direct.max()
+
+
+def test_inlier_mask_matches_quartiles_of_each_group(story):
+    df = story.youtube_data
+    mask = inlier_mask(df, 'uploads')
+    expected = pd.Series(False, index=df.index)
+    for _, group in df.groupby('category', observed=True)['uploads']:
+        q1, q3 = group.quantile(0.25), group.quantile(0.75)
+        expected[group.index] = group.between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+    pd.testing.assert_series_equal(mask, expected, check_names=False)
+    assert 0 < (~mask).sum() < len(df)
+
+
+def test_align_columns_widens_both_frames():
+    df = compact_frame(pd.DataFrame({'category': ['Music', 'Gaming'], 'uploads': [1, 2]}))
+    delta = compact_frame(pd.DataFrame({'category': ['Comedy'], 'uploads': [100_000]}))
+    aligned, changes = align_columns(df, delta)
+    assert list(aligned['category'].cat.categories) == ['Comedy', 'Gaming', 'Music']
+    assert aligned['category'].dtype == changes['category'].dtype
+    assert aligned['uploads'].dtype == changes['uploads'].dtype
+    assert changes['uploads'].tolist() == [100_000]
+    pd.testing.assert_frame_equal(aligned.astype({'category': object, 'uploads': 'int64'}),
+                                  pd.DataFrame({'category': ['Music', 'Gaming'],
+                                                'uploads': [1, 2]}))
+    same, _ = align_columns(df, df.iloc[:1])
+    assert same is df
+
+def make_delta(raw):
+    """
+    Build a delta of updated, new, dropped and rejected channels.
+    :return: Tuple of the delta and the rows of it that should be applied.
+    """
+    rng = np.random.default_rng(4)
+    known = raw[raw['created_year'].notna() & (raw['created_year'] != 1970)
+                & ~raw['Youtuber'].isin(COLLIDING_NAMES)]
+    updates = known.sample(40, random_state=5).copy()
+    updates['subscribers'] = updates['subscribers'] * 2
+    updates.iloc[::4, updates.columns.get_loc('category')] = 'Gaming'
+    # larger than the narrowest type of the column
+    updates.iloc[:5, updates.columns.get_loc('uploads')] = 100_000
+    colliding = raw[raw['Youtuber'].isin(['Ab-1', '123'])].copy()
+    colliding['subscribers'] = 9e8
+    added = generate_chunk(20, rng, start=10 ** 6)
+    added['created_year'] = 2021.0
+    added.loc[0, 'category'] = 'Podcasts'
+    accepted = pd.concat([updates, colliding, added], ignore_index=True)
+    dropped = generate_chunk(1, rng, start=2 * 10 ** 6).assign(created_year=1970.0)
+    rejected = generate_chunk(3, rng, start=3 * 10 ** 6)
+    rejected['Youtuber'] = [' ', 'Twice', 'Twice']
+    return pd.concat([accepted, dropped, rejected], ignore_index=True), accepted
+
+
+def apply_delta(raw, accepted):
+    """
+    Apply a delta to the raw export: replace rows by name and append new ones.
+    """
+    result = raw.copy()
+    position = {name: number for number, name in enumerate(raw['Youtuber'])}
+    new = []
+    for _, row in accepted.iterrows():
+        if row['Youtuber'] in position:
+            result.iloc[position[row['Youtuber']]] = row[raw.columns]
+        else:
+            new.append(row[raw.columns])
+    return pd.concat([result, pd.DataFrame(new)], ignore_index=True)
+
+
+def assert_same_story(story, reference):
+    pd.testing.assert_frame_equal(story.youtube_data.reset_index(drop=True),
+                                  reference.youtube_data.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False)
+    pd.testing.assert_frame_equal(story.year_category, reference.year_category,
+                                  check_dtype=False)
+    assert sorted(story.categories()) == sorted(reference.categories())
+    for metric in METRICS:
+        pd.testing.assert_series_equal(story.category_means(metric),
+                                       reference.category_means(metric))
+        for category in reference.categories():
+            assert (names(story.top_channels(category, metric, 10, ties=True))
+                    == names(reference.top_channels(category, metric, 10, ties=True)))
+    # the ingested sketches saw other values than the reloaded ones, so only
+    # the exact statistics have to agree
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    table = story.summary_stats(METRICS)
+    pd.testing.assert_frame_equal(table.loc[exact], reference.summary_stats(METRICS).loc[exact])
+    assert_within_rank_error(table, reference.youtube_data, [.25, .5, .75])
+
+
+def test_ingest_matches_full_reload(story, raw, tmp_path):
+    delta, accepted = make_delta(raw)
+    result = story.ingest(delta)
+    assert (result['added'], result['updated']) == (20, 42)
+    assert (result['dropped'], result['rejected']) == (1, 3)
+    reference = load(apply_delta(raw, accepted), tmp_path / 'reloaded.csv')
+    assert_same_story(story, reference)
+    # the colliding names are still told apart
+    rows = story.youtube_data.set_index(KEY_COLUMN)
+    assert rows.loc['Ab-1', 'subscribers'] == 9e8
+    assert rows.loc['Ab 2', 'subscribers'] != 9e8
+    assert 'Podcasts' in story.categories()
+
+    # a second delta is applied on top of the first
+    again = accepted.iloc[[0, 45]].assign(subscribers=1e9)
+    story.ingest(again)
+    reference = load(apply_delta(apply_delta(raw, accepted), again), tmp_path / 'again.csv')
+    assert_same_story(story, reference)
+
+
+def test_ingest_rejects_names_shared_by_several_rows(raw, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw.loc[[10, 11], 'Youtuber'] = 'Twin'
+    story = load(raw, tmp_path / 'twins.csv')
+    before = story.youtube_data.copy()
+    delta = raw.loc[[10]].assign(subscribers=9e8)
+    assert story.ingest(delta)['rejected'] == 1
+    pd.testing.assert_frame_equal(story.youtube_data, before)
+
+
+def test_data_version_chains_ingested_deltas(data_file, raw):
+    delta, _ = make_delta(raw)
+    first = StoryTelling(HeadlessController(), data_file)
+    second = StoryTelling(HeadlessController(), data_file)
+    base = first.data_version
+    assert second.data_version == base
+    first.ingest(delta)
+    second.ingest(delta)
+    assert first.data_version == second.data_version != base
+    second.ingest(delta.iloc[:1].assign(subscribers=1e9))
+    assert second.data_version not in (base, first.data_version)
+    assert second.data_version.startswith(base)
+
+def test_aggregate_cache_from_several_threads():
+    cache = AggregateCache(budget=4096)
+    errors = []
+
+    def work(offset):
+        try:
+            for number in range(2000):
+                key = (number + offset) % 50
+                assert cache.get('square', (key,), 'v', lambda: np.full(8, key))[0] == key
+                if number % 100 == 0:
+                    cache.clear()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert cache.size <= cache.budget
+
+
+def test_chart_style_does_not_leak(story):
+    facecolor = mpl.rcParams['axes.facecolor']
+    story.create_scatter('subscribers', 'video views')
+    scatter = story.controller.figure.axes[0]
+    story.create_histogram('uploads')
+    histogram = story.controller.figure.axes[0]
+    assert mpl.rcParams['axes.facecolor'] == facecolor
+    assert scatter.get_facecolor() != histogram.get_facecolor()
+    assert mpl.colors.same_color(histogram.get_facecolor(), facecolor)
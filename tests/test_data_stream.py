@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from data_stream import QuantileSketch, ColumnStats, weighted_quantiles
+
+QUANTILES = np.array([0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0])
+
+
+def rank_errors(estimates, values, quantiles):
+    """
+    Distance between the quantiles asked for and the ranks of the estimates,
+    as a fraction of the number of values.
+    """
+    values = np.sort(values)
+    low = np.searchsorted(values, estimates, 'left') / len(values)
+    high = np.searchsorted(values, estimates, 'right') / len(values)
+    return np.maximum(np.maximum(low - quantiles, quantiles - high), 0)
+
+
+def test_weighted_quantiles_match_percentile():
+    values = np.random.default_rng(0).integers(0, 50, 1001).astype('float64')
+    np.testing.assert_allclose(weighted_quantiles(values, np.ones(len(values), dtype='int64'),
+                                                  QUANTILES),
+                               np.percentile(values, QUANTILES * 100))
+
+
+def test_sketch_is_exact_before_compaction():
+    values = np.random.default_rng(1).lognormal(0, 2, 150)
+    sketch = QuantileSketch(k=200)
+    sketch.update(np.append(values, np.nan))
+    assert sketch.count == len(values) and sketch.rank_error() == 0
+    np.testing.assert_allclose(weighted_quantiles(*sketch.points(), QUANTILES),
+                               np.quantile(values, QUANTILES))
+
+
+@pytest.mark.parametrize('k', [64, 200])
+def test_sketch_error_within_bound(k):
+    values = np.random.default_rng(2).lognormal(10, 2, 200_000)
+    sketch = QuantileSketch(k)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    assert sketch.count == len(values)
+    assert len(sketch.points()[0]) < 4 * k
+    estimates = weighted_quantiles(*sketch.points(), QUANTILES)
+    assert rank_errors(estimates, values, QUANTILES).max() <= sketch.rank_error()
+
+
+def test_merged_sketch_error_within_bound():
+    values = np.random.default_rng(3).normal(0, 1, 120_000)
+    parts = np.array_split(values, 6)
+    sketches = [QuantileSketch(seed=number) for number in range(len(parts))]
+    for sketch, part in zip(sketches, parts):
+        sketch.update(part)
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    assert merged.points()[1].sum() == len(values)
+    estimates = weighted_quantiles(*merged.points(), QUANTILES)
+    assert rank_errors(estimates, values, QUANTILES).max() <= merged.rank_error()
+
+
+def test_column_stats_remove():
+    rng = np.random.default_rng(4)
+    values = rng.lognormal(5, 1, 60_000)
+    removed = rng.choice(len(values), 15_000, replace=False)
+    kept = np.delete(values, removed)
+    stats = ColumnStats()
+    for chunk in np.array_split(values, 10):
+        stats.update(chunk)
+    stats.remove(values[removed])
+    assert stats.count == len(kept)
+    assert stats.mean == pytest.approx(kept.mean(), rel=1e-9)
+    assert stats.std == pytest.approx(kept.std(ddof=1), rel=1e-9)
+    estimates = stats.quantiles(QUANTILES[1:-1])
+    assert (rank_errors(estimates, kept, QUANTILES[1:-1]).max()
+            <= stats.rank_error())
+
+
+def test_column_stats_remove_is_exact_before_compaction():
+    values = np.arange(100, dtype='float64')
+    stats = ColumnStats(k=200)
+    stats.update(values)
+    stats.remove(values[:10])
+    stats.remove(values[-5:])
+    kept = values[10:-5]
+    assert (stats.min, stats.max) == (kept.min(), kept.max())
+    assert stats.describe([.5])[1:] == pytest.approx([kept.mean(), kept.std(ddof=1), kept.min(),
+                                                      np.median(kept), kept.max()])
+    np.testing.assert_allclose(stats.quantiles(QUANTILES), np.quantile(kept, QUANTILES))
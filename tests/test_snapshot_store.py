@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from snapshot_store import SnapshotStore
+
+
+def test_histories_match_the_snapshots(raw, tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    raw = raw[raw['created_year'].notna() & (raw['created_year'] != 1970)]
+    first = store.append(raw, '2023-09-01')
+    assert (first['added'], first['rejected']) == (len(raw), 0)
+
+    later = raw.copy()
+    later.loc[later['Youtuber'] == 'Ab-1', 'subscribers'] += 1e6
+    later = pd.concat([later, later[later['Youtuber'] == 'Ab 2']])
+    second = store.append(later.assign(Youtuber=later['Youtuber'].replace('123', '')),
+                          '2023-09-02')
+    # 'Ab 2' is repeated and '123' lost its name, neither can be matched
+    assert (second['changed'], second['added'], second['rejected']) == (1, 0, 3)
+
+    for name in ('Ab-1', 'Ab 2', 'Ab!!'):
+        expected = raw.loc[raw['Youtuber'] == name, 'subscribers'].iloc[0]
+        history = store.history(name, ['subscribers'])['subscribers']
+        growth = 1e6 if name == 'Ab-1' else 0
+        assert history.tolist() == [expected, expected + growth]
+
+
+def test_append_rejects_every_row_of_a_repeated_name(raw, tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snapshots'))
+    twins = raw.iloc[:2].assign(Youtuber='Twin')
+    result = store.append(pd.concat([twins, raw.iloc[2:5]]), '2023-09-01')
+    assert (result['rows'], result['rejected']) == (3, 2)
+    with pytest.raises(KeyError):
+        store.history('Twin')
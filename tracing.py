@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import itertools
+import threading
+import functools
+from collections import deque
+
+# set to 1 to trace from launch, tracing can also be toggled at runtime
+TRACE_ENV = 'YTA_TRACE'
+
+# number of finished spans kept, older spans are dropped first
+MAX_SPANS = 100_000
+
+
+class Span:
+    """
+        A timed section of work, possibly nested in another span of the same thread.
+
+        Attributes:
+            name: Name of the span.
+            category: Phase the span belongs to, such as 'data', 'chart' or 'ui'.
+            span_id: Number of the span.
+            root_id: Number of the outermost span it is nested in, its own if it is outermost.
+            depth: Number of spans it is nested in.
+            thread: Name of the thread that ran it.
+            start: time.perf_counter_ns() when it started.
+            wall: Wall time in nanoseconds.
+            cpu: CPU time of its thread in nanoseconds.
+            args: Dictionary of extra values, such as number of rows.
+    """
+    __slots__ = ('name', 'category', 'span_id', 'root_id', 'depth', 'thread', 'start',
+                 'wall', 'cpu', 'args', 'cpu_start', 'tracer')
+
+    def __init__(self, tracer, name, category, args):
+        """
+        Initialize a Span object.
+        :param tracer: The Tracer that records the span.
+        :param name: Name of the span.
+        :param category: Phase the span belongs to.
+        :param args: Dictionary of extra values.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.wall = 0
+        self.cpu = 0
+
+    def __enter__(self):
+        """
+        Start the span.
+        :return: The span.
+        """
+        stack = self.tracer.stack()
+        self.span_id = next(self.tracer.ids)
+        self.root_id = stack[0].span_id if stack else self.span_id
+        self.depth = len(stack)
+        self.thread = threading.current_thread().name
+        stack.append(self)
+        self.cpu_start = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Finish the span and record it.
+        :return: False, exceptions are not suppressed.
+        """
+        self.wall = time.perf_counter_ns() - self.start
+        self.cpu = time.thread_time_ns() - self.cpu_start
+        stack = self.tracer.stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.tracer.spans.append(self)
+        return False
+
+
+class NoSpan:
+    """
+    Stands in for a span while tracing is off.
+    """
+
+    def __enter__(self):
+        """
+        Do nothing.
+        :return: The object itself.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Do nothing.
+        :return: False, exceptions are not suppressed.
+        """
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class Tracer:
+    """
+        Records nested spans with wall time, CPU time and row counts.
+
+        While tracing is off, span() returns a shared object that does nothing
+        and traced functions only check one attribute before running, so the
+        instrumentation can stay in place in production sessions.
+
+        Attributes:
+            enabled: True while spans are recorded.
+            spans: Finished spans, oldest first.
+            ids: Counter numbering the spans.
+    """
+
+    def __init__(self, enabled=False, max_spans=MAX_SPANS):
+        """
+        Initialize a Tracer object.
+        :param enabled: True to record spans from the start.
+        :param max_spans: Number of finished spans kept.
+        """
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.ids = itertools.count(1)
+        self.local = threading.local()
+        self.origin = time.perf_counter_ns()
+
+    def stack(self):
+        """
+        Get the spans open in the calling thread.
+        :return: List of spans, outermost first.
+        """
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def enable(self):
+        """
+        Start recording spans.
+        :return: None
+        """
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop recording spans.
+        :return: None
+        """
+        self.enabled = False
+
+    def toggle(self):
+        """
+        Switch recording spans on or off.
+        :return: True if spans are recorded now.
+        """
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def clear(self):
+        """
+        Drop every recorded span.
+        :return: None
+        """
+        self.spans.clear()
+
+    def span(self, name, category='app', **args):
+        """
+        Get a context manager timing a section of work.
+        :param name: Name of the span.
+        :param category: Phase the span belongs to.
+        :param args: Extra values recorded with the span, such as rows.
+        :return: The span, or an object that does nothing while tracing is off.
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, category, args)
+
+    def annotate(self, **args):
+        """
+        Add values to the innermost open span of the calling thread.
+        :param args: Values to record, such as rows.
+        :return: None
+        """
+        if self.enabled:
+            stack = self.stack()
+            if stack:
+                stack[-1].args.update(args)
+
+    def traced(self, category='app', name=None, rows=None):
+        """
+        Decorate a function so each call is recorded as a span.
+        :param category: Phase the span belongs to.
+        :param name: Name of the span, the function's qualified name by default.
+        :param rows: Function called with the same arguments after each call,
+            returning the number of rows it worked on.
+        :return: The decorator.
+        """
+        def decorate(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name, category, {}) as span:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        span.args['rows'] = rows(*args, **kwargs)
+                    return result
+            return wrapper
+        return decorate
+
+    def chrome_trace(self):
+        """
+        Get recorded spans in Chrome trace-event format, viewable in chrome://tracing or Perfetto.
+        :return: Dictionary of trace events.
+        """
+        events = []
+        pid = os.getpid()
+        threads = {}
+        for span in list(self.spans):
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': pid,
+                           'tid': tid, 'ts': (span.start - self.origin) / 1000,
+                           'dur': span.wall / 1000,
+                           'args': dict(span.args, cpu_ms=span.cpu / 1e6)})
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path):
+        """
+        Write recorded spans to a Chrome trace-event JSON file.
+        :param path: Path of the file.
+        :return: None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.chrome_trace(), file)
+
+    def slowest(self, n=10, children=5):
+        """
+        Find the slowest outermost spans, such as event handlers and render jobs,
+        with the nested spans that took most of their time.
+        :param n: Number of spans.
+        :param children: Number of nested spans listed for each span.
+        :return: List of dictionaries of name, thread, wall and CPU milliseconds,
+            args and nested spans, slowest first.
+        """
+        spans = list(self.spans)
+        nested = {}
+        for span in spans:
+            if span.depth > 0:
+                nested.setdefault(span.root_id, []).append(span)
+        roots = sorted((span for span in spans if span.depth == 0),
+                       key=lambda span: span.wall, reverse=True)[:n]
+        return [{'name': root.name, 'thread': root.thread, 'wall_ms': root.wall / 1e6,
+                 'cpu_ms': root.cpu / 1e6, 'args': dict(root.args),
+                 'children': [{'name': child.name, 'category': child.category,
+                               'wall_ms': child.wall / 1e6, 'cpu_ms': child.cpu / 1e6,
+                               'args': dict(child.args)}
+                              for child in sorted(nested.get(root.span_id, []),
+                                                  key=lambda child: child.wall,
+                                                  reverse=True)[:children]]}
+                for root in roots]
+
+    def summary(self, n=10):
+        """
+        Describe the slowest outermost spans as text.
+        :param n: Number of spans.
+        :return: Text with a line for each span and its slowest nested spans.
+        """
+        lines = []
+        for root in self.slowest(n):
+            args = ' '.join(f'{key}={value}' for key, value in root['args'].items())
+            lines.append(f"{root['wall_ms']:9.1f} ms  cpu {root['cpu_ms']:8.1f} ms  "
+                         f"{root['name']} [{root['thread']}] {args}".rstrip())
+            for child in root['children']:
+                args = ' '.join(f'{key}={value}' for key, value in child['args'].items())
+                lines.append(f"    {child['wall_ms']:9.1f} ms  cpu {child['cpu_ms']:8.1f} ms  "
+                             f"{child['category']}: {child['name']} {args}".rstrip())
+        return '\n'.join(lines) if lines else 'No spans recorded'
+
+
+tracer = Tracer(enabled=os.environ.get(TRACE_ENV) == '1')
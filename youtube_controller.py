@@ -1,58 +1,247 @@
+import os
+import sys
+import time
 import tkinter as tk
+from tracing import tracer
 from youtube_view import YouTubeView
-from data_manage import StoryTelling
+from data_loader import DataLoader
+from render_pipeline import RenderJob, RenderPipeline, RenderScheduler
+
+# seconds the window may take to appear after launch, independent of dataset size
+FIRST_WINDOW_BUDGET = 1.0
+
+# directory trace files are exported to
+TRACE_DIR = os.path.join('.cache', 'traces')
 
 
 class YouTubeController:
     """
     The controller object for managing the GUI application.
     """
-    def __init__(self):
+    def __init__(self, started=None):
         """
-        Initialize the YouTubeController.
+        Initialize the YouTubeController. The window appears right away and the
+        dataset is loaded in the background, menus that need data are enabled
+        once it is loaded.
+        :param started: time.perf_counter() at launch, None to measure from now.
         """
-        self.story = StoryTelling(self)
+        self.started = time.perf_counter() if started is None else started
+        self.story = None
+        self.timings = {}
         self.view = YouTubeView(self)
+        self.pipeline = RenderPipeline(self.view, self.handle_rendered)
+        self.schedulers = {target: RenderScheduler(self.pipeline)
+                           for target in ('story', 'create', 'suggest')}
+        self.loader = DataLoader(self.view, self.load_story, self.view.show_progress,
+                                 self.handle_loaded)
+        self.ingester = None
+        self.row_filter = ()
         self.scatter_attribute_1 = None
         self.scatter_attribute_2 = None
-        self.bind_button()
+        self.last_render = {}
+        self.resize_jobs = {}
+        self.bind_menu()
+        self.view.set_data_menus(False)
+        self.view.set_tracing(tracer.enabled)
+        self.view.after_idle(self.handle_window_shown)
+
+    @tracer.traced('ui')
+    def handle_window_shown(self):
+        """
+        Record time to first window and start loading the dataset.
+        :return: None
+        """
+        self.timings['first_window'] = time.perf_counter() - self.started
+        if self.timings['first_window'] > FIRST_WINDOW_BUDGET:
+            print(f"Window took {self.timings['first_window']:.2f} s to appear, "
+                  f"budget is {FIRST_WINDOW_BUDGET:.2f} s", file=sys.stderr)
+        self.view.show_progress('Loading data...')
+        self.loader.start()
+
+    @tracer.traced('data')
+    def load_story(self, progress):
+        """
+        Load and clean the dataset, runs in the background thread.
+        :param progress: Function called with a message at each step of loading.
+        :return: The StoryTelling object.
+        """
+        # pandas, seaborn and matplotlib are imported here, after the window is up
+        from data_manage import StoryTelling
+        return StoryTelling(self, progress=progress)
+
+    @tracer.traced('ui')
+    def handle_loaded(self, story, error):
+        """
+        Enable the menus that need data once the dataset is loaded.
+        :param story: The loaded StoryTelling object, None if loading failed.
+        :param error: Exception raised while loading, if any.
+        :return: None
+        """
+        if error is not None:
+            self.view.show_progress(f'Could not load data: {error}')
+            return
+        self.story = story
+        self.timings['data_loaded'] = time.perf_counter() - self.started
+        self.view.set_data_menus(True)
+        self.view.update_filter_choices()
+        self.view.show_progress(f'Data loaded in {self.loader.elapsed:.1f} s')
+
+    @tracer.traced('ui')
+    def handle_ingest(self):
+        """
+        Ask for a delta file and ingest it, bound to Ctrl+I.
+        :return: None
+        """
+        if self.story is None or self.ingester is not None:
+            return
+        path = self.view.ask_delta_file()
+        if path:
+            self.ingest_file(path)
+
+    def ingest_file(self, path):
+        """
+        Ingest a delta file in the background, see StoryTelling.ingest. It runs
+        in the render worker, so no chart is built while the dataset changes.
+        :param path: Path of the CSV file of new and updated channels.
+        :return: None
+        """
+        self.view.show_progress(f'Ingesting {os.path.basename(path)}...')
+        # requests not handed to the worker yet would run after the ingest with
+        # keys of the old data, refresh_views renders them again once it is done
+        for scheduler in self.schedulers.values():
+            scheduler.supersede()
+        story = self.story
+        self.ingester = self.pipeline.submit_task(lambda: story.ingest(path),
+                                                  self.handle_ingested)
+
+    @tracer.traced('ui')
+    def handle_ingested(self, report, error):
+        """
+        Refresh open views once a delta is ingested.
+        :param report: Dictionary returned by StoryTelling.ingest, None if ingesting failed.
+        :param error: Exception raised while ingesting, if any.
+        :return: None
+        """
+        self.ingester = None
+        if error is not None:
+            self.view.show_progress(f'Could not ingest data: {error}')
+            # draw the charts requested while ingesting
+            self.refresh_views()
+            return
+        rejected = (f", rejected {report['rejected']} rows with an empty or repeated channel name"
+                    if report['rejected'] else '')
+        self.view.show_progress(f"Added {report['added']} and updated {report['updated']} "
+                                f"channels in {report['seconds']:.2f} s{rejected}")
+        self.refresh_views()
+
+    def refresh_views(self):
+        """
+        Update choices and statistics of built pages and render the graph each
+        page shows again, after the dataset changed.
+        :return: None
+        """
+        self.view.refresh_data()
+        self.view.show_filter_status(self.filter_status())
+        for target, (kind, params) in list(self.last_render.items()):
+            self.render(target, kind, *params)
 
-    def bind_button(self):
+    def bind_menu(self):
         """
-        Bind various buttons and combobox to their respective event handlers.
+        Bind menu buttons to their event handlers.
         :return: None
         """
         self.view.home_button.bind('<Button-1>', lambda event: self.handle_menu(2))
         self.view.story_button.bind('<Button-1>', lambda event: self.handle_menu(1))
         self.view.create_button.bind('<Button-1>', lambda event: self.handle_menu(5))
         self.view.suggest_button.bind('<Button-1>', lambda event: self.handle_menu(3))
+        self.view.bind_all('<Control-t>', lambda event: self.toggle_tracing())
+        self.view.bind_all('<Control-e>', lambda event: self.export_trace())
+        self.view.bind_all('<Control-i>', lambda event: self.handle_ingest())
+        self.view.filter_apply.bind('<Button-1>', self.handle_filter)
+        self.view.filter_clear.bind('<Button-1>', self.handle_clear_filter)
+        self.view.filter_low.bind('<Return>', self.handle_filter)
+        self.view.filter_high.bind('<Return>', self.handle_filter)
 
-        self.view.corr_button.bind('<Button-1>', lambda event: self.handle_story_page(1))
-        self.view.year_trend_button.bind('<Button-1>', lambda event: self.handle_story_page(2))
-        self.view.avg_earning_button.bind('<Button-1>', lambda event: self.handle_story_page(3))
-        self.view.descriptive_button.bind('<Button-1>', lambda event: self.handle_story_page(4))
+    def toggle_tracing(self):
+        """
+        Switch tracing on or off, bound to Ctrl+T.
+        :return: None
+        """
+        enabled = tracer.toggle()
+        self.view.set_tracing(enabled)
+        self.view.show_progress('Tracing on' if enabled else 'Tracing off')
 
-        self.view.hist_button.bind('<Button-1>', lambda event: self.handle_create_graph(1))
-        self.view.scatter_button.bind('<Button-1>', lambda event: self.handle_create_graph(2))
-        self.view.pie_button.bind('<Button-1>', lambda event: self.handle_create_graph(3))
-        self.view.bar_button.bind('<Button-1>', lambda event: self.handle_create_graph(4))
+    def export_trace(self, directory=TRACE_DIR):
+        """
+        Write recorded spans to a Chrome trace file and show the slowest
+        interactions, bound to Ctrl+E.
+        :param directory: Directory the trace file is written to.
+        :return: Path of the trace file.
+        """
+        path = os.path.join(directory, time.strftime('trace-%Y%m%d-%H%M%S.json'))
+        tracer.export(path)
+        self.view.show_trace_summary(f'Trace written to {path}\n\n{tracer.summary()}')
+        return path
 
-        self.view.select_hist_att.bind('<<ComboboxSelected>>', self.handle_create_hist)
-        self.view.select_scatter_att_1.bind('<<ComboboxSelected>>', self.handle_create_scatter)
-        self.view.select_scatter_att_2.bind('<<ComboboxSelected>>', self.handle_create_scatter)
-        self.view.select_pie_att.bind('<<ComboboxSelected>>', self.handle_create_pie)
-        self.view.select_bar_att.bind('<<ComboboxSelected>>', self.handle_create_bar)
+    def open_page(self, page):
+        """
+        Build a page and bind its widgets the first time it is shown.
+        :param page: 'story', 'create' or 'suggest'.
+        :return: None
+        """
+        if self.view.build_page(page):
+            self.bind_page(page)
+
+    def bind_page(self, page):
+        """
+        Bind various buttons and combobox of a page to their respective event handlers.
+        :param page: 'story', 'create' or 'suggest'.
+        :return: None
+        """
+        if page == 'story':
+            self.view.corr_button.bind('<Button-1>', lambda event: self.handle_story_page(1))
+            self.view.year_trend_button.bind('<Button-1>',
+                                             lambda event: self.handle_story_page(2))
+            self.view.avg_earning_button.bind('<Button-1>',
+                                              lambda event: self.handle_story_page(3))
+            self.view.descriptive_button.bind('<Button-1>',
+                                              lambda event: self.handle_story_page(4))
+            self.view.table_category.bind('<<ComboboxSelected>>', self.handle_table)
+            self.view.table_percentile.bind('<<ComboboxSelected>>', self.handle_table)
+            self.view.table_percentile.bind('<Return>', self.handle_table)
+        elif page == 'create':
+            self.view.hist_button.bind('<Button-1>', lambda event: self.handle_create_graph(1))
+            self.view.scatter_button.bind('<Button-1>', lambda event: self.handle_create_graph(2))
+            self.view.pie_button.bind('<Button-1>', lambda event: self.handle_create_graph(3))
+            self.view.bar_button.bind('<Button-1>', lambda event: self.handle_create_graph(4))
 
-        self.view.select_suggest_att.bind('<<ComboboxSelected>>', self.handle_suggest_graph)
-        self.view.from_sub.bind('<Button-1>', lambda event: self.handle_suggest_graph(1))
-        self.view.from_view.bind('<Button-1>', lambda event: self.handle_suggest_graph(2))
+            self.view.select_hist_att.bind('<<ComboboxSelected>>', self.handle_create_hist)
+            self.view.select_scatter_att_1.bind('<<ComboboxSelected>>',
+                                                self.handle_create_scatter)
+            self.view.select_scatter_att_2.bind('<<ComboboxSelected>>',
+                                                self.handle_create_scatter)
+            self.view.select_pie_att.bind('<<ComboboxSelected>>', self.handle_create_pie)
+            self.view.select_bar_att.bind('<<ComboboxSelected>>', self.handle_create_bar)
+        elif page == 'suggest':
+            self.view.select_suggest_att.bind('<<ComboboxSelected>>', self.handle_suggest_graph)
+            self.view.from_sub.bind('<Button-1>', lambda event: self.handle_suggest_graph(1))
+            self.view.from_view.bind('<Button-1>', lambda event: self.handle_suggest_graph(2))
+            self.view.from_upload.bind('<Button-1>', lambda event: self.handle_suggest_graph(3))
+            self.view.from_earning.bind('<Button-1>', lambda event: self.handle_suggest_graph(4))
+        self.get_canvas(page).bind('<Configure>', lambda event: self.handle_resize(page))
 
+    @tracer.traced('ui')
     def handle_menu(self, num):
         """
         Handle displays the menu based on the user-selected option.
         :param num: The number representing the menu selection.
         :return: None
         """
+        if self.story is None and num != 2:
+            # pages other than home need data that is still loading
+            return
+        if num in (1, 3, 5):
+            self.open_page({1: 'story', 3: 'suggest', 5: 'create'}[num])
         if num == 1:
             self.view.story_canvas.pack(side=tk.TOP, anchor='w', fill=tk.BOTH, expand=True)
             self.story_and_default()
@@ -70,7 +259,7 @@ class YouTubeController:
         """
         self.view.table_frame.pack_forget()
         self.view.show_story_page()
-        self.story.default_story_graph()
+        self.render('story', 'default_story_graph')
 
     def create_and_default(self, num):
         """
@@ -78,38 +267,39 @@ class YouTubeController:
         :param num: The number represent type of graph that user selected.
         :return: None
         """
-        self.story.create_histogram('subscribers')
         self.view.show_create_graph_page(num, event=None)
+        self.render('create', 'create_histogram', 'subscribers')
 
     def suggest_and_default(self):
         """
         Handle display 'suggest channel' menu with default graph.
         :return: None
         """
-        self.story.create_suggest_bar_sub('Music')
         self.view.show_suggest_page()
+        self.render('suggest', 'create_suggest_bar_sub', 'Music')
 
     def show_first_graph(self):
         """
         Create first graph of story telling.
         :return: None
         """
-        self.story.first_story(event=None)
+        self.render('story', 'first_story', None)
 
     def show_second_graph(self):
         """
         Create second graph of story telling.
         :return: None
         """
-        self.story.second_story(event=None)
+        self.render('story', 'second_story', None)
 
     def show_third_graph(self):
         """
         Create third graph of story telling.
         :return: None
         """
-        self.story.third_story(event=None)
+        self.render('story', 'third_story', None)
 
+    @tracer.traced('ui')
     def handle_story_page(self, num):
         """
         Handle display story pages based on the provided number.
@@ -132,13 +322,120 @@ class YouTubeController:
             self.view.story_canvas.pack_forget()
             self.view.show_table()
 
+    @tracer.traced('ui')
+    def handle_table(self, event):
+        """
+        Handle choosing a category or percentile of the statistics table.
+        :param event: The combobox event.
+        :return: None
+        """
+        self.view.update_table()
+
+    def get_canvas(self, target):
+        """
+        Get the canvas of a page.
+        :param target: 'story', 'create' or 'suggest'.
+        :return: The canvas that displays graph of the page.
+        """
+        if target == 'story':
+            return self.view.story_canvas
+        if target == 'create':
+            return self.view.create_graph_canvas
+        return self.view.suggest_canvas
+
+    @tracer.traced('ui')
+    def render(self, target, kind, *params):
+        """
+        Display a graph, from the render cache when it has been rendered before.
+        :param target: Page that displays the graph, 'story', 'create' or 'suggest'.
+        :param kind: Name of the StoryTelling method that creates the graph.
+        :param params: Parameters of the method.
+        :return: None
+        """
+        from data_manage import CHART_VERSION
+        graph = self.get_canvas(target)
+        size = self.view.canvas_size(graph)
+        # captured now, so a render still queued when the filter changes keeps its own rows
+        story = self.story_view()
+        key = (kind, params, story.data_version, CHART_VERSION, size)
+        self.last_render[target] = (kind, params)
+        scheduler = self.schedulers[target]
+        if self.view.show_cached_graph(key, graph):
+            # a render still in flight for an older selection must not replace this one
+            scheduler.supersede()
+            self.view.set_busy(graph, scheduler.depth() > 0)
+            return
+        self.view.set_busy(graph, True)
+        if self.ingester is not None:
+            # built after the delta is in, the image would not match its key,
+            # refresh_views renders it again once ingesting is done
+            scheduler.supersede()
+            return
+        method = getattr(story, kind)
+        scheduler.request(RenderJob(target, key, size, lambda: method(*params)))
+
+    @tracer.traced('ui')
+    def handle_rendered(self, job):
+        """
+        Display a graph rendered by the pipeline.
+        :param job: The finished RenderJob.
+        :return: None
+        """
+        graph = self.get_canvas(job.target)
+        scheduler = self.schedulers[job.target]
+        current = scheduler.finished(job)
+        if job.png is not None:
+            self.view.render_cache.put(job.key, job.png)
+            if current:
+                self.view.show_image(job.png, graph)
+        self.view.set_busy(graph, scheduler.depth() > 0)
+
+    def get_render_stats(self):
+        """
+        Get counters of the render schedulers and the render cache.
+        :return: Dictionary of scheduler stats for each page and render cache stats.
+        """
+        stats = {target: scheduler.stats() for target, scheduler in self.schedulers.items()}
+        stats['cache'] = self.view.render_cache.stats()
+        return stats
+
+    @tracer.traced('ui')
+    def handle_resize(self, target):
+        """
+        Render the last graph of a page again once the canvas stops resizing.
+        :param target: Page whose canvas was resized.
+        :return: None
+        """
+        if target in self.resize_jobs:
+            self.view.after_cancel(self.resize_jobs[target])
+
+        def redraw():
+            del self.resize_jobs[target]
+            if target in self.last_render:
+                kind, params = self.last_render[target]
+                self.render(target, kind, *params)
+        self.resize_jobs[target] = self.view.after(200, redraw)
+
+    def show_figure(self, fig, target):
+        """
+        Handle display graph created by StoryTelling. Inside the render pipeline the
+        figure is rasterized in the worker, otherwise it is displayed right away.
+        :param fig: The matplotlib figure object.
+        :param target: Page that displays the graph.
+        :return: None
+        """
+        if self.pipeline.in_worker():
+            self.pipeline.complete(fig)
+        else:
+            self.view.display_graph(fig, self.get_canvas(target))
+
     def show_graph(self, fig):
         """
         Handle display graph in 'story telling' menu.
         :param fig: The matplotlib figure object.
         :return: None
         """
-        self.view.display_graph(fig, self.view.story_canvas)
+        self.show_figure(fig, 'story')
 
     def show_create_graph(self, fig):
         """
@@ -146,7 +443,7 @@ class YouTubeController:
         :param fig: The matplotlib figure object.
         :return: None
         """
-        self.view.display_graph(fig, self.view.create_graph_canvas)
+        self.show_figure(fig, 'create')
 
     def show_suggest_graph(self, fig):
         """
@@ -154,7 +451,7 @@ class YouTubeController:
         :param fig: The matplotlib figure object.
         :return: None
         """
-        self.view.display_graph(fig, self.view.suggest_canvas)
+        self.show_figure(fig, 'suggest')
 
     def get_data(self):
         """
@@ -163,30 +460,98 @@ class YouTubeController:
         """
         return self.story.youtube_data
 
+    def get_summary_stats(self, columns, category=None, percentiles=(.25, .50, .75)):
+        """
+        Get descriptive statistics of columns.
+        :param columns: List of numeric column names.
+        :param category: Category name, None for every channel.
+        :param percentiles: List of quantiles between 0 and 1.
+        :return: DataFrame with a row for each statistic and a column for each column.
+        """
+        return self.story_view().summary_stats(columns, category, percentiles)
+
+    def story_view(self):
+        """
+        Get the story graphs and statistics are drawn from, narrowed by the filter bar.
+        :return: The StoryTelling object, or its FilteredStory for the current filter.
+        """
+        return self.story.filtered(self.row_filter)
+
+    def filter_status(self):
+        """
+        Describe how many channels the current filter matches.
+        :return: Text of the filter status.
+        """
+        total = len(self.story.youtube_data)
+        if not self.row_filter:
+            return f'All {total:,} channels'
+        return f'{len(self.story_view().selection):,} of {total:,} channels'
+
+    @tracer.traced('ui')
+    def handle_filter(self, event):
+        """
+        Apply the filter bar to every graph and the statistics table.
+        :param event: The button or key event.
+        :return: None
+        """
+        from data_manage import make_filter
+        if self.story is None:
+            return
+        try:
+            row_filter = make_filter(**self.view.filter_choices())
+            self.story.filtered(row_filter)
+        except ValueError as error:
+            self.view.show_filter_status(str(error))
+            return
+        if row_filter == self.row_filter:
+            self.view.show_filter_status(self.filter_status())
+            return
+        self.row_filter = row_filter
+        self.refresh_views()
+
+    def handle_clear_filter(self, event):
+        """
+        Reset the filter bar and show every channel again.
+        :param event: The button event.
+        :return: None
+        """
+        self.view.clear_filter()
+        self.handle_filter(event)
+
     def get_unique_category(self):
         """
         Get unique category from dataset.
-        :return: None
+        :return: List of category names.
         """
-        unique_category = list(self.story.youtube_data['category'].unique())
-        return unique_category
+        return self.story.categories()
 
+    def get_years(self):
+        """
+        Get created years of channels in the dataset.
+        :return: List of years as strings.
+        """
+        return self.story.years()
+
+    @tracer.traced('ui')
     def handle_create_graph(self, num):
         """
         Handle display create graph base on the provide number.
         :param num: The number represent type of graph that user select.
         :return: None
         """
+        self.view.show_create_graph_page(num, event=None)
         if num == 1:
-            self.story.create_histogram('subscribers')
+            self.render('create', 'create_histogram', 'subscribers')
         elif num == 2:
-            self.story.create_scatter('subscribers', 'video views')
+            self.render('create', 'create_scatter', 'subscribers', 'video views')
         elif num == 3:
-            self.story.create_pie('2005')
+            # the first year with channels under the current filter, if any has some
+            years = self.story_view().years() or self.get_years()
+            self.render('create', 'create_pie', years[0])
         elif num == 4:
-            self.story.create_bar('subscribers')
-        self.view.show_create_graph_page(num, event=None)
+            self.render('create', 'create_bar', 'subscribers')
 
+    @tracer.traced('ui')
     def handle_create_hist(self, event):
         """
         Handle create histogram based on selected attribute.
@@ -194,12 +559,13 @@ class YouTubeController:
         """
         attribute = self.view.select_hist_att.get()
         if attribute == 'Subscribers':
-            self.story.create_histogram('subscribers')
+            self.render('create', 'create_histogram', 'subscribers')
         elif attribute == 'Video views':
-            self.story.create_histogram('video views')
+            self.render('create', 'create_histogram', 'video views')
         elif attribute == 'Average monthly earnings':
-            self.story.create_histogram('average_monthly_earnings')
+            self.render('create', 'create_histogram', 'average_monthly_earnings')
 
+    @tracer.traced('ui')
     def handle_scatter_att_1(self):
         """
         Handle attribute from combobox.
@@ -215,6 +581,7 @@ class YouTubeController:
         if attribute_1 == 'Average monthly earnings':
             return 'average_monthly_earnings'
 
+    @tracer.traced('ui')
     def handle_scatter_att_2(self):
         """
         Handle attribute from combobox.
@@ -230,6 +597,7 @@ class YouTubeController:
         if attribute_2 == 'Average monthly earnings':
             return 'average_monthly_earnings'
 
+    @tracer.traced('ui')
     def handle_create_scatter(self, event):
         """
         Handle create scatter graph based on selected attribute.
@@ -239,16 +607,19 @@ class YouTubeController:
         self.scatter_attribute_2 = self.handle_scatter_att_2()
         if (self.scatter_attribute_1 is not None and self.scatter_attribute_2 is not None
                 and self.view.select_scatter_att_1.get() and self.view.select_scatter_att_2.get()):
-            self.story.create_scatter(self.scatter_attribute_1, self.scatter_attribute_2)
+            self.render('create', 'create_scatter',
+                        self.scatter_attribute_1, self.scatter_attribute_2)
 
+    @tracer.traced('ui')
     def handle_create_pie(self, event):
         """
         Handle create pie chart based on selected attribute.
         :return: None
         """
         year = self.view.select_pie_att.get()
-        self.story.create_pie(year)
+        self.render('create', 'create_pie', year)
 
+    @tracer.traced('ui')
     def handle_create_bar(self, event):
         """
         Handle create bar graph based on selected attribute.
@@ -256,14 +627,15 @@ class YouTubeController:
         """
         attribute = self.view.select_bar_att.get()
         if attribute == 'Subscribers':
-            self.story.create_bar('subscribers')
+            self.render('create', 'create_bar', 'subscribers')
         elif attribute == 'Video views':
-            self.story.create_bar('video views')
+            self.render('create', 'create_bar', 'video views')
         elif attribute == 'Uploaded videos':
-            self.story.create_bar('uploads')
+            self.render('create', 'create_bar', 'uploads')
         elif attribute == 'Average monthly earnings':
-            self.story.create_bar('average_monthly_earnings')
+            self.render('create', 'create_bar', 'average_monthly_earnings')
 
+    @tracer.traced('ui')
     def handle_suggest_graph(self, num):
         """
         Handle 'suggest channel' menu.
@@ -272,9 +644,13 @@ class YouTubeController:
         """
         category = self.view.select_suggest_att.get()
         if category is not None and num == 1:
-            self.story.create_suggest_bar_sub(category)
+            self.render('suggest', 'create_suggest_bar_sub', category)
         if category is not None and num == 2:
-            self.story.create_suggest_bar_view(category)
+            self.render('suggest', 'create_suggest_bar_view', category)
+        if category is not None and num == 3:
+            self.render('suggest', 'create_suggest_bar', category, 'uploads')
+        if category is not None and num == 4:
+            self.render('suggest', 'create_suggest_bar', category, 'average_monthly_earnings')
 
     def run(self):
         """
@@ -282,4 +658,5 @@ class YouTubeController:
         :return: None
         """
         self.view.mainloop()
+        self.pipeline.shutdown()
 
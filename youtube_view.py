@@ -1,7 +1,55 @@
+import os
+import base64
+import struct
 import tkinter as tk
-from tkinter import ttk, Frame
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from tkinter import ttk, filedialog, Frame
+from render_cache import RenderCache
+from render_pipeline import rasterize
+from tracing import tracer
+
+# directory rendered charts are persisted to across sessions, None keeps them in memory only
+CHART_CACHE_DIR = os.path.join('.cache', 'charts')
+
+# numeric columns of the statistics table, with their display names
+TABLE_ATTRIBUTES = {
+    'subscribers': 'Subscribers',
+    'video views': 'Video views',
+    'uploads': 'Uploaded videos',
+    'average_monthly_earnings': 'Average monthly earnings',
+}
+
+# statistics of the table after the attribute name, in column order
+TABLE_STATISTICS = ['mean', 'std', 'min', 'median', 'percentile', 'max']
+
+# percentiles offered for the percentile column of the statistics table
+TABLE_PERCENTILES = ['1%', '5%', '10%', '25%', '75%', '90%', '95%', '99%']
+
+# choice of the statistics table covering every category
+ALL_CATEGORIES = 'All categories'
+
+# choice of the filter bar leaving a bound open
+FILTER_ANY = 'Any'
+
+# multipliers of the suffixes the bounds of the filter bar accept, such as 10M
+AMOUNT_SUFFIXES = {'K': 1e3, 'M': 1e6, 'B': 1e9}
+
+
+def parse_amount(text):
+    """
+    Read a bound typed in the filter bar.
+    :param text: Number, optionally with a K, M or B suffix, or empty.
+    :return: The number, None if the text is empty.
+    """
+    amount = text.strip().replace(',', '')
+    if not amount:
+        return None
+    scale = AMOUNT_SUFFIXES.get(amount[-1].upper())
+    if scale is not None:
+        amount = amount[:-1]
+    try:
+        return float(amount) * (scale or 1)
+    except ValueError:
+        raise ValueError(f'{text.strip()} is not a number') from None
 
 
 class YouTubeView(tk.Tk):
@@ -17,21 +65,23 @@ class YouTubeView(tk.Tk):
         self.title('YouTube Trend Analysis')
         self.configure(bg='#f8f6f2')
         self.controller = controller
-        self.canvas = None
-        self.fig = None
+        self.render_cache = RenderCache(directory=CHART_CACHE_DIR)
+        self.graph_images = {}
+        self.built_pages = set()
         self.check_menu = None
         self.init_component()
 
     def init_component(self):
         """
         Set up the main component of 'YouTube Trend Analysis' application
-        and also create component of the home page,
-        story page, menu graph page, and suggest page .
+        and also create component of the home page. The other pages are created
+        by build_page the first time they are shown.
         :return: None
         """
         self.top_frame = Frame(self, bg='#f8f6f2', height=130, highlightbackground='#cd3c3c',
                                highlightthickness=4)
         self.top_frame.pack(side=tk.TOP, fill=tk.X)
+        self.create_filter_bar()
         self.menu_page = Frame(self, bg='#f1e8d7')
         self.menu_page.pack(side=tk.LEFT, anchor='w', fill=tk.Y)
         self.name = tk.Label(self.top_frame, text='YouTube Trend Analysis', font=('BM Jua', 70),
@@ -59,9 +109,188 @@ class YouTubeView(tk.Tk):
         self.show_menu = Frame(self, bg='#f8f6f2', width=900)
         self.create_home_page()
         self.show_home_page()
-        self.create_story_page()
-        self.create_menu_graph_page()
-        self.create_suggest_page()
+
+    def build_page(self, page):
+        """
+        Set up components of a page the first time it is shown.
+        :param page: 'story', 'create' or 'suggest'.
+        :return: True if the page was created, False if it already existed.
+        """
+        if page in self.built_pages:
+            return False
+        if page == 'story':
+            self.create_story_page()
+        elif page == 'create':
+            self.create_menu_graph_page()
+        elif page == 'suggest':
+            self.create_suggest_page()
+        self.built_pages.add(page)
+        return True
+
+    def set_data_menus(self, enabled):
+        """
+        Enable or disable the menus that need data.
+        :param enabled: True to enable the menus.
+        :return: None
+        """
+        state = tk.NORMAL if enabled else tk.DISABLED
+        for button in (self.story_button, self.create_button, self.suggest_button,
+                       self.filter_category_button, self.filter_apply, self.filter_clear):
+            button.configure(state=state)
+
+    def show_progress(self, message):
+        """
+        Display progress of loading the dataset on the home page.
+        :param message: Text describing the current step.
+        :return: None
+        """
+        self.status_label.configure(text=message)
+
+    def set_tracing(self, enabled):
+        """
+        Show in the window title whether tracing is on.
+        :param enabled: True while tracing is on.
+        :return: None
+        """
+        self.title('YouTube Trend Analysis [tracing]' if enabled else 'YouTube Trend Analysis')
+
+    def ask_delta_file(self):
+        """
+        Ask for a CSV file of new and updated channels.
+        :return: Path of the file, empty if no file was chosen.
+        """
+        return filedialog.askopenfilename(parent=self, title='Ingest new data',
+                                          filetypes=[('CSV files', '*.csv')])
+
+    def refresh_data(self):
+        """
+        Update choices and the statistics table of built pages after the dataset changed.
+        :return: None
+        """
+        self.update_filter_choices()
+        if 'create' in self.built_pages:
+            self.select_pie_att['values'] = self.controller.get_years()
+        if 'suggest' in self.built_pages:
+            self.select_suggest_att['values'] = self.suggest_categories()
+        if 'story' in self.built_pages and self.table_cells:
+            categories = self.table_categories()
+            self.table_category['values'] = categories
+            if self.table_category.get() not in categories:
+                self.table_category.current(newindex=0)
+            self.update_table()
+
+    def create_filter_bar(self):
+        """
+        Set up the filter bar, which narrows every graph and the statistics
+        table to channels of some categories, created in a range of years and
+        with a metric in a range.
+        :return: None
+        """
+        self.filter_frame = Frame(self, bg='#f1e8d7')
+        self.filter_frame.pack(side=tk.TOP, fill=tk.X)
+        self.filter_label = tk.Label(self.filter_frame, text='Filter', font=('BM Jua', 18),
+                                     fg='#f1e8d7', bg='#cd3c3c')
+        self.filter_label.pack(side=tk.LEFT, padx=10, pady=5)
+        self.filter_category_button = tk.Menubutton(self.filter_frame, text='Categories',
+                                                    font=('BM Jua', 16), fg='#cd3c3c',
+                                                    relief=tk.RAISED)
+        self.filter_category_menu = tk.Menu(self.filter_category_button, tearoff=False)
+        self.filter_category_button['menu'] = self.filter_category_menu
+        self.filter_category_button.pack(side=tk.LEFT, padx=5)
+        # checked state of each category of the menu
+        self.filter_categories = {}
+        self.filter_year_label = tk.Label(self.filter_frame, text='Created', font=('BM Jua', 16),
+                                          fg='#3d251e', bg='#f1e8d7')
+        self.filter_year_label.pack(side=tk.LEFT, padx=5)
+        self.filter_year_from = ttk.Combobox(self.filter_frame, state='readonly', width=6)
+        self.filter_year_from.pack(side=tk.LEFT)
+        self.filter_year_to = ttk.Combobox(self.filter_frame, state='readonly', width=6)
+        self.filter_year_to.pack(side=tk.LEFT, padx=5)
+        self.filter_metric = ttk.Combobox(self.filter_frame, state='readonly', width=22,
+                                          values=list(TABLE_ATTRIBUTES.values()))
+        self.filter_metric.current(newindex=0)
+        self.filter_metric.pack(side=tk.LEFT, padx=5)
+        self.filter_low = ttk.Entry(self.filter_frame, width=8)
+        self.filter_low.pack(side=tk.LEFT)
+        self.filter_to_label = tk.Label(self.filter_frame, text='to', font=('BM Jua', 16),
+                                        fg='#3d251e', bg='#f1e8d7')
+        self.filter_to_label.pack(side=tk.LEFT)
+        self.filter_high = ttk.Entry(self.filter_frame, width=8)
+        self.filter_high.pack(side=tk.LEFT)
+        self.filter_apply = tk.Button(self.filter_frame, text='Apply', font=('BM Jua', 16),
+                                      bd=0, fg='#cd3c3c')
+        self.filter_apply.pack(side=tk.LEFT, padx=10)
+        self.filter_clear = tk.Button(self.filter_frame, text='Clear', font=('BM Jua', 16),
+                                      bd=0, fg='#cd3c3c')
+        self.filter_clear.pack(side=tk.LEFT)
+        self.filter_status = tk.Label(self.filter_frame, font=('BM Jua', 16),
+                                      fg='#3d251e', bg='#f1e8d7')
+        self.filter_status.pack(side=tk.LEFT, padx=10)
+
+    def update_filter_choices(self):
+        """
+        Offer the categories and years of the dataset in the filter bar,
+        keeping the current choices.
+        :return: None
+        """
+        for category in self.controller.get_unique_category():
+            if category not in self.filter_categories:
+                checked = tk.BooleanVar(self, value=False)
+                self.filter_categories[category] = checked
+                self.filter_category_menu.add_checkbutton(label=category, variable=checked)
+        years = [FILTER_ANY] + self.controller.get_years()
+        for combo in (self.filter_year_from, self.filter_year_to):
+            combo['values'] = years
+            if combo.get() not in years:
+                combo.current(newindex=0)
+
+    def filter_choices(self):
+        """
+        Read the filter bar.
+        :return: Dictionary of 'categories', 'years' and 'ranges', see data_manage.make_filter.
+        """
+        years = tuple(None if combo.get() in ('', FILTER_ANY) else int(combo.get())
+                      for combo in (self.filter_year_from, self.filter_year_to))
+        metric = next(column for column, text in TABLE_ATTRIBUTES.items()
+                      if text == self.filter_metric.get())
+        return {'categories': [category for category, checked in self.filter_categories.items()
+                               if checked.get()],
+                'years': years,
+                'ranges': [(metric, parse_amount(self.filter_low.get()),
+                            parse_amount(self.filter_high.get()))]}
+
+    def clear_filter(self):
+        """
+        Reset the filter bar to every channel.
+        :return: None
+        """
+        for checked in self.filter_categories.values():
+            checked.set(False)
+        self.filter_year_from.current(newindex=0)
+        self.filter_year_to.current(newindex=0)
+        self.filter_low.delete(0, tk.END)
+        self.filter_high.delete(0, tk.END)
+
+    def show_filter_status(self, text):
+        """
+        Display how many channels the filter matches, or why it could not be applied.
+        :param text: Text of the status.
+        :return: None
+        """
+        self.filter_status.configure(text=text)
+
+    def show_trace_summary(self, text):
+        """
+        Display the slowest traced interactions in a separate window.
+        :param text: Summary of the slowest spans.
+        :return: None
+        """
+        window = tk.Toplevel(self)
+        window.title('Slowest interactions')
+        summary = tk.Text(window, width=110, height=30, font=('Courier', 12))
+        summary.insert('1.0', text)
+        summary.configure(state=tk.DISABLED)
+        summary.pack(fill=tk.BOTH, expand=True)
 
     def create_home_page(self):
         """
@@ -77,6 +306,9 @@ class YouTubeView(tk.Tk):
                                                             "explore!",
                                       font=('BM Jua', 25), bg='#f1e8d7', fg='#cd3c3c', height=5)
         self.welcome_label.pack(side=tk.TOP, padx=30, pady=30, fill=tk.X, expand=True)
+        self.status_label = tk.Label(self.home_frame, text='', font=('BM Jua', 18),
+                                     bg='#f8f6f2', fg='#cd3c3c')
+        self.status_label.pack(side=tk.TOP, fill=tk.X)
         self.home_icon = tk.PhotoImage(file='home_icon.png')
         self.home_label = tk.Label(self.home_frame, image=self.home_icon, bg='#f8f6f2')
         self.home_label.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -101,7 +333,29 @@ class YouTubeView(tk.Tk):
         self.show_graph_frame = Frame(self.story_frame, bg='#f8f6f2', width=200, height=700)
         self.show_graph_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         self.table_frame = Frame(self.show_graph_frame, width=650, height=680)
-        self.create_table()
+        self.table_select_frame = Frame(self.table_frame)
+        self.table_select_frame.pack(side=tk.TOP, fill=tk.X, pady=10)
+        self.table_category_label = tk.Label(self.table_select_frame, text='Category',
+                                             font=('BM Jua', 20), fg='#f1e8d7', bg='#cd3c3c')
+        self.table_category_label.pack(side=tk.LEFT, anchor='w', padx=15)
+        self.table_category = ttk.Combobox(self.table_select_frame, state='readonly', width=25)
+        self.table_category.pack(side=tk.LEFT, anchor='w', padx=5)
+        self.table_percentile_label = tk.Label(self.table_select_frame, text='Percentile',
+                                               font=('BM Jua', 20), fg='#f1e8d7', bg='#cd3c3c')
+        self.table_percentile_label.pack(side=tk.LEFT, anchor='w', padx=15)
+        # any percentile can be typed in and applied with Enter
+        self.table_percentile = ttk.Combobox(self.table_select_frame, width=8,
+                                             values=TABLE_PERCENTILES)
+        self.table_percentile.set(TABLE_PERCENTILES[-3])
+        self.table_percentile.pack(side=tk.LEFT, anchor='w', padx=5)
+        self.percentile = 0.9
+        # filled by show_table when the table is first displayed
+        self.table_grid = Frame(self.table_frame)
+        self.table_grid.pack(side=tk.TOP)
+        self.table_headers = []
+        self.table_cells = {}
+        self.table_note = tk.Label(self.table_frame, font=('BM Jua', 14), fg='#3d251e')
+        self.table_note.pack(side=tk.TOP, pady=5)
         self.story_canvas = tk.Canvas(self.show_graph_frame, bg='red', width=400, height=400)
         self.story_canvas.pack(side=tk.TOP, anchor='w',
                                fill=tk.BOTH, expand=True)
@@ -232,10 +486,7 @@ class YouTubeView(tk.Tk):
                                          font=('BM Jua', 22), fg='#cd3c3c', bg='#f1e8d7')
         self.select_pie_label.pack(side=tk.LEFT, padx=15, pady=15)
         self.select_pie_att = ttk.Combobox(self.show_pie_frame, width=20, state='readonly')
-        self.select_pie_att['values'] = ['2005', '2006', '2007', '2008', '2009', '2010',
-                                         '2011', '2012', '2013', '2014',
-                                         '2015', '2016', '2017', '2018', '2019',
-                                         '2020', '2021', '2022']
+        self.select_pie_att['values'] = self.controller.get_years()
         self.select_pie_att.current(newindex=0)
         self.select_pie_att.pack(side=tk.LEFT, padx=5)
 
@@ -335,6 +586,18 @@ class YouTubeView(tk.Tk):
         self.show_bar_frame.pack(side=tk.TOP, anchor='w', fill=tk.BOTH, expand=True)
         self.show_menu.pack(side=tk.LEFT, anchor='w', fill=tk.BOTH, expand=True)
 
+    def suggest_categories(self):
+        """
+        Get categories offered on the 'suggest channel' page.
+        :return: List of category names.
+        """
+        unique_category = self.controller.get_unique_category()
+        not_use = ['Education', 'Sports', 'People & Blogs', 'Shows',
+                   'Other', 'Movies', 'Pets & Animals',
+                   'Autos & Vehicles', 'Travel & Events',
+                   'Nonprofits & Activism', 'Trailers']
+        return [category for category in unique_category if category not in not_use]
+
     def create_suggest_page(self):
         """
         Set up components for 'suggest channel' menu.
@@ -357,13 +620,7 @@ class YouTubeView(tk.Tk):
         self.select_suggest_label.pack(side=tk.LEFT, anchor='w', padx=15)
         self.select_suggest_att = ttk.Combobox(self.suggest_select_frame,
                                                state='readonly', width=30)
-        unique_category = self.controller.get_unique_category()
-        not_use = ['Education', 'Sports', 'People & Blogs', 'Shows',
-                   'Other', 'Movies', 'Pets & Animals',
-                   'Autos & Vehicles', 'Travel & Events',
-                   'Nonprofits & Activism', 'Trailers']
-        self.select_suggest_att['values'] = [category for category in
-                                             unique_category if category not in not_use]
+        self.select_suggest_att['values'] = self.suggest_categories()
         self.select_suggest_att.current(newindex=0)
         self.select_suggest_att.pack(side=tk.LEFT, anchor='w', padx=5)
         self.select_suggest_from = Frame(self.suggest_frame, bg='#f8f6f2')
@@ -376,6 +633,16 @@ class YouTubeView(tk.Tk):
                                    fg='#cd3c3c', width=25)
         self.from_view.pack(side=tk.LEFT, anchor='w', padx=15, fill=tk.X, expand=True)
         self.select_suggest_from.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=20)
+        self.select_suggest_from_2 = Frame(self.suggest_frame, bg='#f8f6f2')
+        self.from_upload = tk.Button(self.select_suggest_from_2,
+                                     text='Top 10 by Uploaded videos', font=('BM Jua', 22),
+                                     fg='#cd3c3c', width=25)
+        self.from_upload.pack(side=tk.LEFT, anchor='w', padx=15, fill=tk.X, expand=True)
+        self.from_earning = tk.Button(self.select_suggest_from_2,
+                                      text='Top 10 by Average earnings', font=('BM Jua', 22),
+                                      fg='#cd3c3c', width=25)
+        self.from_earning.pack(side=tk.LEFT, anchor='w', padx=15, fill=tk.X, expand=True)
+        self.select_suggest_from_2.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=20, pady=10)
         self.suggest_canvas = tk.Canvas(self.suggest_frame, bg='red', width=400, height=400)
         self.suggest_canvas.pack(side=tk.BOTTOM, anchor='e', fill=tk.BOTH, expand=True)
 
@@ -388,21 +655,84 @@ class YouTubeView(tk.Tk):
         self.suggest_frame.pack(side=tk.TOP, anchor='w', fill=tk.BOTH, expand=True)
         self.show_menu.pack(side=tk.TOP, anchor='w', fill=tk.BOTH, expand=True)
 
-    def display_graph(self, fig, graph):
+    def canvas_size(self, graph):
+        """
+        Get size of the canvas that will display graph.
+        :param graph: The canvas that will display graph.
+        :return: Tuple of width and height in pixels.
+        """
+        graph.update_idletasks()
+        width, height = graph.winfo_width(), graph.winfo_height()
+        if width <= 1 or height <= 1:
+            width, height = graph.winfo_reqwidth(), graph.winfo_reqheight()
+        return width, height
+
+    @tracer.traced('draw')
+    def display_graph(self, fig, graph, key=None):
         """
         Display the graph on the canvas.
+        The figure is rasterized at the size of the canvas and kept in the render
+        cache, so showing the same graph again does not need matplotlib.
         :param fig: The matplotlib figure object.
         :param graph: The canvas that will display graph.
+        :param key: Tuple identifying the graph in the render cache, None to skip caching.
         :return: None
         """
-        if self.canvas:
-            self.canvas.get_tk_widget().destroy()
+        png = rasterize(fig, *self.canvas_size(graph))
+        if key is not None:
+            self.render_cache.put(key, png)
+        self.show_image(png, graph)
 
-        self.canvas = FigureCanvasTkAgg(fig, master=graph)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+    def show_cached_graph(self, key, graph):
+        """
+        Display a graph from the render cache.
+        :param key: Tuple identifying the graph in the render cache.
+        :param graph: The canvas that will display graph.
+        :return: True if the graph was cached and displayed.
+        """
+        png = self.render_cache.get(key)
+        if png is None:
+            return False
+        self.show_image(png, graph)
+        return True
 
-        plt.close(fig)
+    @tracer.traced('draw')
+    def show_image(self, png, graph):
+        """
+        Display a rendered graph on the canvas. Each canvas keeps one image for
+        the whole session and its content is replaced for every graph.
+        :param png: PNG bytes of the graph.
+        :param graph: The canvas that will display graph.
+        :return: None
+        """
+        data = base64.b64encode(png)
+        image = self.graph_images.get(graph)
+        if image is None:
+            image = tk.PhotoImage(master=graph, data=data)
+            graph.create_image(0, 0, anchor='nw', image=image, tags='graph')
+            # keep a reference, Tk drops the image once the Python object is collected
+            self.graph_images[graph] = image
+        else:
+            # update the image in place, the canvas item and its Tk image stay alive
+            width, height = struct.unpack('>II', png[16:24])
+            image.blank()
+            image.configure(width=width, height=height, data=data)
+
+    def set_busy(self, graph, busy):
+        """
+        Show or hide the busy state of a canvas while its graph is being rendered.
+        :param graph: The canvas that will display graph.
+        :param busy: True while the graph is being rendered.
+        :return: None
+        """
+        graph.delete('busy')
+        if busy:
+            width, height = self.canvas_size(graph)
+            graph.create_text(width // 2, height // 2, text='Rendering...',
+                              font=('BM Jua', 22), fill='#cd3c3c', tags='busy')
+            graph.configure(cursor='watch')
+        else:
+            graph.configure(cursor='')
 
     def clear_menu(self):
         """
@@ -412,82 +742,91 @@ class YouTubeView(tk.Tk):
         for w in self.show_menu.winfo_children():
             w.pack_forget()
 
+    def table_categories(self):
+        """
+        Get choices of the category of the statistics table.
+        :return: List of ALL_CATEGORIES then each category name.
+        """
+        return [ALL_CATEGORIES] + list(self.controller.get_unique_category())
+
     def create_table(self):
         """
         Create table to display descriptive and statistic of data.
         :return: None
         """
-        df = self.controller.get_data()
-        df_to_describe = df[['subscribers', 'video views', 'uploads', 'average_monthly_earnings']]
-        summary_stats = df_to_describe.describe(percentiles=[.25, .50, .75])
-        mean = summary_stats.loc['mean'].to_list()
-        std = summary_stats.loc['std'].to_list()
-        min_val = summary_stats.loc['min'].to_list()
-        max_val = summary_stats.loc['max'].to_list()
-        attribute = ['Subscribers', 'Video views', 'Uploaded videos', 'Average monthly earnings']
-        header1 = tk.Label(self.table_frame, text="Attribute", padx=10,
-                           pady=5, borderwidth=1, relief="solid",
-                           width=15, height=2, font=('BM Jua', 20),
-                           bg='#f1e8d7', fg='#cd3c3c')
-        header2 = tk.Label(self.table_frame, text="Mean", padx=10,
-                           pady=5, borderwidth=1, relief="solid",
-                           width=15, height=2, font=('BM Jua', 20),
-                           bg='#f1e8d7', fg='#cd3c3c')
-        header3 = tk.Label(self.table_frame, text="Std", padx=10,
-                           pady=5, borderwidth=1, relief="solid",
-                           width=15, height=2, font=('BM Jua', 20),
-                           bg='#f1e8d7', fg='#cd3c3c')
-        header4 = tk.Label(self.table_frame, text="Min", padx=10,
-                           pady=5, borderwidth=1, relief="solid",
-                           width=15, height=2, font=('BM Jua', 20),
-                           bg='#f1e8d7', fg='#cd3c3c')
-        header5 = tk.Label(self.table_frame, text="Max", padx=10,
-                           pady=5, borderwidth=1, relief="solid",
-                           width=15, height=2, font=('BM Jua', 20),
-                           bg='#f1e8d7', fg='#cd3c3c')
-
-        header1.grid(row=0, column=0)
-        header2.grid(row=0, column=1)
-        header3.grid(row=0, column=2)
-        header4.grid(row=0, column=3)
-        header5.grid(row=0, column=4)
-
-        for i, attr in enumerate(attribute):
-            label_attr = tk.Label(self.table_frame, text=attr,
+        self.table_category['values'] = self.table_categories()
+        self.table_category.current(newindex=0)
+        headers = ['Attribute', 'Mean', 'Std', 'Min', 'Median', self.table_percentile.get(), 'Max']
+        for column, text in enumerate(headers):
+            header = tk.Label(self.table_grid, text=text, padx=10,
+                              pady=5, borderwidth=1, relief="solid",
+                              width=12, height=2, font=('BM Jua', 20),
+                              bg='#f1e8d7', fg='#cd3c3c')
+            header.grid(row=0, column=column)
+            self.table_headers.append(header)
+
+        for i, (attribute, text) in enumerate(TABLE_ATTRIBUTES.items()):
+            label_attr = tk.Label(self.table_grid, text=text,
                                   padx=10, pady=5, borderwidth=1,
-                                  width=15, height=2, font=('BM Jua', 18),
-                                  fg='#3d251e')
+                                  width=12, height=2, font=('BM Jua', 18),
+                                  fg='#3d251e', wraplength=160)
             label_attr.grid(row=i + 1, column=0)
-
-            label_mean = tk.Label(self.table_frame, text=f"{mean[i]:.4f}",
-                                  padx=10, pady=5, borderwidth=1,
-                                  width=15, height=2, font=('BM Jua', 18),
-                                  fg='#3d251e')
-            label_mean.grid(row=i + 1, column=1)
-
-            label_std = tk.Label(self.table_frame, text=f"{std[i]:.4f}",
-                                 padx=10, pady=5, borderwidth=1,
-                                 width=15, height=2, font=('BM Jua', 18),
+            for column, statistic in enumerate(TABLE_STATISTICS):
+                label = tk.Label(self.table_grid, padx=10, pady=5, borderwidth=1,
+                                 width=12, height=2, font=('BM Jua', 18),
                                  fg='#3d251e')
-            label_std.grid(row=i + 1, column=2)
+                label.grid(row=i + 1, column=column + 1)
+                self.table_cells[(attribute, statistic)] = label
+        self.update_table()
 
-            label_min = tk.Label(self.table_frame, text=f"{min_val[i]:.4f}",
-                                 padx=10, pady=5, borderwidth=1,
-                                 width=15, height=2, font=('BM Jua', 18),
-                                 fg='#3d251e')
-            label_min.grid(row=i + 1, column=3)
+    def table_percentile_value(self):
+        """
+        Read the percentile chosen or typed next to the statistics table.
+        :return: Quantile between 0 and 1, the last valid one if the text is not a percentile.
+        """
+        try:
+            value = float(self.table_percentile.get().strip().rstrip('%')) / 100
+        except ValueError:
+            value = -1.0
+        if 0 <= value <= 1:
+            self.percentile = value
+        self.table_percentile.set(f'{self.percentile * 100:g}%')
+        return self.percentile
 
-            label_max = tk.Label(self.table_frame, text=f"{max_val[i]:.4f}",
-                                 padx=10, pady=5, borderwidth=1,
-                                 width=15, height=2, font=('BM Jua', 18),
-                                 fg='#3d251e')
-            label_max.grid(row=i + 1, column=4)
+    def update_table(self):
+        """
+        Fill the statistics table for the chosen category and percentile. Only
+        the text of the labels changes, statistics are read from the streaming
+        summaries so updating costs the same for any number of channels.
+        :return: None
+        """
+        category = self.table_category.get()
+        percentile = self.table_percentile_value()
+        percentiles = sorted({0.5, percentile})
+        stats = self.controller.get_summary_stats(
+            list(TABLE_ATTRIBUTES), None if category == ALL_CATEGORIES else category,
+            percentiles)
+        rows = {'mean': 1, 'std': 2, 'min': 3, 'median': 4 + percentiles.index(0.5),
+                'percentile': 4 + percentiles.index(percentile), 'max': len(stats) - 1}
+        self.table_headers[5].configure(text=self.table_percentile.get())
+        for attribute in TABLE_ATTRIBUTES:
+            values = stats[attribute]
+            for statistic in TABLE_STATISTICS:
+                value = values.iloc[rows[statistic]]
+                self.table_cells[(attribute, statistic)].configure(
+                    text='-' if value != value else f"{value:.4f}")
+        count = int(stats.loc['count'].max())
+        error = stats.attrs.get('rank_error', 0.0)
+        accuracy = f'within {error:.1%} of rank' if error else 'exact'
+        self.table_note.configure(text=f'{count:,} channels, percentiles {accuracy}')
 
     def show_table(self):
         """
-        Display descriptive and statistic table.
+        Display descriptive and statistic table, created the first time it is shown.
         :return: None
         """
+        if not self.table_cells:
+            self.create_table()
         self.table_frame.pack(pady=25)
 
     def exit_app(self):